@@ -24,6 +24,15 @@
 #
 # Environment Variables:
 #   RESOLUTION - Grid resolution in degrees (default: 0.025)
+#   BLEND_NPROCS        - Blending worker processes (default: all cores)
+#   BLEND_MAX_MEMORY_MB - Memory budget of the blending workers (default: 4000)
+#   BLEND_WEIGHTS_DIR   - Directory caching the remap weights across cycles
+#   BLEND_HRRR_REMAP    - HRRR regridding: nearest (default), bilinear, conservative
+#   BLEND_COMPRESSION   - Output compression: zlib (default), zstd, none
+#   BLEND_SIGNIFICANT_DIGITS - Quantize the output forcing (default: lossless)
+#   BLEND_TRANSITION_WIDTH - HRRR to GFS taper width in degrees (default: 0.25)
+#   ESMF_MESH_CACHE_DIR - Directory caching the SCRIP and mesh files of the
+#                         blended grid by coordinate digest (default: unset)
 #
 # Author: SECOFS UFS-Coastal Transition
 # Date: January 2026
@@ -143,8 +152,14 @@ if [ ! -s "$SCRIP_SCRIPT" ]; then
     SCRIP_SCRIPT="$(dirname $0)/pysh/proc_scrip.py"
 fi
 
+ESMF_MESH_CACHE_DIR=${ESMF_MESH_CACHE_DIR:-}
+GRID_DIGEST=""
 if [ -s "$SCRIP_SCRIPT" ]; then
-    $PYTHON_EXE $SCRIP_SCRIPT --ifile $OUTPUT_FILE --ofile $(basename $SCRIP_FILE) --odir $OUTPUT_DIR
+    if [ -n "$ESMF_MESH_CACHE_DIR" ]; then
+        GRID_DIGEST=$($PYTHON_EXE $SCRIP_SCRIPT --ifile $OUTPUT_FILE --digest) || GRID_DIGEST=""
+    fi
+    $PYTHON_EXE $SCRIP_SCRIPT --ifile $OUTPUT_FILE --ofile $(basename $SCRIP_FILE) --odir $OUTPUT_DIR \
+        ${ESMF_MESH_CACHE_DIR:+--cache-dir $ESMF_MESH_CACHE_DIR}
     SCRIP_STATUS=$?
 else
     echo "WARNING: proc_scrip.py not found at $SCRIP_SCRIPT"
@@ -169,6 +184,10 @@ echo "Step 3/3: Generating ESMF mesh..."
 echo "============================================"
 
 MESH_FILE="${OUTPUT_DIR}/${BASENAME}_esmf_mesh.nc"
+CACHED_MESH=""
+if [ -n "$GRID_DIGEST" ]; then
+    CACHED_MESH="${ESMF_MESH_CACHE_DIR}/esmf_mesh_${GRID_DIGEST}.nc"
+fi
 
 ESMF_CMD=""
 if command -v ESMF_Scrip2Unstruct &> /dev/null; then
@@ -177,12 +196,19 @@ elif command -v conda &> /dev/null && conda run -n ncl_env which ESMF_Scrip2Unst
     ESMF_CMD="conda run -n ncl_env ESMF_Scrip2Unstruct"
 fi
 
-if [ -n "$ESMF_CMD" ]; then
+if [ -n "$CACHED_MESH" ] && [ -s "$CACHED_MESH" ]; then
+    rm -f $MESH_FILE
+    ln $CACHED_MESH $MESH_FILE 2>/dev/null || cp $CACHED_MESH $MESH_FILE
+    echo "ESMF mesh restored from cache: $CACHED_MESH"
+elif [ -n "$ESMF_CMD" ]; then
     if [ -s "$SCRIP_FILE" ]; then
         $ESMF_CMD $SCRIP_FILE $MESH_FILE 0
         if [ -s "$MESH_FILE" ]; then
             echo "ESMF mesh created: $MESH_FILE"
             echo "Size: $(ls -lh $MESH_FILE | awk '{print $5}')"
+            if [ -n "$CACHED_MESH" ]; then
+                cp $MESH_FILE ${CACHED_MESH}.tmp.$$ && mv -f ${CACHED_MESH}.tmp.$$ $CACHED_MESH
+            fi
         else
             echo "WARNING: ESMF mesh generation failed"
         fi
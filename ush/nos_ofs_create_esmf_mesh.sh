@@ -26,13 +26,18 @@
 #   - Python 3 with netCDF4, numpy, xarray
 #
 # Helper Scripts (in USHnos/pysh directory):
-#   - modify_gfs_4_esmfmesh.py  (GFS CF attribute processing)
-#   - modify_hrrr_4_esmfmesh.py (HRRR CF attribute processing)
-#   - proc_scrip.py             (SCRIP grid generation - replaces NCL)
+#   - esmf_prep.py   (GFS/HRRR CF attributes and SCRIP grid in one pass)
+#   - proc_scrip.py  (SCRIP grid generation - replaces NCL)
 #
 # Environment Variables:
 #   WGRIB2   - Path to wgrib2 executable (default: wgrib2)
 #   USHnos   - Path to USH scripts directory
+#   PYSHnos  - Path to the Python helpers (default: USHnos/pysh, or the
+#              pysh directory next to ush/ufs_coastal)
+#   ESMF_MESH_CACHE_DIR - Directory caching SCRIP and mesh files by a digest
+#              of the grid coordinates. On a hit only the first GRIB2 record
+#              is decoded and the NetCDF steps are skipped (default: unset,
+#              no caching)
 #
 # Author: Adapted for SECOFS UFS-Coastal transition
 # Date: January 2026
@@ -85,6 +90,11 @@ fi
 # =============================================================================
 WGRIB2=${WGRIB2:-wgrib2}
 USHnos=${USHnos:-$(dirname $0)}
+PYSHnos=${PYSHnos:-${USHnos}/pysh}
+if [ ! -d "$PYSHnos" ]; then
+    # ush/ufs_coastal shares the helpers in ush/pysh
+    PYSHnos="$(dirname $0)/../pysh"
+fi
 
 # Create output directory
 mkdir -p $OUTPUT_DIR
@@ -112,6 +122,42 @@ echo "SCRIP NC:   $SCRIP_NC"
 echo "Mesh NC:    $MESH_NC"
 echo "============================================"
 
+# =============================================================================
+# Cache Lookup: the GFS/HRRR grids do not change between cycles
+# =============================================================================
+ESMF_MESH_CACHE_DIR=${ESMF_MESH_CACHE_DIR:-}
+if [ -n "$ESMF_MESH_CACHE_DIR" ]; then
+    echo ""
+    echo "Looking up the grid in $ESMF_MESH_CACHE_DIR..."
+    PROBE_NC="${OUTPUT_DIR}/${DBASE_LOWER}_probe.nc"
+    rm -f $PROBE_NC
+    # The first record carries the full grid definition
+    $WGRIB2 $GRIB2_FILE -d 1 -netcdf $PROBE_NC > /dev/null
+    SAVE_LD_PRELOAD=$LD_PRELOAD
+    unset LD_PRELOAD
+    GRID_DIGEST=$(python3 ${PYSHnos}/proc_scrip.py --ifile $PROBE_NC --digest)
+    export LD_PRELOAD=$SAVE_LD_PRELOAD
+    rm -f $PROBE_NC
+
+    CACHED_SCRIP="${ESMF_MESH_CACHE_DIR}/scrip_${GRID_DIGEST}.nc"
+    CACHED_MESH="${ESMF_MESH_CACHE_DIR}/esmf_mesh_${GRID_DIGEST}.nc"
+    if [ -n "$GRID_DIGEST" ] && [ -s $CACHED_SCRIP ] && [ -s $CACHED_MESH ]; then
+        echo "Cache hit: $GRID_DIGEST"
+        rm -f $SCRIP_NC $MESH_NC
+        ln $CACHED_SCRIP $SCRIP_NC 2>/dev/null || cp $CACHED_SCRIP $SCRIP_NC
+        ln $CACHED_MESH $MESH_NC 2>/dev/null || cp $CACHED_MESH $MESH_NC
+        echo ""
+        echo "============================================"
+        echo "ESMF Mesh Generation COMPLETED SUCCESSFULLY (cached)"
+        echo "============================================"
+        echo "  SCRIP Grid:   $SCRIP_NC"
+        echo "  ESMF Mesh:    $MESH_NC"
+        echo "============================================"
+        exit 0
+    fi
+    echo "Cache miss: ${GRID_DIGEST:-no digest}"
+fi
+
 # =============================================================================
 # Step 1: Convert GRIB2 to NetCDF
 # =============================================================================
@@ -156,15 +202,20 @@ echo "Created: $RAW_NC"
 echo "File size: $(ls -lh $RAW_NC | awk '{print $5}')"
 
 # =============================================================================
-# Step 2: Add ESMF/CF Attributes
+# Step 2: Add ESMF/CF Attributes and Generate SCRIP Grid
 # =============================================================================
 echo ""
-echo "Step 2: Adding ESMF/CF attributes..."
+echo "Step 2: Adding ESMF/CF attributes and generating SCRIP grid..."
 echo "============================================"
 
-# Try NCO method first (more reliable on WCOSS2), fall back to Python
+# Try NCO method first (more reliable on WCOSS2), fall back to Python.
+# The Python method writes the ESMF file and the SCRIP grid in one pass,
+# reusing the coordinates it has already read (no NCL dependency).
 NCO_SCRIPT="${USHnos}/modify_${DBASE_LOWER}_nco.sh"
-PYTHON_SCRIPT="${USHnos}/pysh/modify_${DBASE_LOWER}_4_esmfmesh.py"
+PREP_SCRIPT="${PYSHnos}/esmf_prep.py"
+SCRIP_SCRIPT="${PYSHnos}/proc_scrip.py"
+
+rm -f $ESMF_NC $SCRIP_NC
 
 if [ -s "$NCO_SCRIPT" ] && command -v ncatted &> /dev/null; then
     echo "Using NCO method (recommended for WCOSS2)..."
@@ -176,23 +227,27 @@ if [ -s "$NCO_SCRIPT" ] && command -v ncatted &> /dev/null; then
     fi
 fi
 
-# Fall back to Python if NCO failed or not available
-if [ ! -s $ESMF_NC ]; then
-    if [ -s "$PYTHON_SCRIPT" ]; then
-        echo "Using Python method..."
-        # Unset LD_PRELOAD to avoid conflicts with Python's netCDF4
-        # (Same approach used in nos_ofs_create_forcing_river.sh)
-        SAVE_LD_PRELOAD=$LD_PRELOAD
-        unset LD_PRELOAD
-        python3 $PYTHON_SCRIPT $RAW_NC $ESMF_NC
-        export LD_PRELOAD=$SAVE_LD_PRELOAD
-    else
-        echo "ERROR: Neither NCO nor Python script found"
-        echo "  NCO script: $NCO_SCRIPT"
-        echo "  Python script: $PYTHON_SCRIPT"
-        exit 1
-    fi
+# Unset LD_PRELOAD to avoid conflicts with Python's netCDF4
+# (Same approach used in nos_ofs_create_forcing_river.sh)
+SAVE_LD_PRELOAD=$LD_PRELOAD
+unset LD_PRELOAD
+if [ -s $ESMF_NC ] && [ -s "$SCRIP_SCRIPT" ]; then
+    echo "Using Python SCRIP generator..."
+    python3 $SCRIP_SCRIPT --ifile $ESMF_NC --ofile $(basename $SCRIP_NC) --odir $OUTPUT_DIR \
+        ${ESMF_MESH_CACHE_DIR:+--cache-dir $ESMF_MESH_CACHE_DIR}
+    PREP_STATUS=$?
+elif [ -s "$PREP_SCRIPT" ]; then
+    echo "Using Python method (ESMF file and SCRIP grid in one pass)..."
+    python3 $PREP_SCRIPT $DBASE_LOWER $RAW_NC $ESMF_NC --scrip $SCRIP_NC \
+        ${ESMF_MESH_CACHE_DIR:+--cache-dir $ESMF_MESH_CACHE_DIR}
+    PREP_STATUS=$?
+else
+    echo "ERROR: Neither NCO nor Python script found"
+    echo "  NCO script: $NCO_SCRIPT"
+    echo "  Python script: $PREP_SCRIPT"
+    exit 1
 fi
+export LD_PRELOAD=$SAVE_LD_PRELOAD
 
 if [ ! -s $ESMF_NC ]; then
     echo "ERROR: Failed to create $ESMF_NC"
@@ -202,37 +257,8 @@ fi
 echo "Created: $ESMF_NC"
 echo "File size: $(ls -lh $ESMF_NC | awk '{print $5}')"
 
-# =============================================================================
-# Step 3: Generate SCRIP Grid (using Python - no NCL dependency)
-# =============================================================================
-echo ""
-echo "Step 3: Generating SCRIP grid..."
-echo "============================================"
-
-# Python SCRIP generation script
-SCRIP_SCRIPT="${USHnos}/pysh/proc_scrip.py"
-
-if [ -s "$SCRIP_SCRIPT" ]; then
-    echo "Using Python SCRIP generator..."
-    # Unset LD_PRELOAD to avoid conflicts with Python's netCDF4
-    SAVE_LD_PRELOAD=$LD_PRELOAD
-    unset LD_PRELOAD
-    # Run Python to generate SCRIP grid
-    # This script handles both rectilinear (GFS) and curvilinear (HRRR) grids
-    python3 $SCRIP_SCRIPT --ifile $ESMF_NC --ofile $(basename $SCRIP_NC) --odir $OUTPUT_DIR
-    SCRIP_STATUS=$?
-    export LD_PRELOAD=$SAVE_LD_PRELOAD
-
-    if [ $SCRIP_STATUS -ne 0 ] || [ ! -s $SCRIP_NC ]; then
-        echo "WARNING: Python SCRIP generation failed (exit code: $SCRIP_STATUS)"
-        echo "This may be due to Python/library issues on this system"
-    fi
-else
-    echo "WARNING: Python SCRIP script not found: $SCRIP_SCRIPT"
-fi
-
-if [ ! -s $SCRIP_NC ]; then
-    echo "ERROR: Failed to create $SCRIP_NC"
+if [ $PREP_STATUS -ne 0 ] || [ ! -s $SCRIP_NC ]; then
+    echo "ERROR: Failed to create $SCRIP_NC (exit code: $PREP_STATUS)"
     echo ""
     echo "Troubleshooting:"
     echo "  1. Check Python version: python3 --version"
@@ -246,10 +272,10 @@ echo "Created: $SCRIP_NC"
 echo "File size: $(ls -lh $SCRIP_NC | awk '{print $5}')"
 
 # =============================================================================
-# Step 4: Create ESMF Unstructured Mesh
+# Step 3: Create ESMF Unstructured Mesh
 # =============================================================================
 echo ""
-echo "Step 4: Creating ESMF unstructured mesh..."
+echo "Step 3: Creating ESMF unstructured mesh..."
 echo "============================================"
 
 # Check for ESMF_Scrip2Unstruct
@@ -270,6 +296,13 @@ fi
 echo "Created: $MESH_NC"
 echo "File size: $(ls -lh $MESH_NC | awk '{print $5}')"
 
+# Add the mesh to the cache (the SCRIP file was added by the Python step),
+# through a temporary name so concurrent cycles never see a partial file
+if [ -n "$ESMF_MESH_CACHE_DIR" ] && [ -n "$GRID_DIGEST" ]; then
+    cp $MESH_NC ${CACHED_MESH}.tmp.$$ && mv -f ${CACHED_MESH}.tmp.$$ $CACHED_MESH
+    echo "Cached: $CACHED_MESH"
+fi
+
 # =============================================================================
 # Summary
 # =============================================================================
@@ -0,0 +1,914 @@
+"""
+HRRR + GFS forcing blender for CDEPS/DATM.
+
+The target grid is split into bands of rows (tiles) and the time axis into
+blocks. Every (time block, tile) is blended for all variables at once by a
+worker process and handed back to the parent, which writes the variables as
+disjoint hyperslabs of the output.
+
+:func:`plan_blend` estimates the memory of each stage from the grid sizes
+and picks the worker count, time block and tile size that fit a memory
+budget; :func:`blend` runs the stages and reports their peak RSS.
+
+Example:
+    from blend import blend
+    report = blend('hrrr_forcing.nc', 'gfs_forcing.nc', 'secofs_forcing.nc',
+                   'SECOFS', max_memory=8000)
+
+The command line interface is blend_hrrr_gfs.py.
+"""
+
+from contextlib import contextmanager
+import hashlib
+from datetime import datetime
+from itertools import islice
+from multiprocessing import Pool
+import os
+import queue
+import resource
+import tempfile
+import time
+
+import numpy as np
+from netCDF4 import Dataset
+from scipy.sparse import csr_matrix
+from scipy.spatial import cKDTree
+from scipy.interpolate import interp1d
+from scipy.ndimage import distance_transform_edt
+
+
+# Domain bounds
+DOMAINS = {
+    'ATLANTIC': (-98.0, -55.0, 10.0, 53.0),
+    'SECOFS': (-82.0, -73.0, 23.0, 37.0),
+    'STOFS3D_ATL': (-99.0, -52.0, 7.0, 53.0),
+}
+
+BUFFER = 1.0
+
+COMPRESSIONS = ('none', 'zlib', 'zstd')
+CHUNK_MB = 4
+# Least number of row bands of the default output chunks. Blocks are tiled
+# in whole chunks, so a chunk spanning the domain would leave only the
+# time axis to split.
+CHUNK_BANDS = 8
+
+HRRR_REMAP_METHODS = ('nearest', 'bilinear', 'conservative')
+
+# Width (degrees) of the zone inside the HRRR edge over which the blend
+# tapers from GFS to HRRR
+TRANSITION_WIDTH = 0.25
+
+# Variable mapping (HRRR name -> GFS name)
+VARIABLES = [
+    ('UGRD_10maboveground', 'UGRD_10maboveground'),
+    ('VGRD_10maboveground', 'VGRD_10maboveground'),
+    ('TMP_2maboveground', 'TMP_2maboveground'),
+    ('SPFH_2maboveground', 'SPFH_2maboveground'),
+    ('PRATE_surface', 'PRATE_surface'),
+    ('DSWRF_surface', 'DSWRF_surface'),
+    ('DLWRF_surface', 'DLWRF_surface'),
+    ('MSLMA_meansealevel', 'PRMSL_meansealevel'),
+]
+
+MB = 1024**2
+
+# Working set per target point, time step and variable of a blend task: the
+# HRRR window, the regridded HRRR and GFS fields and the blended block, with
+# headroom for temporaries.
+BYTES_PER_POINT = 40
+
+# Parent memory per target point, time step and variable of a finished
+# block: the float32 block and its pickled copy while it is received.
+BLOCK_BYTES = 8
+
+# Setup stage memory per point: the full HRRR lon/lat read as float64 masked
+# arrays plus the domain mask, and the KD-tree (or cell polygons) per HRRR
+# subset point and the query and stencil temporaries per target point.
+SUBSET_BYTES = 40
+SOURCE_BYTES = {'nearest': 48, 'bilinear': 64, 'conservative': 600}
+TARGET_BYTES = {'nearest': 150, 'bilinear': 320, 'conservative': 400}
+
+_hrrr = None
+_gfs = None
+_grid = None
+_hrrr_weights = None
+
+
+def subset_hrrr(hrrr, bounds):
+    """Returns the row/column slices and lon/lat of the HRRR points within
+    the target domain plus BUFFER."""
+    lon_min, lon_max, lat_min, lat_max = bounds
+    hrrr_lon2d_full = hrrr.variables['longitude'][:]
+    hrrr_lat2d_full = hrrr.variables['latitude'][:]
+    hrrr_lon2d_full = np.where(hrrr_lon2d_full > 180, hrrr_lon2d_full - 360,
+                               hrrr_lon2d_full)
+    print(f"  HRRR full grid: {hrrr_lon2d_full.shape}")
+
+    hrrr_mask = ((hrrr_lon2d_full >= lon_min - BUFFER) &
+                 (hrrr_lon2d_full <= lon_max + BUFFER) &
+                 (hrrr_lat2d_full >= lat_min - BUFFER) &
+                 (hrrr_lat2d_full <= lat_max + BUFFER))
+
+    # Find bounding box indices for HRRR subset
+    rows_with_data = np.any(hrrr_mask, axis=1)
+    cols_with_data = np.any(hrrr_mask, axis=0)
+    if np.any(rows_with_data) and np.any(cols_with_data):
+        row_min, row_max = np.where(rows_with_data)[0][[0, -1]]
+        col_min, col_max = np.where(cols_with_data)[0][[0, -1]]
+        row_slice = slice(row_min, row_max + 1)
+        col_slice = slice(col_min, col_max + 1)
+        hrrr_lon2d = np.array(hrrr_lon2d_full[row_slice, col_slice], dtype=np.float32)
+        hrrr_lat2d = np.array(hrrr_lat2d_full[row_slice, col_slice], dtype=np.float32)
+        print(f"  HRRR subset: {hrrr_lon2d.shape} (reduced from {hrrr_lon2d_full.shape})")
+    else:
+        print("  WARNING: No HRRR data in target domain, using GFS only")
+        hrrr_lon2d = np.array([[lon_min]])
+        hrrr_lat2d = np.array([[0.0]])  # Outside domain
+        row_slice = slice(0, 1)
+        col_slice = slice(0, 1)
+    return row_slice, col_slice, hrrr_lon2d, hrrr_lat2d
+
+
+def subset_gfs(gfs, bounds):
+    """Returns the lat/lon slices of the GFS points within the target domain
+    plus one degree, the ascending latitudes and longitudes, and whether the
+    latitudes have to be flipped."""
+    lon_min, lon_max, lat_min, lat_max = bounds
+    gfs_lat_full = np.array(gfs.variables['latitude'][:], dtype=np.float32)
+    gfs_lon_full = np.array(gfs.variables['longitude'][:], dtype=np.float32)
+    gfs_lon_180 = np.where(gfs_lon_full > 180, gfs_lon_full - 360, gfs_lon_full)
+
+    lat_mask = (gfs_lat_full >= lat_min - 1) & (gfs_lat_full <= lat_max + 1)
+    lon_mask = (gfs_lon_180 >= lon_min - 1) & (gfs_lon_180 <= lon_max + 1)
+    gfs_lat_idx = np.where(lat_mask)[0]
+    gfs_lon_idx = np.where(lon_mask)[0]
+    gfs_lat = gfs_lat_full[lat_mask]
+    gfs_lon = gfs_lon_180[lon_mask]
+    print(f"  GFS subset: {len(gfs_lat)} x {len(gfs_lon)}")
+
+    gfs_flip = bool(gfs_lat[0] > gfs_lat[-1])
+    gfs_lat_asc = gfs_lat[::-1] if gfs_flip else gfs_lat
+    return (slice(gfs_lat_idx[0], gfs_lat_idx[-1] + 1),
+            slice(gfs_lon_idx[0], gfs_lon_idx[-1] + 1),
+            gfs_lat_asc, gfs_lon, gfs_flip)
+
+
+def target_grid(bounds, resolution):
+    lon_min, lon_max, lat_min, lat_max = bounds
+    target_lon = np.arange(lon_min, lon_max + resolution/2, resolution, dtype=np.float32)
+    target_lat = np.arange(lat_min, lat_max + resolution/2, resolution, dtype=np.float32)
+    return target_lon, target_lat
+
+
+def hrrr_nearest(hrrr_lon2d, hrrr_lat2d, target_lon2d, target_lat2d):
+    """Returns the flat HRRR subset index nearest to every target point and
+    the mask of the target points HRRR is used for."""
+    hrrr_points = np.column_stack([hrrr_lon2d.ravel(), hrrr_lat2d.ravel()])
+    hrrr_tree = cKDTree(hrrr_points)
+    target_points_flat = np.column_stack([target_lon2d.ravel(), target_lat2d.ravel()])
+    distances, hrrr_indices = hrrr_tree.query(target_points_flat)
+    hrrr_indices = hrrr_indices.reshape(target_lon2d.shape)
+    distances = distances.reshape(target_lon2d.shape)
+
+    # HRRR valid mask: use HRRR where distance < 0.1 deg and within lat range
+    hrrr_lat_min = float(hrrr_lat2d.min())
+    hrrr_lat_max = float(hrrr_lat2d.max())
+    hrrr_valid_mask = ((distances < 0.1) & (target_lat2d >= hrrr_lat_min) &
+                       (target_lat2d <= hrrr_lat_max))
+    return hrrr_indices, hrrr_valid_mask
+
+
+def _invert_bilinear(x2d, y2d, i, j, x, y, iterations=6):
+    """(s, t) coordinates of the points (x, y) in the source cells whose
+    first node is (i, j), by Newton iteration on the bilinear map."""
+    x0, x1, x2, x3 = (x2d[i, j], x2d[i, j + 1], x2d[i + 1, j + 1], x2d[i + 1, j])
+    y0, y1, y2, y3 = (y2d[i, j], y2d[i, j + 1], y2d[i + 1, j + 1], y2d[i + 1, j])
+    s = np.full(len(x), 0.5)
+    t = np.full(len(x), 0.5)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _ in range(iterations):
+            fx = x0*(1-s)*(1-t) + x1*s*(1-t) + x2*s*t + x3*(1-s)*t - x
+            fy = y0*(1-s)*(1-t) + y1*s*(1-t) + y2*s*t + y3*(1-s)*t - y
+            dxs = (x1 - x0)*(1-t) + (x2 - x3)*t
+            dxt = (x3 - x0)*(1-s) + (x2 - x1)*s
+            dys = (y1 - y0)*(1-t) + (y2 - y3)*t
+            dyt = (y3 - y0)*(1-s) + (y2 - y1)*s
+            det = dxs*dyt - dxt*dys
+            s = s - (dyt*fx - dxt*fy) / det
+            t = t - (dxs*fy - dys*fx) / det
+    return s, t
+
+
+def hrrr_bilinear(hrrr_lon2d, hrrr_lat2d, target_lon2d, target_lat2d, eps=1e-6):
+    """Returns the (rows, columns, weights) of the sparse bilinear remap from
+    the curvilinear HRRR subset to the target points, and the mask of the
+    target points inside of an HRRR cell.
+
+    The cell holding each target point is searched among the four cells
+    around its nearest HRRR node, in a plane scaled by cos(latitude).
+    """
+    hrrr_indices, near_mask = hrrr_nearest(hrrr_lon2d, hrrr_lat2d,
+                                           target_lon2d, target_lat2d)
+    ny, nx = hrrr_lon2d.shape
+    points = np.where(near_mask.ravel())[0]
+    r, c = np.divmod(hrrr_indices.ravel()[points], nx)
+    scale = np.cos(np.radians(np.mean(hrrr_lat2d, dtype=np.float64)))
+    x2d = hrrr_lon2d.astype(np.float64) * scale
+    y2d = hrrr_lat2d.astype(np.float64)
+    x = target_lon2d.ravel()[points].astype(np.float64) * scale
+    y = target_lat2d.ravel()[points].astype(np.float64)
+
+    s = np.zeros(len(points))
+    t = np.zeros(len(points))
+    i_cell = np.zeros(len(points), dtype=np.int64)
+    j_cell = np.zeros(len(points), dtype=np.int64)
+    found = np.zeros(len(points), dtype=bool)
+    for dr, dc in ((-1, -1), (-1, 0), (0, -1), (0, 0)):
+        todo = np.where(~found)[0]
+        i = np.clip(r[todo] + dr, 0, ny - 2)
+        j = np.clip(c[todo] + dc, 0, nx - 2)
+        si, ti = _invert_bilinear(x2d, y2d, i, j, x[todo], y[todo])
+        inside = ((si >= -eps) & (si <= 1 + eps) & (ti >= -eps) & (ti <= 1 + eps))
+        hit = todo[inside]
+        s[hit] = np.clip(si[inside], 0, 1)
+        t[hit] = np.clip(ti[inside], 0, 1)
+        i_cell[hit] = i[inside]
+        j_cell[hit] = j[inside]
+        found[hit] = True
+
+    points, s, t, i, j = (points[found], s[found], t[found],
+                          i_cell[found], j_cell[found])
+    rows = np.repeat(points, 4)
+    cols = np.stack([i*nx + j, i*nx + j + 1, (i + 1)*nx + j + 1, (i + 1)*nx + j],
+                    axis=1).ravel()
+    weights = np.stack([(1-s)*(1-t), s*(1-t), s*t, (1-s)*t], axis=1).ravel()
+    hrrr_valid_mask = np.zeros(near_mask.size, dtype=bool)
+    hrrr_valid_mask[points] = True
+    return rows, cols, weights, hrrr_valid_mask.reshape(near_mask.shape)
+
+
+def hrrr_conservative(hrrr_lon2d, hrrr_lat2d, target_lon, target_lat, resolution,
+                      chunk_size=500000):
+    """Returns the (rows, columns, weights) of the sparse first-order
+    conservative remap from the HRRR subset to the target cells, and the
+    mask of the target cells fully covered by HRRR.
+
+    HRRR cell corners come from proc_scrip.calc_corners. Overlaps are
+    measured in the lon/lat plane, which is exact for the weights up to the
+    variation of cos(latitude) within one target cell.
+    """
+    import shapely
+    from proc_scrip import calc_corners
+
+    _, _, xo, yo = calc_corners(hrrr_lon2d.astype(np.float64),
+                                hrrr_lat2d.astype(np.float64))
+    sources = shapely.polygons(np.stack([xo, yo], axis=-1))
+    tree = shapely.STRtree(sources)
+    target_lon2d, target_lat2d = np.meshgrid(target_lon.astype(np.float64),
+                                             target_lat.astype(np.float64))
+    lon = target_lon2d.ravel()
+    lat = target_lat2d.ravel()
+    half = resolution / 2
+
+    rows, cols, areas = [], [], []
+    for start in range(0, len(lon), chunk_size):
+        stop = start + chunk_size
+        targets = shapely.box(lon[start:stop] - half, lat[start:stop] - half,
+                              lon[start:stop] + half, lat[start:stop] + half)
+        tgt, src = tree.query(targets, predicate='intersects')
+        area = shapely.area(shapely.intersection(targets[tgt], sources[src]))
+        keep = area > 0
+        rows.append(tgt[keep] + start)
+        cols.append(src[keep])
+        areas.append(area[keep])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    areas = np.concatenate(areas)
+
+    covered = np.bincount(rows, weights=areas, minlength=len(lon))
+    hrrr_valid_mask = covered >= (1 - 1e-3) * resolution**2
+    keep = hrrr_valid_mask[rows]
+    rows, cols, areas = rows[keep], cols[keep], areas[keep]
+    return (rows, cols, areas / covered[rows],
+            hrrr_valid_mask.reshape(target_lon2d.shape))
+
+
+def hrrr_csr(rows, cols, weights, n_target):
+    """CSR arrays of the (n_target, n_source) HRRR remap matrix."""
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(n_target + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_target), out=indptr[1:])
+    return {
+        'hrrr_weights': weights[order].astype(np.float32),
+        'hrrr_columns': cols[order].astype(np.int32),
+        'hrrr_indptr': indptr,
+    }
+
+
+def _linear_stencil(grid, x):
+    """Lower neighbor index and fractional distance of x on an ascending
+    1D grid; NaN outside of it."""
+    i = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, len(grid) - 2)
+    w = (x - grid[i]) / (grid[i + 1] - grid[i])
+    w[(x < grid[0]) | (x > grid[-1])] = np.nan
+    return i, w
+
+
+def gfs_bilinear_weights(gfs_lat_asc, gfs_lon, gfs_flip, target_lon, target_lat):
+    """Returns the (ny, nx, 4) flat GFS subset indices and bilinear weights
+    of every target point.
+
+    Indices refer to the subset as stored in the file, so the latitude flip
+    is folded in. Weights are NaN outside of the subset, as with a linear
+    RegularGridInterpolator filled with NaN.
+    """
+    nlat, nlon = len(gfs_lat_asc), len(gfs_lon)
+    i, wy = _linear_stencil(np.asarray(gfs_lat_asc, dtype=np.float64),
+                            np.asarray(target_lat, dtype=np.float64))
+    j, wx = _linear_stencil(np.asarray(gfs_lon, dtype=np.float64),
+                            np.asarray(target_lon, dtype=np.float64))
+    rows = np.stack([i, i, i + 1, i + 1], axis=-1)
+    if gfs_flip:
+        rows = nlat - 1 - rows
+    cols = np.stack([j, j + 1, j, j + 1], axis=-1)
+    indices = rows[:, None, :] * nlon + cols[None, :, :]
+    wy = wy[:, None, None]
+    wx = wx[None, :, None]
+    weights = np.concatenate([(1 - wy) * (1 - wx), (1 - wy) * wx,
+                              wy * (1 - wx), wy * wx], axis=-1)
+    return indices.astype(np.int32), weights.astype(np.float32)
+
+
+def apply_weights(field, indices, weights):
+    """Weighted sum of the source points of every target point. field is
+    (..., n_source), indices and weights are (n_target, k)."""
+    out = field[..., indices[:, 0]] * weights[:, 0]
+    for k in range(1, indices.shape[1]):
+        out += field[..., indices[:, k]] * weights[:, k]
+    return out
+
+
+def transition_weights(hrrr_valid_mask, resolution, width=TRANSITION_WIDTH):
+    """Weight of HRRR in the blend of every target point.
+
+    The weight ramps linearly from 0 at the HRRR edge to 1 at width
+    degrees inside of it, from the distance transform of the valid mask.
+    Edges of the target domain are not HRRR edges and are not tapered. A
+    width of 0 gives the hard switch of the valid mask.
+    """
+    if width <= 0:
+        return hrrr_valid_mask.astype(np.float32)
+    if hrrr_valid_mask.all():
+        # No HRRR edge inside the domain to taper from
+        return np.ones(hrrr_valid_mask.shape, np.float32)
+    cells = max(width / resolution, 1.)
+    distance = distance_transform_edt(hrrr_valid_mask)
+    return np.minimum(distance / cells, 1.).astype(np.float32)
+
+
+def grid_digest(*arrays):
+    """md5 of the values and shapes of the source and target grid arrays."""
+    md5 = hashlib.md5()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        md5.update(str(array.shape).encode())
+        md5.update(array.tobytes())
+    return md5.hexdigest()
+
+
+def weights_path(weights_dir, domain, resolution, hrrr_remap, digest):
+    return os.path.join(
+        weights_dir,
+        f"blend_weights_{domain}_{resolution:g}_{hrrr_remap}_{digest}.npz")
+
+
+def load_weights(path):
+    """Returns the arrays stored in path as a dict, or None if it does not
+    exist."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def save_weights(path, **arrays):
+    """Writes the arrays to path atomically, so that concurrent cycles never
+    read a partial file."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix='.npz', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def remap_weights(hrrr_lon2d, hrrr_lat2d, gfs_lat_asc, gfs_lon, gfs_flip,
+                  target_lon, target_lat, resolution, hrrr_remap='nearest'):
+    """Computes the sparse HRRR remap matrix and valid mask and the GFS
+    bilinear stencil of the target grid."""
+    target_lon2d, target_lat2d = np.meshgrid(target_lon, target_lat)
+    if min(hrrr_lon2d.shape) < 2:
+        hrrr_remap = 'nearest'  # no HRRR cells to interpolate in
+    print(f"Computing HRRR {hrrr_remap} weights...")
+    if hrrr_remap == 'bilinear':
+        rows, cols, weights, hrrr_valid_mask = hrrr_bilinear(
+            hrrr_lon2d, hrrr_lat2d, target_lon2d, target_lat2d)
+    elif hrrr_remap == 'conservative':
+        rows, cols, weights, hrrr_valid_mask = hrrr_conservative(
+            hrrr_lon2d, hrrr_lat2d, target_lon, target_lat, resolution)
+    else:
+        hrrr_indices, hrrr_valid_mask = hrrr_nearest(hrrr_lon2d, hrrr_lat2d,
+                                                     target_lon2d, target_lat2d)
+        rows = np.where(hrrr_valid_mask.ravel())[0]
+        cols = hrrr_indices.ravel()[rows]
+        weights = np.ones(len(rows))
+    del target_lon2d, target_lat2d
+    print("Computing GFS bilinear weights...")
+    gfs_indices, gfs_weights = gfs_bilinear_weights(gfs_lat_asc, gfs_lon, gfs_flip,
+                                                    target_lon, target_lat)
+    return {
+        **hrrr_csr(rows, cols, weights, hrrr_valid_mask.size),
+        'hrrr_valid_mask': hrrr_valid_mask,
+        'gfs_indices': gfs_indices,
+        'gfs_weights': gfs_weights,
+    }
+
+
+def output_chunks(ny, nx, n_times, chunks=None):
+    """Chunk shape (t, y, x) of the forcing variables, by default one time
+    step of full rows of at most CHUNK_MB MB and CHUNK_BANDS bands."""
+    if chunks is None:
+        rows = min(int(CHUNK_MB * MB / 4 / nx), -(-ny // CHUNK_BANDS))
+        chunks = (1, rows, nx)
+    return tuple(max(1, min(c, n)) for c, n in zip(chunks, (n_times, ny, nx)))
+
+
+def estimate_setup(hrrr_full_shape, hrrr_shape, ny, nx, hrrr_remap='nearest'):
+    """Estimated peak memory (MB) of the setup stages from the grid sizes."""
+    n_full = int(np.prod(hrrr_full_shape))
+    n_hrrr = int(np.prod(hrrr_shape))
+    return {
+        'subset': n_full * SUBSET_BYTES / MB,
+        'weights': (n_hrrr * SOURCE_BYTES[hrrr_remap]
+                    + ny * nx * TARGET_BYTES[hrrr_remap]) / MB,
+    }
+
+
+def plan_blend(ny, nx, n_times, n_vars, nprocs, max_memory, chunks=(1, 1, 1),
+               static_bytes=0):
+    """Plans the blend stage for a memory budget of max_memory MB.
+
+    Every worker and the parent hold a copy of the remap weights and grid
+    (static_bytes). Each worker blends one block at a time, and the parent
+    holds up to nprocs + 1 finished blocks: those waiting to be written and
+    the one being written. Workers are dropped while their copies would take
+    more than half of the budget, or while a single block of one output
+    chunk would not fit in the rest. Time blocks and tiles are then sized in
+    whole output chunks, so that every compressed chunk is written exactly
+    once, and shrunk until there are enough tasks to keep every worker busy.
+
+    Returns a dict with nprocs, time_block, tile_rows and the estimated
+    peak memory of the stage in MB, which is at most max_memory. Raises
+    ValueError if one output chunk does not fit in the budget.
+    """
+    budget = max_memory * MB
+    n_vars = max(n_vars, 1)
+
+    def block_points(nprocs):
+        """Largest block (in points) that fits nprocs workers."""
+        per_point = n_vars * (nprocs * BYTES_PER_POINT + (nprocs + 1) * BLOCK_BYTES)
+        return max(budget - (nprocs + 1) * static_bytes, 0) // per_point
+
+    chunk_points = chunks[0] * chunks[1] * nx
+    nprocs = max(1, nprocs)
+    while nprocs > 1 and ((nprocs + 1) * static_bytes > budget / 2
+                          or block_points(nprocs) < chunk_points):
+        nprocs -= 1
+    points = block_points(nprocs)
+    if points < chunk_points:
+        raise ValueError(
+            f"An output chunk of {chunks} does not fit in {max_memory} MB; "
+            "use smaller chunks or a larger memory budget")
+    tile_rows = min(ny, points // (chunks[0] * nx)) // chunks[1] * chunks[1]
+    time_block = min(n_times, points // (tile_rows * nx)) // chunks[0] * chunks[0]
+
+    def count():
+        return -(-n_times // time_block) * -(-ny // tile_rows)
+
+    def halve(size, chunk):
+        return max(chunk, -(-size // (2 * chunk)) * chunk)
+
+    while count() < 2 * nprocs and time_block > chunks[0]:
+        time_block = halve(time_block, chunks[0])
+    while count() < 2 * nprocs and tile_rows > chunks[1]:
+        tile_rows = halve(tile_rows, chunks[1])
+    nprocs = max(1, min(nprocs, count()))
+    points = time_block * tile_rows * nx
+    estimate = (nprocs + 1) * static_bytes + points * n_vars * (
+        nprocs * BYTES_PER_POINT + (nprocs + 1) * BLOCK_BYTES)
+    return {
+        'nprocs': nprocs,
+        'time_block': time_block,
+        'tile_rows': tile_rows,
+        'estimate': estimate / MB,
+    }
+
+
+def rss():
+    """Current resident set size (MB) of this process, NaN without /proc."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return float('nan')
+    return pages * os.sysconf('SC_PAGE_SIZE') / MB
+
+
+def reset_peak_rss():
+    """Resets the peak RSS of this process to its current RSS (Linux >= 4.0).
+
+    Returns False where the peak cannot be reset, in which case it stays the
+    high-water mark since the process started.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss():
+    """Peak resident set size (MB) of this process since the last
+    :func:`reset_peak_rss`, and of its finished child processes."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    own = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, children
+
+
+@contextmanager
+def stage(name, report, estimate=None):
+    """Times a stage and records its peak RSS, and its estimated memory if
+    given, in report[name].
+
+    The peak of the parent is reset on entry, so it is that of the stage.
+    Where it cannot be reset it is the peak since the process started and
+    is recorded as cumulative, without comparing it to the estimate. Only
+    the blend stage runs workers, so theirs is the peak of the stage.
+    """
+    per_stage = reset_peak_rss()
+    rss_start = rss()
+    start = time.time()
+    yield
+    own, children = peak_rss()
+    report[name] = {'seconds': time.time() - start, 'peak_rss': own,
+                    'peak_rss_cumulative': not per_stage,
+                    'rss_start': rss_start, 'rss_end': rss(),
+                    'workers_peak_rss': children, 'estimate': estimate}
+    line = f"  [{name}] {report[name]['seconds']:.1f} s, peak RSS {own:.0f} MB"
+    if not per_stage:
+        line += " since start"
+    if children:
+        line += f", workers {children:.0f} MB"
+    if estimate is not None and per_stage:
+        line += f" (estimated {estimate:.0f} MB)"
+    print(line)
+
+
+def _init_worker(hrrr_file, gfs_file, grid):
+    global _hrrr, _gfs, _grid, _hrrr_weights
+    _hrrr = Dataset(hrrr_file, 'r')
+    _gfs = Dataset(gfs_file, 'r')
+    _grid = grid
+    _hrrr_weights = csr_matrix(
+        (grid['hrrr_weights'], grid['hrrr_columns'], grid['hrrr_indptr']),
+        shape=(grid['hrrr_valid_mask'].size, grid['hrrr_nx'] * grid['hrrr_ny']))
+
+
+def blend_block(t0, t1, j0, j1):
+    """Blends time steps t0:t1 of target rows j0:j1 of every variable.
+
+    The HRRR window and remap rows, GFS stencil and time weights of the
+    block are set up once and shared by all variables, which are read one
+    hyperslab each and regridded and blended together. Returns a dict of
+    (t1 - t0, j1 - j0, nx) blocks by HRRR variable name.
+    """
+    g = _grid
+    variables = g['variables']
+    nv = len(variables)
+    nt = t1 - t0
+    nx = g['hrrr_valid_mask'].shape[1]
+    hrrr_valid_mask = g['hrrr_valid_mask'][j0:j1]
+
+    weights = _hrrr_weights[j0 * nx:j1 * nx]
+    if weights.nnz > 0:
+        # Re-index the remap rows of the tile onto the HRRR window they use
+        rows, cols = np.divmod(weights.indices, g['hrrr_nx'])
+        r0, r1 = rows.min(), rows.max() + 1
+        c0, c1 = cols.min(), cols.max() + 1
+        weights = csr_matrix(
+            (weights.data, (rows - r0) * (c1 - c0) + (cols - c0), weights.indptr),
+            shape=(weights.shape[0], (r1 - r0) * (c1 - c0)))
+        row_start = g['hrrr_row_slice'].start
+        col_start = g['hrrr_col_slice'].start
+        window = (slice(t0, t1), slice(row_start + r0, row_start + r1),
+                  slice(col_start + c0, col_start + c1))
+        hrrr_data = np.empty((nv * nt, weights.shape[1]), dtype=np.float32)
+        for v, (hrrr_name, _) in enumerate(variables):
+            hrrr_data[v * nt:(v + 1) * nt] = np.array(
+                _hrrr.variables[hrrr_name][window], dtype=np.float32).reshape(nt, -1)
+        hrrr_data[hrrr_data > 1e10] = np.nan
+        hrrr_regrid = np.asarray((weights @ hrrr_data.T).T, dtype=np.float32)
+        del hrrr_data
+    else:
+        # No HRRR point reaches the tile
+        hrrr_regrid = np.full((nv, nt, hrrr_valid_mask.size), np.nan, dtype=np.float32)
+    hrrr_regrid = hrrr_regrid.reshape((nv, nt) + hrrr_valid_mask.shape)
+
+    # GFS data: regrid the GFS times spanned by the block with the
+    # precomputed stencil, then interpolate in time
+    n_gfs_times = g['n_gfs_times']
+    gfs_t_idx = g['target_to_gfs_idx'][t0:t1]
+    t_low = np.floor(gfs_t_idx).astype(int)
+    t_high = np.ceil(gfs_t_idx).astype(int)
+    t_frac = gfs_t_idx - t_low
+    t_low = np.clip(t_low, 0, n_gfs_times - 1)
+    t_high = np.clip(t_high, 0, n_gfs_times - 1)
+    t_frac = np.where(t_low == t_high, 0., t_frac).astype(np.float32)[:, None, None]
+    tg0 = int(t_low.min())
+    tg1 = int(t_high.max()) + 1
+    window = (slice(tg0, tg1), g['gfs_lat_slice'], g['gfs_lon_slice'])
+    gfs_data = np.stack([
+        np.array(_gfs.variables[gfs_name][window], dtype=np.float32).reshape(tg1 - tg0, -1)
+        for _, gfs_name in variables])
+    gfs_regrid_times = apply_weights(
+        gfs_data, g['gfs_indices'][j0:j1].reshape(-1, 4),
+        g['gfs_weights'][j0:j1].reshape(-1, 4)
+    ).reshape((nv, tg1 - tg0) + hrrr_valid_mask.shape)
+    del gfs_data
+    gfs_regrid = ((1 - t_frac) * gfs_regrid_times[:, t_low - tg0]
+                  + t_frac * gfs_regrid_times[:, t_high - tg0])
+    del gfs_regrid_times
+
+    # Combine: gfs + w * (hrrr - gfs), with HRRR and then GFS filling the
+    # few points where the other one is missing
+    hrrr_weight = g['hrrr_weight'][j0:j1]
+    combined = hrrr_regrid - gfs_regrid
+    combined *= hrrr_weight
+    combined += gfs_regrid
+    missing = np.isnan(combined)
+    if np.any(missing):
+        fill = np.where(np.isnan(hrrr_regrid) | (hrrr_weight == 0), gfs_regrid, hrrr_regrid)
+        combined[missing] = fill[missing]
+    return t0, j0, {hrrr_name: combined[v]
+                    for v, (hrrr_name, _) in enumerate(variables)}
+
+
+def _blend_task(args):
+    return blend_block(*args)
+
+
+def imap_bounded(pool, func, tasks, max_pending):
+    """Like pool.imap_unordered, but with at most max_pending tasks submitted
+    and not yet consumed, so that finished blocks do not pile up in the
+    parent when writing is slower than blending."""
+    done = queue.SimpleQueue()
+    tasks = iter(tasks)
+    pending = 0
+    for task in islice(tasks, max_pending):
+        pool.apply_async(func, (task,), callback=done.put, error_callback=done.put)
+        pending += 1
+    while pending:
+        result = done.get()
+        pending -= 1
+        if isinstance(result, BaseException):
+            raise result
+        for task in islice(tasks, 1):
+            pool.apply_async(func, (task,), callback=done.put,
+                             error_callback=done.put)
+            pending += 1
+        yield result
+
+
+def compression_kwargs(compression='zlib', complevel=1):
+    """createVariable keywords of a compression method."""
+    if compression in (None, 'none'):
+        return {}
+    if compression == 'zlib':
+        return {'zlib': True, 'complevel': complevel, 'shuffle': True}
+    return {'compression': compression, 'complevel': complevel, 'shuffle': True}
+
+
+def create_output(path, hrrr_time, target_lon, target_lat, hrrr_valid_mask,
+                  hrrr_weight, variables, chunks=None, compression='zlib',
+                  complevel=1, significant_digits=None):
+    """Creates the output file with the coordinates, the data source mask
+    and HRRR weight, and the (empty) forcing variables."""
+    target_lon2d, target_lat2d = np.meshgrid(target_lon, target_lat)
+    ny, nx = target_lat2d.shape
+
+    ncout = Dataset(path, 'w', format='NETCDF4')
+    ncout.createDimension('time', None)
+    ncout.createDimension('y', ny)
+    ncout.createDimension('x', nx)
+
+    time_var = ncout.createVariable('time', 'f8', ('time',))
+    time_var.units = 'seconds since 1970-01-01 00:00:00'
+    time_var.calendar = 'standard'
+    time_var.axis = 'T'
+    time_var[:] = hrrr_time
+
+    encoding = compression_kwargs(compression, complevel)
+
+    lat_var = ncout.createVariable('latitude', 'f4', ('y', 'x'), **encoding)
+    lat_var.units = 'degrees_north'
+    lat_var.long_name = 'latitude'
+    lat_var.axis = 'Y'
+    lat_var.standard_name = 'latitude'
+    lat_var[:] = target_lat2d
+
+    lon_var = ncout.createVariable('longitude', 'f4', ('y', 'x'), **encoding)
+    lon_var.units = 'degrees_east'
+    lon_var.long_name = 'longitude'
+    lon_var.axis = 'X'
+    lon_var.standard_name = 'longitude'
+    lon_var[:] = target_lon2d
+
+    source_var = ncout.createVariable('data_source', 'i1', ('y', 'x'), **encoding)
+    source_var.long_name = 'Data source (1=HRRR, 0=GFS)'
+    source_var[:] = hrrr_valid_mask.astype(np.int8)
+
+    weight_var = ncout.createVariable('hrrr_weight', 'f4', ('y', 'x'), **encoding)
+    weight_var.long_name = 'Weight of HRRR in the blend (1=HRRR, 0=GFS)'
+    weight_var[:] = hrrr_weight
+
+    ncout.title = 'Blended HRRR+GFS Forcing for CDEPS/DATM'
+    ncout.source = 'HRRR (CONUS) + GFS (gap fill)'
+    ncout.history = f'Created {datetime.now().strftime("%Y-%m-%d %H:%M UTC")}'
+    ncout.Conventions = 'CF-1.6'
+
+    if significant_digits is not None:
+        encoding['significant_digits'] = significant_digits
+    for hrrr_name, units, long_name in variables:
+        out_var = ncout.createVariable(hrrr_name, 'f4', ('time', 'y', 'x'),
+                                       fill_value=9.999e+20, chunksizes=chunks,
+                                       **encoding)
+        out_var.short_name = hrrr_name
+        out_var.units = units
+        out_var.long_name = long_name
+    return ncout
+
+
+def blend(hrrr_file, gfs_file, output_file, domain, resolution=0.025,
+          nprocs=None, max_memory=4000, weights_dir=None, hrrr_remap='nearest',
+          compression='zlib', complevel=1, significant_digits=None, chunks=None,
+          transition_width=TRANSITION_WIDTH):
+    """Blends HRRR and GFS forcing onto the regular grid of a domain preset.
+
+    Returns a dict of the seconds, peak RSS and estimated memory (MB) of
+    every stage.
+    """
+    bounds = DOMAINS[domain]
+    nprocs = len(os.sched_getaffinity(0)) if nprocs is None else nprocs
+    report = {}
+
+    target_lon, target_lat = target_grid(bounds, resolution)
+    ny, nx = len(target_lat), len(target_lon)
+
+    print("Loading HRRR coordinates...")
+    with Dataset(hrrr_file, 'r') as hrrr:
+        hrrr_full_shape = hrrr.variables['longitude'].shape
+        hrrr_time = np.array(hrrr.variables['time'][:])
+        hrrr_meta = {name: (getattr(var, 'units', ''), getattr(var, 'long_name', name))
+                     for name, var in hrrr.variables.items()}
+        estimate = estimate_setup(hrrr_full_shape, hrrr_full_shape, ny, nx, hrrr_remap)
+        print("Subsetting HRRR to target domain...")
+        with stage('subset', report, estimate['subset']):
+            hrrr_row_slice, hrrr_col_slice, hrrr_lon2d, hrrr_lat2d = subset_hrrr(hrrr, bounds)
+    n_times = len(hrrr_time)
+    print(f"  HRRR times: {n_times}")
+
+    print("Loading GFS...")
+    with Dataset(gfs_file, 'r') as gfs:
+        gfs_time = np.array(gfs.variables['time'][:])
+        gfs_lat_slice, gfs_lon_slice, gfs_lat_asc, gfs_lon, gfs_flip = subset_gfs(gfs, bounds)
+        gfs_names = set(gfs.variables)
+
+    print("Creating target grid...")
+    print(f"  Grid: {ny} x {nx} = {ny*nx:,} points")
+
+    # The remap weights only depend on the grids, so they are reused across
+    # cycles when a weights directory is given.
+    estimate = estimate_setup(hrrr_full_shape, hrrr_lon2d.shape, ny, nx, hrrr_remap)
+    with stage('weights', report, estimate['weights']):
+        weights = path = None
+        if weights_dir is not None:
+            digest = grid_digest(
+                hrrr_lon2d, hrrr_lat2d,
+                [hrrr_row_slice.start, hrrr_row_slice.stop,
+                 hrrr_col_slice.start, hrrr_col_slice.stop],
+                gfs_lat_asc, gfs_lon, [gfs_flip], target_lon, target_lat)
+            path = weights_path(weights_dir, domain, resolution, hrrr_remap, digest)
+            weights = load_weights(path)
+            if weights is not None:
+                print(f"Read remap weights from {path}")
+        if weights is None:
+            weights = remap_weights(hrrr_lon2d, hrrr_lat2d, gfs_lat_asc, gfs_lon,
+                                    gfs_flip, target_lon, target_lat, resolution,
+                                    hrrr_remap)
+            if path is not None:
+                save_weights(path, **weights)
+                print(f"  Saved remap weights to {path}")
+    hrrr_valid_mask = weights['hrrr_valid_mask']
+    print(f"  HRRR coverage: {100*np.sum(hrrr_valid_mask)/hrrr_valid_mask.size:.1f}%")
+    hrrr_weight = transition_weights(hrrr_valid_mask, resolution, transition_width)
+
+    print("Setting up GFS temporal interpolation...")
+    gfs_time_interp = interp1d(gfs_time, np.arange(len(gfs_time)),
+                               kind='linear', bounds_error=False, fill_value='extrapolate')
+    target_to_gfs_idx = gfs_time_interp(hrrr_time)
+
+    variables = []
+    for hrrr_name, gfs_name in VARIABLES:
+        if hrrr_name not in hrrr_meta or gfs_name not in gfs_names:
+            print(f"  Skipping {hrrr_name}")
+            continue
+        variables.append((hrrr_name, gfs_name))
+
+    grid = {
+        'hrrr_row_slice': hrrr_row_slice,
+        'hrrr_col_slice': hrrr_col_slice,
+        'hrrr_ny': hrrr_lon2d.shape[0],
+        'hrrr_nx': hrrr_lon2d.shape[1],
+        'gfs_lat_slice': gfs_lat_slice,
+        'gfs_lon_slice': gfs_lon_slice,
+        'n_gfs_times': len(gfs_time),
+        'target_to_gfs_idx': target_to_gfs_idx,
+        'variables': variables,
+        'hrrr_weight': hrrr_weight,
+        **weights,
+    }
+    initargs = (hrrr_file, gfs_file, grid)
+    del hrrr_lon2d, hrrr_lat2d
+
+    chunks = output_chunks(ny, nx, n_times, chunks)
+    plan = plan_blend(
+        ny, nx, n_times, len(variables), nprocs, max_memory, chunks,
+        static_bytes=sum(getattr(value, 'nbytes', 0) for value in grid.values()))
+    nprocs = plan['nprocs']
+    time_block, tile_rows = plan['time_block'], plan['tile_rows']
+    tasks = [(t0, min(t0 + time_block, n_times), j0, min(j0 + tile_rows, ny))
+             for t0 in range(0, n_times, time_block)
+             for j0 in range(0, ny, tile_rows)]
+    print(f"  {len(tasks)} tasks of {time_block} time steps x {tile_rows} rows "
+          f"on {nprocs} processes")
+    print(f"  Output chunks {chunks}, compression: {compression}")
+
+    print(f"Processing {len(variables)} variables...")
+    with stage('blend', report, plan['estimate']):
+        # The pool is started before the output is opened so that no worker
+        # inherits an open HDF5 handle.
+        if nprocs == 1:
+            _init_worker(*initargs)
+            pool = None
+            results = map(_blend_task, tasks)
+        else:
+            pool = Pool(processes=nprocs, initializer=_init_worker, initargs=initargs)
+            # one task per worker plus the block being written
+            results = imap_bounded(pool, _blend_task, tasks, nprocs)
+
+        try:
+            ncout = create_output(
+                output_file, hrrr_time, target_lon, target_lat, hrrr_valid_mask,
+                hrrr_weight, [(hrrr_name,) + hrrr_meta[hrrr_name] for hrrr_name, _ in variables],
+                chunks=chunks, compression=compression, complevel=complevel,
+                significant_digits=significant_digits)
+            for done, (t0, j0, blocks) in enumerate(results, 1):
+                for hrrr_name, combined in blocks.items():
+                    nt, nrows = combined.shape[:2]
+                    ncout.variables[hrrr_name][t0:t0 + nt, j0:j0 + nrows, :] = combined
+                print(f"  block {done}/{len(tasks)} done")
+            ncout.close()
+        except BaseException:
+            if pool is not None:
+                pool.terminate()
+            raise
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    print(f"\nOutput: {output_file}")
+    return report
@@ -1,265 +1,116 @@
 #!/usr/bin/env python
 """
 Blend HRRR and GFS forcing files for CDEPS/DATM.
-Memory-optimized version for WCOSS2.
+Memory-optimized version for WCOSS2, see blend.py.
 
 Usage:
     python blend_hrrr_gfs.py HRRR_FILE GFS_FILE OUTPUT_FILE DOMAIN [RESOLUTION]
+                             [--nprocs N] [--max-memory MB] [--weights-dir DIR]
+                             [--hrrr-remap nearest|bilinear|conservative]
+                             [--compression none|zlib|zstd] [--complevel N]
+                             [--significant-digits N] [--chunks T,Y,X]
+                             [--transition-width DEG]
 
 Arguments:
-    HRRR_FILE   - Input HRRR forcing NetCDF file
-    GFS_FILE    - Input GFS forcing NetCDF file
-    OUTPUT_FILE - Output blended NetCDF file
-    DOMAIN      - Domain preset: ATLANTIC, SECOFS, STOFS3D_ATL
-    RESOLUTION  - Grid resolution in degrees (default: 0.025)
+    HRRR_FILE    - Input HRRR forcing NetCDF file
+    GFS_FILE     - Input GFS forcing NetCDF file
+    OUTPUT_FILE  - Output blended NetCDF file
+    DOMAIN       - Domain preset: ATLANTIC, SECOFS, STOFS3D_ATL
+    RESOLUTION   - Grid resolution in degrees (default: 0.025)
+    --nprocs     - Worker processes (default: $BLEND_NPROCS or all cores)
+    --max-memory - Memory budget in MB; the number of workers, time block
+                   and tile sizes are planned to fit it
+                   (default: $BLEND_MAX_MEMORY_MB or 4000)
+    --weights-dir - Directory caching the HRRR and GFS remap weights across
+                    cycles (default: $BLEND_WEIGHTS_DIR, no caching if unset)
+    --hrrr-remap  - HRRR regridding: nearest neighbor within 0.1°, bilinear
+                    on the curvilinear grid, or first-order conservative
+                    (default: $BLEND_HRRR_REMAP or nearest)
+    --compression - Output compression, with byte shuffle
+                    (default: $BLEND_COMPRESSION or zlib)
+    --complevel   - Compression level (default: 1)
+    --significant-digits - Quantize the forcing to N significant digits
+                    before compression (default: $BLEND_SIGNIFICANT_DIGITS,
+                    lossless if unset)
+    --chunks      - Output chunk shape of the forcing variables (default:
+                    one time step of row bands of at most ~4 MB and at
+                    least 8 bands per domain, matching the per time step
+                    reads of CDEPS)
+    --transition-width - Width in degrees inside the HRRR edge over which
+                    the blend tapers from GFS to HRRR; 0 switches sharply
+                    (default: $BLEND_TRANSITION_WIDTH or 0.25)
 """
 
-import numpy as np
-from netCDF4 import Dataset
-from scipy.spatial import cKDTree
-from scipy.interpolate import RegularGridInterpolator, interp1d
-from datetime import datetime
+import argparse
+import os
 import sys
-import gc
 
-# Parse arguments
-if len(sys.argv) < 5:
-    print("Usage: python blend_hrrr_gfs.py HRRR_FILE GFS_FILE OUTPUT_FILE DOMAIN [RESOLUTION]")
-    sys.exit(1)
-
-HRRR_FILE = sys.argv[1]
-GFS_FILE = sys.argv[2]
-OUTPUT_FILE = sys.argv[3]
-DOMAIN = sys.argv[4]
-RESOLUTION = float(sys.argv[5]) if len(sys.argv) > 5 else 0.025
-
-# Domain bounds
-DOMAINS = {
-    'ATLANTIC': (-98.0, -55.0, 10.0, 53.0),
-    'SECOFS': (-82.0, -73.0, 23.0, 37.0),
-    'STOFS3D_ATL': (-99.0, -52.0, 7.0, 53.0),
-}
-
-if DOMAIN not in DOMAINS:
-    print(f"ERROR: Unknown domain {DOMAIN}. Use: ATLANTIC, SECOFS, STOFS3D_ATL")
-    sys.exit(1)
-
-TARGET_LON_MIN, TARGET_LON_MAX, TARGET_LAT_MIN, TARGET_LAT_MAX = DOMAINS[DOMAIN]
-TARGET_DLON = RESOLUTION
-TARGET_DLAT = RESOLUTION
-BUFFER = 1.0
-
-print("============================================")
-print("HRRR + GFS Blending for CDEPS/DATM")
-print("============================================")
-print(f"HRRR input:   {HRRR_FILE}")
-print(f"GFS input:    {GFS_FILE}")
-print(f"Output:       {OUTPUT_FILE}")
-print(f"Domain:       {DOMAIN}")
-print(f"Resolution:   {RESOLUTION}°")
-print(f"Bounds:       {TARGET_LAT_MIN}°N-{TARGET_LAT_MAX}°N, {TARGET_LON_MIN}°E-{TARGET_LON_MAX}°E")
-print("============================================")
-
-print("Loading HRRR coordinates...")
-hrrr = Dataset(HRRR_FILE, 'r')
-hrrr_lon2d_full = hrrr.variables['longitude'][:]
-hrrr_lat2d_full = hrrr.variables['latitude'][:]
-hrrr_lon2d_full = np.where(hrrr_lon2d_full > 180, hrrr_lon2d_full - 360, hrrr_lon2d_full)
-hrrr_time = np.array(hrrr.variables['time'][:])
-n_times = len(hrrr_time)
-print(f"  HRRR full grid: {hrrr_lon2d_full.shape}, {n_times} times")
-
-# Subset HRRR to target domain + buffer (memory optimization)
-print("Subsetting HRRR to target domain...")
-hrrr_mask = ((hrrr_lon2d_full >= TARGET_LON_MIN - BUFFER) &
-             (hrrr_lon2d_full <= TARGET_LON_MAX + BUFFER) &
-             (hrrr_lat2d_full >= TARGET_LAT_MIN - BUFFER) &
-             (hrrr_lat2d_full <= TARGET_LAT_MAX + BUFFER))
-
-# Find bounding box indices for HRRR subset
-rows_with_data = np.any(hrrr_mask, axis=1)
-cols_with_data = np.any(hrrr_mask, axis=0)
-if np.any(rows_with_data) and np.any(cols_with_data):
-    row_min, row_max = np.where(rows_with_data)[0][[0, -1]]
-    col_min, col_max = np.where(cols_with_data)[0][[0, -1]]
-    hrrr_row_slice = slice(row_min, row_max + 1)
-    hrrr_col_slice = slice(col_min, col_max + 1)
-    hrrr_lon2d = np.array(hrrr_lon2d_full[hrrr_row_slice, hrrr_col_slice], dtype=np.float32)
-    hrrr_lat2d = np.array(hrrr_lat2d_full[hrrr_row_slice, hrrr_col_slice], dtype=np.float32)
-    print(f"  HRRR subset: {hrrr_lon2d.shape} (reduced from {hrrr_lon2d_full.shape})")
-else:
-    print("  WARNING: No HRRR data in target domain, using GFS only")
-    hrrr_lon2d = np.array([[TARGET_LON_MIN]])
-    hrrr_lat2d = np.array([[0.0]])  # Outside domain
-    hrrr_row_slice = slice(0, 1)
-    hrrr_col_slice = slice(0, 1)
-
-# Free full arrays
-del hrrr_lon2d_full, hrrr_lat2d_full, hrrr_mask
-gc.collect()
-
-print("Loading GFS...")
-gfs = Dataset(GFS_FILE, 'r')
-gfs_lat_full = np.array(gfs.variables['latitude'][:], dtype=np.float32)
-gfs_lon_full = np.array(gfs.variables['longitude'][:], dtype=np.float32)
-gfs_time = np.array(gfs.variables['time'][:])
-gfs_lon_180 = np.where(gfs_lon_full > 180, gfs_lon_full - 360, gfs_lon_full)
-
-# Subset GFS to domain
-lat_mask = (gfs_lat_full >= TARGET_LAT_MIN - 1) & (gfs_lat_full <= TARGET_LAT_MAX + 1)
-lon_mask = (gfs_lon_180 >= TARGET_LON_MIN - 1) & (gfs_lon_180 <= TARGET_LON_MAX + 1)
-gfs_lat_idx = np.where(lat_mask)[0]
-gfs_lon_idx = np.where(lon_mask)[0]
-gfs_lat = gfs_lat_full[lat_mask]
-gfs_lon = gfs_lon_180[lon_mask]
-print(f"  GFS subset: {len(gfs_lat)} x {len(gfs_lon)}")
-
-print("Creating target grid...")
-target_lon = np.arange(TARGET_LON_MIN, TARGET_LON_MAX + TARGET_DLON/2, TARGET_DLON, dtype=np.float32)
-target_lat = np.arange(TARGET_LAT_MIN, TARGET_LAT_MAX + TARGET_DLAT/2, TARGET_DLAT, dtype=np.float32)
-target_lon2d, target_lat2d = np.meshgrid(target_lon, target_lat)
-ny, nx = len(target_lat), len(target_lon)
-print(f"  Grid: {ny} x {nx} = {ny*nx:,} points")
-
-print("Building HRRR spatial index (subset only)...")
-hrrr_points = np.column_stack([hrrr_lon2d.ravel(), hrrr_lat2d.ravel()])
-hrrr_tree = cKDTree(hrrr_points)
-target_points_flat = np.column_stack([target_lon2d.ravel(), target_lat2d.ravel()])
-distances, hrrr_indices = hrrr_tree.query(target_points_flat)
-hrrr_indices = hrrr_indices.reshape(ny, nx)
-distances = distances.reshape(ny, nx)
-
-# HRRR valid mask: use HRRR where distance < 0.1 deg and within lat range
-hrrr_lat_min = float(hrrr_lat2d.min())
-hrrr_lat_max = float(hrrr_lat2d.max())
-hrrr_valid_mask = (distances < 0.1) & (target_lat2d >= hrrr_lat_min) & (target_lat2d <= hrrr_lat_max)
-print(f"  HRRR coverage: {100*np.sum(hrrr_valid_mask)/hrrr_valid_mask.size:.1f}%")
-
-# Free memory
-del hrrr_points, target_points_flat, distances
-gc.collect()
-
-print("Setting up GFS temporal interpolation...")
-gfs_time_interp = interp1d(gfs_time, np.arange(len(gfs_time)),
-                            kind='linear', bounds_error=False, fill_value='extrapolate')
-target_to_gfs_idx = gfs_time_interp(hrrr_time)
-
-print("Creating output NetCDF...")
-ncout = Dataset(OUTPUT_FILE, 'w', format='NETCDF4')
-ncout.createDimension('time', None)
-ncout.createDimension('y', ny)
-ncout.createDimension('x', nx)
-
-time_var = ncout.createVariable('time', 'f8', ('time',))
-time_var.units = 'seconds since 1970-01-01 00:00:00'
-time_var.calendar = 'standard'
-time_var.axis = 'T'
-time_var[:] = hrrr_time
-
-lat_var = ncout.createVariable('latitude', 'f4', ('y', 'x'))
-lat_var.units = 'degrees_north'
-lat_var.long_name = 'latitude'
-lat_var.axis = 'Y'
-lat_var.standard_name = 'latitude'
-lat_var[:] = target_lat2d
-
-lon_var = ncout.createVariable('longitude', 'f4', ('y', 'x'))
-lon_var.units = 'degrees_east'
-lon_var.long_name = 'longitude'
-lon_var.axis = 'X'
-lon_var.standard_name = 'longitude'
-lon_var[:] = target_lon2d
-
-source_var = ncout.createVariable('data_source', 'i1', ('y', 'x'))
-source_var.long_name = 'Data source (1=HRRR, 0=GFS)'
-source_var[:] = hrrr_valid_mask.astype(np.int8)
-
-ncout.title = 'Blended HRRR+GFS Forcing for CDEPS/DATM'
-ncout.source = 'HRRR (CONUS) + GFS (gap fill)'
-ncout.history = f'Created {datetime.now().strftime("%Y-%m-%d %H:%M UTC")}'
-ncout.Conventions = 'CF-1.6'
-
-# Variable mapping (HRRR name -> GFS name)
-VARIABLES = [
-    ('UGRD_10maboveground', 'UGRD_10maboveground'),
-    ('VGRD_10maboveground', 'VGRD_10maboveground'),
-    ('TMP_2maboveground', 'TMP_2maboveground'),
-    ('SPFH_2maboveground', 'SPFH_2maboveground'),
-    ('PRATE_surface', 'PRATE_surface'),
-    ('DSWRF_surface', 'DSWRF_surface'),
-    ('DLWRF_surface', 'DLWRF_surface'),
-    ('MSLMA_meansealevel', 'PRMSL_meansealevel'),
-]
-
-# GFS lat order
-if gfs_lat[0] > gfs_lat[-1]:
-    gfs_lat_asc = gfs_lat[::-1]
-    gfs_flip = True
-else:
-    gfs_lat_asc = gfs_lat
-    gfs_flip = False
-
-print("Processing variables...")
-for hrrr_name, gfs_name in VARIABLES:
-    if hrrr_name not in hrrr.variables or gfs_name not in gfs.variables:
-        print(f"  Skipping {hrrr_name}")
-        continue
-
-    print(f"  {hrrr_name}...", end='', flush=True)
-
-    hrrr_var = hrrr.variables[hrrr_name]
-    gfs_var = gfs.variables[gfs_name]
-
-    out_var = ncout.createVariable(hrrr_name, 'f4', ('time', 'y', 'x'), fill_value=9.999e+20)
-    out_var.short_name = hrrr_name
-    out_var.units = hrrr_var.units if hasattr(hrrr_var, 'units') else ''
-    out_var.long_name = hrrr_var.long_name if hasattr(hrrr_var, 'long_name') else hrrr_name
-
-    for t in range(n_times):
-        # HRRR data - read only the subset
-        hrrr_data = np.array(hrrr_var[t, hrrr_row_slice, hrrr_col_slice], dtype=np.float32).ravel()
-        hrrr_data = np.where(hrrr_data > 1e10, np.nan, hrrr_data)
-        hrrr_regrid = hrrr_data[hrrr_indices]
-
-        # GFS data with temporal interpolation
-        gfs_t_idx = target_to_gfs_idx[t]
-        t_low = int(np.floor(gfs_t_idx))
-        t_high = int(np.ceil(gfs_t_idx))
-        t_frac = gfs_t_idx - t_low
-        t_low = max(0, min(t_low, len(gfs_time) - 1))
-        t_high = max(0, min(t_high, len(gfs_time) - 1))
-
-        gfs_data_low = np.array(gfs_var[t_low, gfs_lat_idx[0]:gfs_lat_idx[-1]+1, gfs_lon_idx[0]:gfs_lon_idx[-1]+1], dtype=np.float32)
-        gfs_data_high = np.array(gfs_var[t_high, gfs_lat_idx[0]:gfs_lat_idx[-1]+1, gfs_lon_idx[0]:gfs_lon_idx[-1]+1], dtype=np.float32)
-
-        if t_low == t_high:
-            gfs_data = gfs_data_low
-        else:
-            gfs_data = (1 - t_frac) * gfs_data_low + t_frac * gfs_data_high
-
-        if gfs_flip:
-            gfs_data = gfs_data[::-1, :]
-
-        gfs_interp = RegularGridInterpolator(
-            (gfs_lat_asc, gfs_lon), gfs_data,
-            method='linear', bounds_error=False, fill_value=np.nan
-        )
-        gfs_regrid = gfs_interp(np.column_stack([target_lat2d.ravel(),
-                                                  target_lon2d.ravel()])).reshape(ny, nx)
-
-        # Combine: HRRR where valid, GFS elsewhere
-        combined = np.where(hrrr_valid_mask & ~np.isnan(hrrr_regrid), hrrr_regrid, gfs_regrid)
-        out_var[t, :, :] = combined
-
-        # Free memory each timestep
-        del hrrr_data, hrrr_regrid, gfs_data_low, gfs_data_high, gfs_data, gfs_regrid, combined
-
-    gc.collect()
-    print(" done")
-
-ncout.close()
-hrrr.close()
-gfs.close()
-
-print(f"\nOutput: {OUTPUT_FILE}")
-print("SUCCESS!")
+from blend import (COMPRESSIONS, DOMAINS, HRRR_REMAP_METHODS, TRANSITION_WIDTH,
+                   blend)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Blend HRRR and GFS forcing files for CDEPS/DATM')
+    parser.add_argument('hrrr_file', help='Input HRRR forcing NetCDF file')
+    parser.add_argument('gfs_file', help='Input GFS forcing NetCDF file')
+    parser.add_argument('output_file', help='Output blended NetCDF file')
+    parser.add_argument('domain', help='Domain preset: ATLANTIC, SECOFS, STOFS3D_ATL')
+    parser.add_argument('resolution', type=float, nargs='?', default=0.025,
+                        help='Grid resolution in degrees (default: 0.025)')
+    parser.add_argument('--nprocs', type=int,
+                        default=os.environ.get('BLEND_NPROCS'),
+                        help='Worker processes (default: $BLEND_NPROCS or all cores)')
+    parser.add_argument('--max-memory', type=float,
+                        default=os.environ.get('BLEND_MAX_MEMORY_MB', 4000),
+                        help='Memory budget in MB (default: 4000)')
+    parser.add_argument('--weights-dir',
+                        default=os.environ.get('BLEND_WEIGHTS_DIR'),
+                        help='Directory caching the remap weights across cycles')
+    parser.add_argument('--hrrr-remap', choices=HRRR_REMAP_METHODS,
+                        default=os.environ.get('BLEND_HRRR_REMAP', 'nearest'),
+                        help='HRRR regridding method (default: nearest)')
+    parser.add_argument('--compression', choices=COMPRESSIONS,
+                        default=os.environ.get('BLEND_COMPRESSION', 'zlib'),
+                        help='Output compression (default: zlib)')
+    parser.add_argument('--complevel', type=int, default=1,
+                        help='Compression level (default: 1)')
+    parser.add_argument('--significant-digits', type=int,
+                        default=os.environ.get('BLEND_SIGNIFICANT_DIGITS'),
+                        help='Quantize to N significant digits (default: lossless)')
+    parser.add_argument('--chunks', default=None,
+                        type=lambda value: tuple(int(c) for c in value.split(',')),
+                        help='Output chunk shape T,Y,X of the forcing variables')
+    parser.add_argument('--transition-width', type=float,
+                        default=os.environ.get('BLEND_TRANSITION_WIDTH', TRANSITION_WIDTH),
+                        help='HRRR to GFS transition width in degrees (default: 0.25)')
+    args = parser.parse_args()
+
+    if args.domain not in DOMAINS:
+        print(f"ERROR: Unknown domain {args.domain}. Use: ATLANTIC, SECOFS, STOFS3D_ATL")
+        sys.exit(1)
+
+    bounds = DOMAINS[args.domain]
+    print("============================================")
+    print("HRRR + GFS Blending for CDEPS/DATM")
+    print("============================================")
+    print(f"HRRR input:   {args.hrrr_file}")
+    print(f"GFS input:    {args.gfs_file}")
+    print(f"Output:       {args.output_file}")
+    print(f"Domain:       {args.domain}")
+    print(f"Resolution:   {args.resolution}°")
+    print(f"HRRR remap:   {args.hrrr_remap}")
+    print(f"Bounds:       {bounds[2]}°N-{bounds[3]}°N, {bounds[0]}°E-{bounds[1]}°E")
+    print("============================================")
+
+    blend(args.hrrr_file, args.gfs_file, args.output_file, args.domain,
+          args.resolution, nprocs=args.nprocs, max_memory=args.max_memory,
+          weights_dir=args.weights_dir, hrrr_remap=args.hrrr_remap,
+          compression=args.compression, complevel=args.complevel,
+          significant_digits=args.significant_digits, chunks=args.chunks,
+          transition_width=args.transition_width)
+    print("SUCCESS!")
+
+
+if __name__ == '__main__':
+    main()
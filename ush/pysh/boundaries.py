@@ -1,8 +1,9 @@
+from collections import defaultdict
 from typing import List, Union
 
 import numpy as np
 import geopandas as gpd
-from shapely.geometry import LineString
+import shapely
 
 # from pyschism.forcing.bctides.mod3d import TEM_3D, SAL_3D
 # from pyschism.forcing.bctides.nudge import TEM_Nudge, SAL_Nudge
@@ -15,88 +16,127 @@ from shapely.geometry import LineString
 # from pyschism.forcing.bctides.itrtype import Itrtype
 
 
+class BoundaryTable:
+    """Node indexes of a group of boundaries as one flat int array.
+
+    The nodes of boundary ``i`` are ``indexes[offsets[i]:offsets[i + 1]]``.
+    LineString geometries are only built when :attr:`gdf` is first accessed.
+    """
+
+    def __init__(self, hgrid, kind, ids, ibtypes, index_ids, node_ids):
+        self.hgrid = hgrid
+        self.kind = kind
+        self.ids = ids
+        self.ibtypes = ibtypes
+        self.index_ids = index_ids
+        lengths = [len(n) for n in node_ids]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(int)
+        if len(node_ids) > 0:
+            self.indexes = hgrid.nodes.get_indexes_by_ids(
+                np.concatenate([np.asarray(n) for n in node_ids]))
+        else:
+            self.indexes = np.empty(0, dtype=int)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.get_indexes(i)
+
+    def get_indexes(self, i):
+        return self.indexes[self.offsets[i]:self.offsets[i + 1]]
+
+    @property
+    def gdf(self):
+        return self.hgrid.cache.get(
+            ("boundaries", self.kind), self._build_gdf, depends=("coords",))
+
+    def _build_gdf(self):
+        columns = ["id", "index_id", "indexes"]
+        if self.ibtypes is not None:
+            columns.insert(1, "ibtype")
+        if len(self) == 0:
+            return gpd.GeoDataFrame(columns=columns, geometry=[],
+                                    crs=self.hgrid.crs)
+        data = {"id": self.ids}
+        if self.ibtypes is not None:
+            data["ibtype"] = self.ibtypes
+        data["index_id"] = self.index_ids
+        data["indexes"] = [list(indexes) for indexes in self]
+        geometry = shapely.linestrings(
+            self.hgrid.vertices[self.indexes],
+            indices=np.repeat(np.arange(len(self)), np.diff(self.offsets)),
+        )
+        return gpd.GeoDataFrame(data, geometry=geometry, crs=self.hgrid.crs)
+
+
 class Boundaries:
     def __init__(self, hgrid, boundaries: Union[dict, None]):
 
-        ocean_boundaries = []
-        land_boundaries = []
-        interior_boundaries = []
+        ocean_boundaries = defaultdict(list)
+        land_boundaries = defaultdict(list)
+        interior_boundaries = defaultdict(list)
         if boundaries is not None:
             for ibtype, bnds in boundaries.items():
                 if ibtype is None:
                     for id, data in bnds.items():
-                        indexes = list(
-                            map(hgrid.nodes.get_index_by_id, data["indexes"])
-                        )
-                        ocean_boundaries.append(
-                            {
-                                "id": str(id + 1),  # hacking it
-                                "index_id": data["indexes"],
-                                "indexes": indexes,
-                                "geometry": LineString(hgrid.vertices[indexes]),
-                                # "iettype": None,
-                                # "ifltype": None,
-                                # "itetype": None,
-                                # "isatype": None,
-                                # "itrtype": {},
-                                # 'nudge_temperature': None,
-                                # 'nudge_salinity': None,
-                            }
-                        )
+                        ocean_boundaries["ids"].append(str(id + 1))  # hacking it
+                        ocean_boundaries["index_ids"].append(data["indexes"])
+                        ocean_boundaries["node_ids"].append(data["indexes"])
 
                 elif str(ibtype).endswith("1"):
                     for id, data in bnds.items():
-                        indexes = list(
-                            map(hgrid.nodes.get_index_by_id, data["indexes"])
-                        )
-                        interior_boundaries.append(
-                            {
-                                "id": str(id + 1),
-                                "ibtype": ibtype,
-                                "index_id": data["indexes"],
-                                "indexes": indexes,
-                                "geometry": LineString(hgrid.vertices[indexes]),
-                            }
-                        )
+                        interior_boundaries["ids"].append(str(id + 1))
+                        interior_boundaries["ibtypes"].append(ibtype)
+                        interior_boundaries["index_ids"].append(data["indexes"])
+                        interior_boundaries["node_ids"].append(data["indexes"])
                 else:
                     for id, data in bnds.items():
                         _indexes = np.array(data["indexes"])
                         if _indexes.ndim > 1:
                             # ndim > 1 implies we're dealing with an ADCIRC
                             # mesh that includes boundary pairs, such as weir
-                            new_indexes = []
-                            for i, line in enumerate(_indexes.T):
-                                if i % 2 != 0:
-                                    new_indexes.extend(np.flip(line))
-                                else:
-                                    new_indexes.extend(line)
-                            _indexes = np.array(new_indexes).flatten()
+                            _indexes = np.concatenate([
+                                np.flip(line) if i % 2 != 0 else line
+                                for i, line in enumerate(_indexes.T)
+                            ])
                         else:
                             _indexes = _indexes.flatten()
-                        indexes = list(map(hgrid.nodes.get_index_by_id, _indexes))
-
-                        land_boundaries.append(
-                            {
-                                "id": str(id + 1),
-                                "ibtype": ibtype,
-                                "index_id": data["indexes"],
-                                "indexes": indexes,
-                                "geometry": LineString(hgrid.vertices[indexes]),
-                            }
-                        )
-
-        self.open = gpd.GeoDataFrame(
-            ocean_boundaries, crs=hgrid.crs if len(ocean_boundaries) > 0 else None
-        )
-        self.land = gpd.GeoDataFrame(
-            land_boundaries, crs=hgrid.crs if len(land_boundaries) > 0 else None
-        )
-        self.interior = gpd.GeoDataFrame(
-            interior_boundaries, crs=hgrid.crs if len(interior_boundaries) > 0 else None
-        )
+                        land_boundaries["ids"].append(str(id + 1))
+                        land_boundaries["ibtypes"].append(ibtype)
+                        land_boundaries["index_ids"].append(data["indexes"])
+                        land_boundaries["node_ids"].append(_indexes)
+
+        self.open_table = BoundaryTable(
+            hgrid, "open", ocean_boundaries["ids"], None,
+            ocean_boundaries["index_ids"], ocean_boundaries["node_ids"])
+        self.land_table = BoundaryTable(
+            hgrid, "land", land_boundaries["ids"], land_boundaries["ibtypes"],
+            land_boundaries["index_ids"], land_boundaries["node_ids"])
+        self.interior_table = BoundaryTable(
+            hgrid, "interior", interior_boundaries["ids"],
+            interior_boundaries["ibtypes"], interior_boundaries["index_ids"],
+            interior_boundaries["node_ids"])
         self.hgrid = hgrid
         self.data = boundaries
 
+    @property
+    def open(self):
+        return self.open_table.gdf
+
+    @property
+    def ocean(self):
+        return self.open
+
+    @property
+    def land(self):
+        return self.land_table.gdf
+
+    @property
+    def interior(self):
+        return self.interior_table.gdf
+
     # def elev2d(self):
     #     return Elev2D(self.hgrid)
 
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Prepare GFS/HRRR NetCDF files for ESMF mesh generation.
+
+Single pass from the raw wgrib2 NetCDF to the ESMF-ready file and its SCRIP
+grid: the coordinates read while writing the ESMF file are handed to
+proc_scrip directly, so the grid is read once and no second process has to
+reopen the output.
+
+Usage:
+    python esmf_prep.py gfs gfs_raw.nc gfs_for_esmf.nc --scrip gfs_scrip.nc
+    python esmf_prep.py hrrr IN1 OUT1 IN2 OUT2 ... [--scrip S1 --scrip S2 ...]
+                        [--nprocs N] [--cache-dir DIR]
+
+Arguments:
+    DBASE       - Data source: gfs (gfs25) or hrrr
+    IN OUT      - Raw NetCDF from wgrib2 and ESMF-ready output; several pairs
+                  are processed in parallel
+    --scrip     - SCRIP grid file for each pair (optional, one per pair)
+    --cache-dir - Directory caching SCRIP files by grid digest
+                  (default: $ESMF_MESH_CACHE_DIR, no caching if unset)
+    --nprocs    - Number of files processed at once (default: all cores)
+
+Steps performed:
+    GFS:  rename lat/lon, add ESMF/CF attributes, flip latitude to S->N
+    HRRR: keep the 2D Lambert Conformal lat/lon, add ESMF/CF attributes
+    Variables are copied in time-block hyperslabs, so memory use does not
+    grow with the forecast range.
+
+Author: Adapted for SECOFS UFS-Coastal transition
+Date: January 2026
+"""
+
+import argparse
+from multiprocessing import Pool, cpu_count
+import os
+import sys
+
+import numpy as np
+from netCDF4 import Dataset
+
+
+# Largest hyperslab read at once when copying a variable
+BLOCK_BYTES = 64 * 1024**2
+
+# DATM variable mapping (wgrib2 names -> DATM field names)
+DATM_VARS = {
+    'TMP_2maboveground': {'datm_name': 'Sa_tbot', 'long_name': '2m temperature', 'units': 'K'},
+    'SPFH_2maboveground': {'datm_name': 'Sa_shum', 'long_name': '2m specific humidity', 'units': 'kg/kg'},
+    'PRES_surface': {'datm_name': 'Sa_pslv', 'long_name': 'surface pressure', 'units': 'Pa'},
+    'PRMSL_meansealevel': {'datm_name': 'Sa_pslv', 'long_name': 'mean sea level pressure', 'units': 'Pa'},
+    'UGRD_10maboveground': {'datm_name': 'Sa_u', 'long_name': '10m u-wind', 'units': 'm/s'},
+    'VGRD_10maboveground': {'datm_name': 'Sa_v', 'long_name': '10m v-wind', 'units': 'm/s'},
+    'DSWRF_surface': {'datm_name': 'Faxa_swdn', 'long_name': 'downward shortwave radiation', 'units': 'W/m2'},
+    'DLWRF_surface': {'datm_name': 'Faxa_lwdn', 'long_name': 'downward longwave radiation', 'units': 'W/m2'},
+    'PRATE_surface': {'datm_name': 'Faxa_rain', 'long_name': 'precipitation rate', 'units': 'kg/m2/s'},
+}
+
+
+def copy_hyperslabs(var_in, var_out, time_axis=None, flip_axis=None,
+                    max_bytes=BLOCK_BYTES):
+    """
+    Copy var_in to var_out in blocks of time steps of at most max_bytes.
+
+    Values are copied raw (no masking or scaling, the attributes are copied
+    separately). The axis flip_axis is reversed by the read itself.
+    """
+    var_in.set_auto_maskandscale(False)
+    var_out.set_auto_maskandscale(False)
+    if var_in.ndim == 0:
+        var_out.assignValue(var_in.getValue())
+        return
+
+    index_in = [slice(None)] * var_in.ndim
+    index_out = [slice(None)] * var_in.ndim
+    if flip_axis is not None:
+        index_in[flip_axis] = slice(None, None, -1)
+    if time_axis is None:
+        var_out[tuple(index_out)] = var_in[tuple(index_in)]
+        return
+
+    ntime = var_in.shape[time_axis]
+    itemsize = getattr(var_in.dtype, 'itemsize', 8)
+    step_bytes = itemsize * int(np.prod(var_in.shape)) // max(ntime, 1)
+    block = max(1, max_bytes // max(step_bytes, 1))
+    for t0 in range(0, ntime, block):
+        index_in[time_axis] = index_out[time_axis] = slice(t0, min(t0 + block, ntime))
+        var_out[tuple(index_out)] = var_in[tuple(index_in)]
+
+
+def _copy_time(ds_in, ds_out, time_name):
+    """Creates the unlimited time dimension and copies the time axis."""
+    time_in = ds_in.variables[time_name]
+    ds_out.createDimension('time', None)
+    time_out = ds_out.createVariable('time', 'f8', ('time',))
+    time_out.units = getattr(time_in, 'units', 'hours since 1900-01-01 00:00:00')
+    time_out.calendar = getattr(time_in, 'calendar', 'standard')
+    time_out.axis = 'T'
+    time_out.long_name = 'time'
+    time_out[:] = time_in[:]
+
+
+def _coordinate(ds_out, name, dims, values, axis=None):
+    """Writes a lon/lat coordinate variable with the ESMF-required attributes."""
+    var = ds_out.createVariable(name, 'f8', dims)
+    if name == 'lon':
+        var.units = 'degrees_east'
+        var.long_name = var.standard_name = 'longitude'
+    else:
+        var.units = 'degrees_north'
+        var.long_name = var.standard_name = 'latitude'
+    if axis is not None:
+        var.axis = axis
+    var[:] = values
+
+
+def _copy_variable(ds_in, ds_out, varname, dims_out, flip_axis=None,
+                   verbose=True):
+    """Copies one data variable with its attributes, in time blocks."""
+    var_in = ds_in.variables[varname]
+    if verbose:
+        print(f"  Copying: {varname} {dims_out}")
+
+    var_out = ds_out.createVariable(varname, var_in.dtype, tuple(dims_out),
+                                    fill_value=getattr(var_in, '_FillValue', None))
+    for attr in var_in.ncattrs():
+        if attr != '_FillValue':
+            setattr(var_out, attr, getattr(var_in, attr))
+
+    var_info = DATM_VARS.get(varname)
+    if var_info:
+        var_out.long_name = var_info['long_name']
+        var_out.units = var_info['units']
+
+    # Required by CF/ESMF
+    var_out.coordinates = 'lon lat'
+    copy_hyperslabs(
+        var_in, var_out,
+        time_axis=dims_out.index('time') if 'time' in dims_out else None,
+        flip_axis=flip_axis)
+
+
+def modify_gfs_for_esmf(input_file, output_file, verbose=True):
+    """
+    Modify GFS NetCDF file for ESMF mesh generation.
+
+    Parameters
+    ----------
+    input_file : str
+        Path to input GFS NetCDF file (from wgrib2 -netcdf conversion)
+    output_file : str
+        Path to output modified NetCDF file
+    verbose : bool
+        Print progress messages
+
+    Returns
+    -------
+    lon, lat : ndarray
+        The 1D coordinates as written, latitude S->N
+    """
+    if verbose:
+        print(f"Reading: {input_file}")
+
+    ds_in = Dataset(input_file, 'r')
+
+    # Coordinate variable names vary with the wgrib2 version
+    coord_names = {'lon': None, 'lat': None, 'time': None}
+    for var in ds_in.variables:
+        var_lower = var.lower()
+        if var_lower in ['longitude', 'lon', 'x']:
+            coord_names['lon'] = var
+        elif var_lower in ['latitude', 'lat', 'y']:
+            coord_names['lat'] = var
+        elif var_lower in ['time', 't']:
+            coord_names['time'] = var
+
+    if verbose:
+        print(f"Found coordinates: {coord_names}")
+
+    lon = np.ma.getdata(ds_in.variables[coord_names['lon']][:])
+    lat = np.ma.getdata(ds_in.variables[coord_names['lat']][:])
+
+    # Latitude should be S->N for ESMF
+    flip_lat = bool(lat[0] > lat[-1])
+    if flip_lat:
+        lat = lat[::-1]
+        if verbose:
+            print("Latitude is N->S, will flip to S->N")
+
+    if verbose:
+        print(f"Creating: {output_file}")
+
+    ds_out = Dataset(output_file, 'w', format='NETCDF4')
+    ds_out.Conventions = 'CF-1.6'
+    ds_out.title = 'GFS 0.25-degree data prepared for ESMF mesh generation'
+    ds_out.source = 'NCEP GFS'
+    ds_out.history = f'Modified by esmf_prep.py from {os.path.basename(input_file)}'
+
+    ds_out.createDimension('lon', len(lon))
+    ds_out.createDimension('lat', len(lat))
+    if coord_names['time'] is not None:
+        _copy_time(ds_in, ds_out, coord_names['time'])
+    _coordinate(ds_out, 'lon', ('lon',), lon, axis='X')
+    _coordinate(ds_out, 'lat', ('lat',), lat, axis='Y')
+
+    for varname in ds_in.variables:
+        if varname in coord_names.values():
+            continue
+
+        dims_out = []
+        for dim in ds_in.variables[varname].dimensions:
+            if dim == coord_names['time'] or dim.lower() == 'time':
+                dims_out.append('time')
+            elif dim == coord_names['lat'] or dim.lower() in ['lat', 'latitude', 'y']:
+                dims_out.append('lat')
+            elif dim == coord_names['lon'] or dim.lower() in ['lon', 'longitude', 'x']:
+                dims_out.append('lon')
+            else:
+                dims_out.append(dim)
+
+        _copy_variable(
+            ds_in, ds_out, varname, dims_out,
+            flip_axis=dims_out.index('lat') if flip_lat and 'lat' in dims_out else None,
+            verbose=verbose)
+
+    ds_in.close()
+    ds_out.close()
+
+    if verbose:
+        print(f"Done! Output: {output_file}")
+        print(f"Grid size: {len(lon)} x {len(lat)}")
+    return lon, lat
+
+
+def modify_hrrr_for_esmf(input_file, output_file, verbose=True):
+    """
+    Modify HRRR NetCDF file for ESMF mesh generation.
+
+    HRRR files from wgrib2 may already have lat/lon as 2D arrays
+    (since HRRR is on Lambert Conformal grid).
+
+    Parameters
+    ----------
+    input_file : str
+        Path to input HRRR NetCDF file
+    output_file : str
+        Path to output modified NetCDF file
+    verbose : bool
+        Print progress messages
+
+    Returns
+    -------
+    lon, lat : ndarray
+        The coordinates as written, 2D on the Lambert Conformal grid
+    """
+    if verbose:
+        print(f"Reading: {input_file}")
+
+    ds_in = Dataset(input_file, 'r')
+
+    # HRRR coordinates from wgrib2 (typically 2D lat/lon arrays)
+    # Common names: latitude, longitude or lat, lon or gridlat_0, gridlon_0
+    lat_name = None
+    lon_name = None
+    time_name = None
+    for var in ds_in.variables:
+        var_lower = var.lower()
+        if 'lat' in var_lower and lat_name is None:
+            lat_name = var
+        elif 'lon' in var_lower and lon_name is None:
+            lon_name = var
+        elif var_lower in ['time', 't']:
+            time_name = var
+
+    if lat_name is None or lon_name is None:
+        # Try dimension names
+        for dim in ds_in.dimensions:
+            if 'lat' in dim.lower() or 'y' in dim.lower():
+                lat_name = dim
+            elif 'lon' in dim.lower() or 'x' in dim.lower():
+                lon_name = dim
+
+    if verbose:
+        print(f"Found lat: {lat_name}, lon: {lon_name}, time: {time_name}")
+
+    lat = np.ma.getdata(ds_in.variables[lat_name][:])
+    lon = np.ma.getdata(ds_in.variables[lon_name][:])
+
+    # Determine if 1D or 2D coordinates
+    is_2d_coords = lat.ndim == 2
+    if is_2d_coords:
+        nlat, nlon = lat.shape
+    else:
+        nlat, nlon = len(lat), len(lon)
+    if verbose:
+        print(f"Lat shape: {lat.shape}, Lon shape: {lon.shape}")
+        print(f"HRRR has {'2D coordinates (Lambert Conformal grid)' if is_2d_coords else '1D coordinates'}")
+        print(f"Grid size: {nlon} x {nlat}")
+        print(f"Creating: {output_file}")
+
+    ds_out = Dataset(output_file, 'w', format='NETCDF4')
+    ds_out.Conventions = 'CF-1.6'
+    ds_out.title = 'HRRR 3km data prepared for ESMF mesh generation'
+    ds_out.source = 'NOAA HRRR (High-Resolution Rapid Refresh)'
+    ds_out.history = f'Modified by esmf_prep.py from {os.path.basename(input_file)}'
+    ds_out.grid_type = 'Lambert Conformal Conic'
+
+    if is_2d_coords:
+        ds_out.createDimension('x', nlon)
+        ds_out.createDimension('y', nlat)
+    else:
+        ds_out.createDimension('lon', nlon)
+        ds_out.createDimension('lat', nlat)
+
+    if time_name is not None:
+        _copy_time(ds_in, ds_out, time_name)
+
+    if is_2d_coords:
+        # For curvilinear grids, lat/lon are 2D
+        _coordinate(ds_out, 'lat', ('y', 'x'), lat)
+        _coordinate(ds_out, 'lon', ('y', 'x'), lon)
+
+        # Also create 1D auxiliary coordinates for ESMF
+        x_out = ds_out.createVariable('x', 'i4', ('x',))
+        x_out.units = '1'
+        x_out.long_name = 'x grid index'
+        x_out[:] = np.arange(nlon)
+
+        y_out = ds_out.createVariable('y', 'i4', ('y',))
+        y_out.units = '1'
+        y_out.long_name = 'y grid index'
+        y_out[:] = np.arange(nlat)
+    else:
+        _coordinate(ds_out, 'lon', ('lon',), lon, axis='X')
+        _coordinate(ds_out, 'lat', ('lat',), lat, axis='Y')
+
+    for varname in ds_in.variables:
+        if varname in [lat_name, lon_name, time_name]:
+            continue
+
+        # Skip grid mapping variables
+        if 'grid_mapping' in varname.lower() or 'projection' in varname.lower():
+            continue
+
+        # Skip x/y coordinate variables (already created)
+        if varname in ['x', 'y']:
+            continue
+
+        dims_out = []
+        for dim in ds_in.variables[varname].dimensions:
+            dim_lower = dim.lower()
+            if dim == time_name or 'time' in dim_lower:
+                dims_out.append('time')
+            elif 'lat' in dim_lower or dim_lower == 'y' or dim_lower.startswith('ygrid'):
+                dims_out.append('y' if is_2d_coords else 'lat')
+            elif 'lon' in dim_lower or dim_lower == 'x' or dim_lower.startswith('xgrid'):
+                dims_out.append('x' if is_2d_coords else 'lon')
+            else:
+                # Create dimension if it doesn't exist
+                if dim not in ds_out.dimensions:
+                    ds_out.createDimension(dim, ds_in.dimensions[dim].size)
+                dims_out.append(dim)
+
+        _copy_variable(ds_in, ds_out, varname, dims_out, verbose=verbose)
+
+    ds_in.close()
+    ds_out.close()
+
+    if verbose:
+        print(f"Done! Output: {output_file}")
+        if is_2d_coords:
+            print(f"Note: HRRR has curvilinear grid - use ESMF_Scrip2Unstruct for mesh")
+    return lon, lat
+
+
+MODIFIERS = {
+    'gfs': modify_gfs_for_esmf,
+    'gfs25': modify_gfs_for_esmf,
+    'hrrr': modify_hrrr_for_esmf,
+}
+
+
+def prepare(dbase, raw_file, esmf_file, scrip_file=None, verbose=True,
+            cache_dir=None):
+    """
+    Writes the ESMF-ready file and, if scrip_file is given, its SCRIP grid
+    from the coordinates already loaded for the ESMF file. With cache_dir,
+    the SCRIP grid is taken from (or added to) the grid-digest cache of
+    proc_scrip.
+
+    Returns the paths of the files written (esmf_file, scrip_file).
+    """
+    lon, lat = MODIFIERS[dbase.lower()](raw_file, esmf_file, verbose=verbose)
+    if scrip_file is not None:
+        from proc_scrip import write_scrip
+        scrip_file = write_scrip(lon, lat, os.path.basename(scrip_file),
+                                 os.path.dirname(scrip_file) or './',
+                                 verbose=verbose, cache_dir=cache_dir)
+    return esmf_file, scrip_file
+
+
+def prepare_batch(jobs, nprocs=None):
+    """Runs :func:`prepare` on each (dbase, raw_file, esmf_file, scrip_file,
+    verbose, cache_dir) job, several files at once."""
+    nprocs = cpu_count() if nprocs is None else nprocs
+    nprocs = max(1, min(nprocs, len(jobs)))
+    if nprocs == 1:
+        return [prepare(*job) for job in jobs]
+    with Pool(processes=nprocs) as pool:
+        return pool.starmap(prepare, jobs)
+
+
+def main(dbase=None):
+    parser = argparse.ArgumentParser(
+        description='Prepare GFS/HRRR NetCDF for ESMF mesh generation')
+    if dbase is None:
+        parser.add_argument('dbase', type=str.lower, choices=sorted(MODIFIERS),
+                            help='Data source')
+    parser.add_argument('files', nargs='+', metavar='input_file output_file',
+                        help='Input raw NetCDF file and output ESMF-ready '
+                             'file; several pairs are processed in parallel')
+    parser.add_argument('--scrip', action='append', default=None,
+                        help='SCRIP grid file of each pair, written from the '
+                             'coordinates of the ESMF-ready file')
+    parser.add_argument('--cache-dir', default=os.environ.get('ESMF_MESH_CACHE_DIR'),
+                        help='Directory caching SCRIP files by grid digest '
+                             '(default: $ESMF_MESH_CACHE_DIR, no caching if unset)')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='Suppress progress messages')
+    parser.add_argument('--nprocs', type=int, default=None,
+                        help='Number of files processed at once (default: all cores)')
+
+    args = parser.parse_args()
+    dbase = dbase or args.dbase
+
+    if len(args.files) % 2 != 0:
+        parser.error('Expected pairs of input and output files')
+    pairs = list(zip(args.files[0::2], args.files[1::2]))
+    scrip_files = args.scrip or [None] * len(pairs)
+    if len(scrip_files) != len(pairs):
+        parser.error('Expected one --scrip file per pair of files')
+    for input_file, _ in pairs:
+        if not os.path.exists(input_file):
+            print(f"Error: Input file not found: {input_file}")
+            sys.exit(1)
+
+    jobs = [(dbase, input_file, output_file, scrip_file, not args.quiet,
+             args.cache_dir)
+            for (input_file, output_file), scrip_file in zip(pairs, scrip_files)]
+    prepare_batch(jobs, args.nprocs)
+
+
+if __name__ == '__main__':
+    main()
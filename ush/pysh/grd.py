@@ -1,7 +1,9 @@
 from collections import defaultdict
+import io
+from itertools import islice
 import os
-import numbers
 import pathlib
+import re
 from typing import Union, Dict, TextIO
 import warnings
 
@@ -10,12 +12,28 @@ from pyproj import CRS  # type: ignore[import]
 from pyproj.exceptions import CRSError  # type: ignore[import]
 
 
-def buffer_to_dict(buf: TextIO):
-    description = buf.readline().strip()
-    NE, NP = map(int, buf.readline().split())
+# Node lines with a single value and triangle or quad element lines, one
+# match per line; lines of any other shape do not match
+_NODE_LINE = re.compile(r'^[ \t]*(\S+)[ \t]+\S+[ \t]+\S+[ \t]+\S+[ \t]*\r?$',
+                        re.MULTILINE)
+_ELEMENT_LINE = re.compile(
+    r'^[ \t]*(\S+)[ \t]+\S+[ \t]+(\S+)[ \t]+(\S+)[ \t]+(\S+)(?:[ \t]+(\S+))?'
+    r'[ \t]*\r?$', re.MULTILINE)
+
+
+def _read_nodes(buf: TextIO, NP):
+    """Reads NP node lines. When every node has a single value, the ids are
+    matched and the numbers converted over the whole block at once."""
+    lines = list(islice(buf, NP))
+    text = ''.join(lines)
+    ids = _NODE_LINE.findall(text)
+    if len(ids) == NP:
+        table = np.fromstring(text, sep=' ').reshape(NP, 4)
+        return dict(zip(ids, (
+            [(x, y), value] for x, y, value in table[:, 1:].tolist())))
     nodes = {}
-    for _ in range(NP):
-        line = buf.readline().strip('\n').split()
+    for line in lines:
+        line = line.strip('\n').split()
         # Gr3/fort.14 format cannot distinguish between a 2D mesh with one
         # vector value (e.g. velocity, which uses 2 columns) or a 3D mesh with
         # one scalar value. This is a design problem of the mesh format, which
@@ -31,10 +49,28 @@ def buffer_to_dict(buf: TextIO):
                 (float(line[1]), float(line[2])),
                 [float(line[i]) for i in range(3, len(line[3:]))]
             ]
+    return nodes
+
+
+def _read_elements(buf: TextIO, NE):
+    """Reads NE element lines. Triangles and quads are matched over the
+    whole block at once."""
+    lines = list(islice(buf, NE))
+    rows = _ELEMENT_LINE.findall(''.join(lines))
+    if len(rows) == NE:
+        return {row[0]: list(row[1:5] if row[4] else row[1:4]) for row in rows}
     elements = {}
-    for _ in range(NE):
-        line = buf.readline().split()
+    for line in lines:
+        line = line.split()
         elements[line[0]] = line[2:]
+    return elements
+
+
+def buffer_to_dict(buf: TextIO):
+    description = buf.readline().strip()
+    NE, NP = map(int, buf.readline().split())
+    nodes = _read_nodes(buf, NP)
+    elements = _read_elements(buf, NE)
     # Assume EOF if NOPE is empty.
     try:
         NOPE = int(buf.readline().split()[0])
@@ -88,37 +124,59 @@ def buffer_to_dict(buf: TextIO):
             'boundaries': boundaries}
 
 
-def to_string(description, nodes, elements, boundaries=None, crs=None):
-    """
-    must contain keys:
-        description
-        vertices
-        elements
-        vertex_id
-        element_id
-        values
-        boundaries (optional)
-            indexes
+CHUNK_SIZE = 100000
+
+
+def _write_node_block(buf, chunk):
+    """Writes a list of (id, (coords, values)) items with one format call."""
+    coords = np.array([coords for _, (coords, _) in chunk], dtype=float)
+    values = np.array([values for _, (_, values) in chunk], dtype=float)
+    values = values.reshape(len(chunk), -1)
+    table = np.empty((len(chunk), 1 + coords.shape[1] + values.shape[1]),
+                     dtype=object)
+    table[:, 0] = [id for id, _ in chunk]
+    table[:, 1:1 + coords.shape[1]] = coords
+    table[:, 1 + coords.shape[1]:] = values
+    row_fmt = "\n%s" + " %.8f" * (table.shape[1] - 1)
+    buf.write((row_fmt * len(chunk)) % tuple(table.ravel()))
+
+
+def _write_element_block(buf, chunk):
+    """Writes a list of (id, element) items with one format call."""
+    row_fmt = "".join(
+        "\n%s %d" + " %s" * len(element) for _, element in chunk)
+    args = []
+    for id, element in chunk:
+        args.append(id)
+        args.append(len(element))
+        args.extend(element)
+    buf.write(row_fmt % tuple(args))
+
+
+def _write_blocks(buf, items, writer, chunk_size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if len(chunk) == 0:
+            break
+        writer(buf, chunk)
+
+
+def write_buffer(buf: TextIO, description, nodes, elements, boundaries=None,
+                 crs=None, chunk_size=CHUNK_SIZE):
+    """Streams a grd-formatted mesh to an open text buffer.
+
+    Nodes and elements are formatted in blocks of ``chunk_size`` lines, so
+    memory use is bounded by the block size rather than the mesh size.
     """
     NE, NP = len(elements), len(nodes)
-    out = [f"{description}", f"{NE} {NP}"]
-    # TODO: Probably faster if using np.array2string
-    for id, (coords, values) in nodes.items():
-        if isinstance(values, numbers.Number):
-            values = [values]
-        line = [f"{id}"]
-        line.extend([f"{x:<.8f}" for x in coords])
-        line.extend([f"{x:<.8f}" for x in values])
-        out.append(" ".join(line))
-
-    for id, element in elements.items():
-        line = [f"{id}"]
-        line.append(f"{len(element)}")
-        line.extend([f"{e}" for e in element])
-        out.append(" ".join(line))
+    buf.write(f"{description}\n{NE} {NP}")
+    _write_blocks(buf, nodes.items(), _write_node_block, chunk_size)
+    _write_blocks(buf, elements.items(), _write_element_block, chunk_size)
     if boundaries is None:
-        out.append('')
-        return "\n".join(out)
+        buf.write("\n")
+        return
+    out = []
     if boundaries is not None:
         out.append(f"{len(boundaries[None]):d} "
                    "! total number of ocean boundaries")
@@ -163,7 +221,25 @@ def to_string(description, nodes, elements, boundaries=None, crs=None):
             out.append(' '.join(line))
             for idx in boundary['indexes']:
                 out.append(f"{idx}")
-    return "\n".join(out)
+    buf.write("\n")
+    buf.write("\n".join(out))
+
+
+def to_string(description, nodes, elements, boundaries=None, crs=None):
+    """
+    must contain keys:
+        description
+        vertices
+        elements
+        vertex_id
+        element_id
+        values
+        boundaries (optional)
+            indexes
+    """
+    buf = io.StringIO()
+    write_buffer(buf, description, nodes, elements, boundaries, crs)
+    return buf.getvalue()
 
 
 def read(resource: Union[str, os.PathLike], boundaries: bool = True, crs=True):
@@ -201,4 +277,4 @@ def write(grd, path, overwrite=False):
     if path.is_file() and not overwrite:
         raise Exception('File exists, pass overwrite=True to allow overwrite.')
     with open(path, 'w') as f:
-        f.write(to_string(**grd))
+        write_buffer(f, **grd)
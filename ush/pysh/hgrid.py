@@ -68,6 +68,11 @@ class Hgrid(Gr3):
     def copy(self):
         return self.__class__(**super().to_dict())
 
+    def get_quality_metrics(self, dt=None, depth=None, **kwargs):
+        # Hgrid values are stored negated (positive up), see Hgrid.open.
+        depth = -self.values if depth is None else depth
+        return super().get_quality_metrics(dt=dt, depth=depth, **kwargs)
+
     @figure
     def make_plot(
         self,
@@ -79,8 +84,15 @@ class Hgrid(Gr3):
         # figsize=rcParams["figure.figsize"],
         extent=None,
         cbar_label=None,
+        raster=False,
         **kwargs
     ):
+        """Plots the bathymetry.
+
+        With raster=True the field is drawn as an image sampled at the axes'
+        pixel resolution instead of handing every element to matplotlib.
+        In both modes only elements overlapping extent are drawn.
+        """
         if vmin is None:
             vmin = np.min(self.values)
         if vmax is None:
@@ -88,11 +100,19 @@ class Hgrid(Gr3):
         kwargs.update(**get_topobathy_kwargs(self.values, vmin, vmax))
         kwargs.pop("col_val")
         levels = kwargs.pop("levels")
-        if vmin != vmax:
-            self.tricontourf(axes=axes, levels=levels, vmin=vmin, vmax=vmax, **kwargs)
+        if raster:
+            if kwargs["norm"] is None:
+                kwargs.update(vmin=vmin, vmax=vmax)
+            self.rasterplot(axes=axes, extent=extent, **kwargs)
         else:
-            self.tripcolor(axes=axes, **kwargs)
-        self.quadface(axes=axes, **kwargs)
+            if vmin != vmax:
+                self.tricontourf(
+                    axes=axes, extent=extent, levels=levels, vmin=vmin, vmax=vmax,
+                    **kwargs
+                )
+            else:
+                self.tripcolor(axes=axes, extent=extent, **kwargs)
+            self.quadface(axes=axes, extent=extent, **kwargs)
         axes.axis("scaled")
         if extent is not None:
             axes.axis(extent)
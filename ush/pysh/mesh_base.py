@@ -1,22 +1,24 @@
 from abc import ABC
-from collections import defaultdict
-from functools import lru_cache
+from collections import defaultdict, OrderedDict
+from functools import wraps
 import hashlib
 import logging
 from itertools import permutations
 import os
 import pathlib
+import sys
 import tempfile
 from typing import Union, Sequence, Hashable, List, Dict
 
 import geopandas as gpd
 from matplotlib.collections import PolyCollection
 from matplotlib.path import Path
-from matplotlib.tri import Triangulation
+from matplotlib.tri import LinearTriInterpolator, Triangulation
 from matplotlib.transforms import Bbox
 import numpy as np
 from pyproj import Transformer, CRS
 import requests
+import shapely
 from shapely import ops
 from shapely.geometry import (
     box,
@@ -24,7 +26,6 @@ from shapely.geometry import (
     LineString,
     MultiPolygon,
     Polygon,
-    Point,
 )
 
 
@@ -33,6 +34,7 @@ from shapely.geometry import (
 #from pyschism.figures import figure
 
 import grd, sms2dm
+import mesh_metrics
 from figures import figure
 
 
@@ -41,8 +43,148 @@ from figures import figure
 logger = logging.getLogger(__name__)
 
 
+class MeshCache:
+    """Per-mesh store for derived geometry and topology products.
+
+    Products are built on first access and kept until they are invalidated
+    or evicted. Each product is tagged with the mesh data it is derived
+    from ("coords" and/or "values"), so that an in-place transformation only
+    drops the products it makes stale. When ``max_bytes`` is set, the least
+    recently used products are evicted to keep the tracked size below it.
+
+    Products that are expensive to rebuild can also be saved as arrays in
+    ``directory`` (default: $MESH_CACHE_DIR), keyed by a digest of their
+    inputs, so that other processes opening the same mesh can reuse them.
+    """
+
+    def __init__(self, max_bytes: int = None,
+                 directory: Union[str, os.PathLike] = None):
+        self.max_bytes = max_bytes
+        if directory is None:
+            directory = os.environ.get("MESH_CACHE_DIR")
+        self.directory = None if directory is None else pathlib.Path(directory)
+        self._data = OrderedDict()
+        self._depends = {}
+        self._nbytes = {}
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key: Hashable, factory, depends: Sequence[str] = ()):
+        if key in self._data:
+            self._data.move_to_end(key)
+            return self._data[key]
+        value = factory()
+        self._data[key] = value
+        self._depends[key] = frozenset(depends)
+        self._nbytes[key] = sizeof(value)
+        if self.max_bytes is not None:
+            while self.nbytes > self.max_bytes and len(self._data) > 1:
+                self.evict()
+        return value
+
+    def invalidate(self, *depends: str):
+        """Drops every product derived from any of the given mesh data."""
+        depends = set(depends)
+        for key in [k for k, deps in self._depends.items() if deps & depends]:
+            self.evict(key)
+
+    def evict(self, key: Hashable = None):
+        """Drops one product, the least recently used one by default."""
+        if key is None:
+            key = next(iter(self._data))
+        self._data.pop(key, None)
+        self._depends.pop(key, None)
+        self._nbytes.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._depends.clear()
+        self._nbytes.clear()
+
+    def memory_usage(self) -> Dict[Hashable, int]:
+        """Returns the size in bytes of each cached product.
+
+        Sizes are re-measured, since some products (e.g. a Triangulation's
+        neighbors) grow after they are first cached.
+        """
+        for key, value in self._data.items():
+            self._nbytes[key] = sizeof(value)
+        return dict(self._nbytes)
+
+    @property
+    def nbytes(self):
+        return sum(self._nbytes.values())
+
+    def load_arrays(self, name: str, digest: str) -> Union[Dict, None]:
+        """Returns the arrays saved under name and digest, if any."""
+        if self.directory is None:
+            return None
+        path = self.directory / f"{name}-{digest}.npz"
+        if not path.is_file():
+            return None
+        logger.info(f"Loading {name} from {path}.")
+        with np.load(path) as data:
+            return {key: data[key] for key in data.files}
+
+    def save_arrays(self, name: str, digest: str, **arrays):
+        """Saves arrays under name and digest, if a directory is set."""
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{name}-{digest}.npz"
+        # write-then-rename, so concurrent readers never see a partial file
+        fd, tmpname = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmpname, path)
+
+
+def cached(key: Hashable, depends: Sequence[str] = ()):
+    """Memoizes a no-argument method in the owner's :class:`MeshCache`."""
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(self):
+            return self.cache.get(key, lambda: f(self), depends)
+
+        return wrapper
+
+    return decorator
+
+
+def sizeof(obj) -> int:
+    """Approximate memory footprint in bytes of a cached product."""
+    if isinstance(obj, np.ma.MaskedArray):
+        return obj.data.nbytes + np.ma.getmask(obj).nbytes
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, gpd.GeoDataFrame):
+        try:
+            geometry = obj.geometry
+        except AttributeError:  # no active geometry column
+            return int(obj.memory_usage(deep=True).sum())
+        ncoords = shapely.get_num_coordinates(np.asarray(geometry.values))
+        return int(obj.drop(columns=geometry.name).memory_usage(
+            deep=True).sum()) + 16 * int(np.sum(ncoords))
+    if isinstance(obj, shapely.Geometry):
+        return 16 * int(shapely.get_num_coordinates(obj))
+    if isinstance(obj, Triangulation):
+        return sum(
+            a.nbytes
+            for a in (obj.x, obj.y, obj.triangles, obj._neighbors, obj._edges)
+            if a is not None
+        )
+    if isinstance(obj, dict):
+        return sum(sizeof(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(sizeof(value) for value in obj)
+    return sys.getsizeof(obj)
+
+
 class Nodes:
-    def __init__(self, nodes: Dict[Hashable, List[List]], crs=None):
+    def __init__(self, nodes: Dict[Hashable, List[List]], crs=None,
+                 cache: MeshCache = None):
         """Setter for the nodes attribute.
 
         Argument nodes must be of the form:
@@ -66,30 +208,36 @@ class Nodes:
         self._coords = np.array([coords for coords, _ in nodes.values()])
         self._crs = CRS.from_user_input(crs) if crs is not None else crs
         self._values = np.array([value for _, value in nodes.values()])
+        self.cache = MeshCache() if cache is None else cache
 
     def transform_to(self, dst_crs):
         dst_crs = CRS.from_user_input(dst_crs)
         if not self.crs.equals(dst_crs):
             self._coords = self.get_xy(dst_crs)
             self._crs = dst_crs
+            self.cache.invalidate("coords")
 
-        if hasattr(self, "_gdf"):
-            del self._gdf
+    def transform_to_cpp(self, lonc, latc, dtype=None):
+        """Projects lon/lat coordinates to CPP in-place.
 
-    def transform_to_cpp(self, lonc, latc):
-        longitude = list(self.coord[:, 0]/180*np.pi)
-        latitude = list(self.coord[:, 1]/180*np.pi)
+        The coordinate array is overwritten with the projected values unless
+        a different ``dtype`` (e.g. np.float32) is requested, in which case
+        a single converted copy is made first. Returns x and y as views
+        into the new coordinate array.
+        """
         radius = 6378206.4
-        loncc = lonc / 180 * np.pi
-        latcc = latc / 180 * np.pi
-        x = [
-            radius * (longitude[i] - loncc) * np.cos(latcc)
-            for i in np.arange(len(longitude))
-        ]
-        y = [radius * latitude[i] for i in np.arange(len(latitude))]
-        self._coords = np.vstack([x, y]).T
+        coords = self._coords
+        if dtype is not None or not np.issubdtype(coords.dtype, np.floating):
+            coords = coords.astype(np.float64 if dtype is None else dtype,
+                                   copy=False)
+        np.radians(coords, out=coords)
+        coords[:, 0] -= np.radians(lonc)
+        coords *= radius
+        coords[:, 0] *= np.cos(np.radians(latc))
+        self._coords = coords
         self._crs = None
-        return x, y
+        self.cache.invalidate("coords")
+        return coords[:, 0], coords[:, 1]
 
     def get_xy(self, crs: Union[CRS, str] = None):
         if crs is not None:
@@ -101,13 +249,14 @@ class Nodes:
         return self.coord
 
     @property
+    @cached("nodes_gdf", depends=("coords", "values"))
     def gdf(self):
-        if not hasattr(self, "_gdf"):
-            data = []
-            for id, coord, values in zip(self._id, self._coords, self.values):
-                data.append({"geometry": Point(coord), "id": id, "values": values})
-            self._gdf = gpd.GeoDataFrame(data, crs=self.crs)
-        return self._gdf
+        values = self.values if self.values.ndim == 1 else list(self.values)
+        return gpd.GeoDataFrame(
+            {"id": self._id, "values": values},
+            geometry=shapely.points(self._coords),
+            crs=self.crs,
+        )
 
     @property
     def id(self):
@@ -140,6 +289,26 @@ class Nodes:
             self.node_id_to_index = {self.id[i]: i for i in range(len(self.id))}
         return self.node_id_to_index[id]
 
+    def get_indexes_by_ids(self, ids: Sequence[Hashable]) -> np.ndarray:
+        """Vectorized :meth:`get_index_by_id` through a sorted id array."""
+        ids = np.asarray(ids)
+        if ids.size == 0:
+            return np.empty(ids.shape, dtype=int)
+        sorter, sorted_id = self.sorted_id
+        pos = np.searchsorted(sorted_id, ids)
+        pos[pos == len(sorted_id)] = 0
+        found = sorted_id[pos] == ids
+        if not np.all(found):
+            raise KeyError(ids[~found].flat[0])
+        return sorter[pos]
+
+    @property
+    @cached("sorted_id")
+    def sorted_id(self):
+        id = np.asarray(self._id)
+        sorter = np.argsort(id, kind="stable")
+        return sorter, id[sorter]
+
     def get_id_by_index(self, index: int):
         if not hasattr(self, "node_index_to_id"):
             self.node_index_to_id = {i: self.id[i] for i in range(len(self.id))}
@@ -173,6 +342,10 @@ class Elements:
         self.nodes = nodes
         self.elements = elements
 
+    @property
+    def cache(self):
+        return self.nodes.cache
+
     def __len__(self):
         return len(self.elements)
 
@@ -202,19 +375,21 @@ class Elements:
         return self.element_index_to_id[index]
 
     def get_indexes_around_index(self, index):
-        if not hasattr(self, "indexes_around_index"):
-
-            def append_geom(geom):
-                for simplex in geom:
-                    for i, j in permutations(simplex, 2):
-                        indexes_around_index[i].add(j)
-
-            indexes_around_index = defaultdict(set)
-            append_geom(self.triangles)
-            append_geom(self.quads)
-            self.indexes_around_index = indexes_around_index
         return list(self.indexes_around_index[index])
 
+    @property
+    @cached("indexes_around_index")
+    def indexes_around_index(self):
+        def append_geom(geom):
+            for simplex in geom:
+                for i, j in permutations(simplex, 2):
+                    indexes_around_index[i].add(j)
+
+        indexes_around_index = defaultdict(set)
+        append_geom(self.triangles)
+        append_geom(self.quads)
+        return indexes_around_index
+
     def get_ball(self, order: int, id=None, index=None):
 
         if not isinstance(order, int):
@@ -255,6 +430,7 @@ class Elements:
             )
         return self.gdf.loc[eidxs].geometry.unary_union.exterior
 
+    @cached("node_ball")
     def get_node_ball(self):
         '''
         compute nodal ball information
@@ -276,6 +452,7 @@ class Elements:
         ine = np.array([np.array(ine[i]) for i in np.arange(NP)], dtype='O') 
         return nne, ine
 
+    @cached("centroids", depends=("coords", "values"))
     def compute_centroid(self):
         elnode = self.array
         NE = self.elements.__len__()
@@ -302,6 +479,13 @@ class Elements:
         return x_centr, y_centr, dp_centr
 
     def get_areas(self, crs: Union[CRS, str] = None):
+        return self.cache.get(
+            ("areas", None if crs is None else str(crs)),
+            lambda: self._get_areas(crs),
+            depends=("coords",),
+        )
+
+    def _get_areas(self, crs):
         xy = self.nodes.get_xy(crs)
         x = xy[:, 0]
         y = xy[:, 1]
@@ -429,86 +613,114 @@ class Elements:
         return self._qua_idxs
 
     @property
+    @cached("sides")
     def sides(self):
-        if not hasattr(self, "_sides"):
-
-            sides = []
-            for element in self.elements.values():
-                if len(element) == 3:
-                    results = list(map(self.nodes.get_index_by_id, element))
-                    # print(len(results))
-                    # print(f'nodes are {results[0]}, {results[1]}, {results[2]}')
-                    sides.append([results[1], results[2]])
-                    sides.append([results[2], results[0]])
-                    sides.append([results[0], results[1]])
-
-                elif len(element) == 4:
-                    results = list(map(self.nodes.get_index_by_id, element))
-                    # print(f'nodes are {p1}, {p2}, {p3}, {p4}')
-                    sides.append([results[1], results[2]])
-                    sides.append([results[2], results[3]])
-                    sides.append([results[3], results[0]])
-                    sides.append([results[0], results[1]])
-
-            # from pyPoseidon
-            def remove_reversed_duplicates(iterable):
-                # Create a set for already seen elements
-                seen = set()
-                for item in iterable:
-                    # Lists are mutable so we need tuples for the set-operations.
-                    tup = tuple(item)
-                    if tup not in seen:
-                        # If the tuple is not in the set append it in REVERSED order.
-                        seen.add(tup[::-1])
-                        # If you also want to remove normal duplicates uncomment the next line
-                        # seen.add(tup)
-                        yield item
-
-            self._sides = np.array(list(remove_reversed_duplicates(sides)))
-
-        return self._sides
+        sides = []
+        for element in self.elements.values():
+            if len(element) == 3:
+                results = list(map(self.nodes.get_index_by_id, element))
+                # print(len(results))
+                # print(f'nodes are {results[0]}, {results[1]}, {results[2]}')
+                sides.append([results[1], results[2]])
+                sides.append([results[2], results[0]])
+                sides.append([results[0], results[1]])
+
+            elif len(element) == 4:
+                results = list(map(self.nodes.get_index_by_id, element))
+                # print(f'nodes are {p1}, {p2}, {p3}, {p4}')
+                sides.append([results[1], results[2]])
+                sides.append([results[2], results[3]])
+                sides.append([results[3], results[0]])
+                sides.append([results[0], results[1]])
+
+        # from pyPoseidon
+        def remove_reversed_duplicates(iterable):
+            # Create a set for already seen elements
+            seen = set()
+            for item in iterable:
+                # Lists are mutable so we need tuples for the set-operations.
+                tup = tuple(item)
+                if tup not in seen:
+                    # If the tuple is not in the set append it in REVERSED order.
+                    seen.add(tup[::-1])
+                    # If you also want to remove normal duplicates uncomment the next line
+                    # seen.add(tup)
+                    yield item
+
+        return np.array(list(remove_reversed_duplicates(sides)))
 
     @property
+    @cached("triangulation", depends=("coords",))
     def triangulation(self):
-        if not hasattr(self, "_triangulation"):
-            triangles = self.triangles.tolist()
-            for quad in self.quads:
-                triangles.append([quad[0], quad[1], quad[3]])
-                triangles.append([quad[1], quad[2], quad[3]])
-            self._triangulation = Triangulation(
-                self.nodes.coord[:, 0], self.nodes.coord[:, 1], triangles
+        # each quad is split into (0, 1, 3) and (1, 2, 3), appended pairwise
+        # after the triangles; get_triangulation_mask relies on this order.
+        quads = np.reshape(self.quads, (-1, 4))
+        triangles = np.vstack(
+            [
+                np.reshape(self.triangles, (-1, 3)),
+                np.stack([quads[:, [0, 1, 3]], quads[:, [1, 2, 3]]], axis=1)
+                .reshape(-1, 3),
+            ]
+        ).astype(np.int32)
+        digest = hashlib.md5(triangles.tobytes())
+        digest.update(str(len(self.nodes.coord)).encode())
+        digest = digest.hexdigest()
+        stored = self.cache.load_arrays("triangulation", digest)
+        if stored is not None:
+            triangulation = Triangulation(
+                self.nodes.coord[:, 0], self.nodes.coord[:, 1], stored["triangles"]
+            )
+            triangulation._neighbors = stored["neighbors"]
+            triangulation._edges = stored["edges"]
+            return triangulation
+        triangulation = Triangulation(
+            self.nodes.coord[:, 0], self.nodes.coord[:, 1], triangles
+        )
+        if self.cache.directory is not None:
+            self.cache.save_arrays(
+                "triangulation",
+                digest,
+                triangles=triangulation.triangles,
+                neighbors=triangulation.neighbors,
+                edges=triangulation.edges,
             )
-        return self._triangulation
+        return triangulation
 
     @property
+    @cached("elements_gdf", depends=("coords",))
     def gdf(self):
-        if not hasattr(self, "_gdf"):
-            logger.info("Generating elements geodataframe.")
-            from time import time
-
-            start = time()
-            data = []
-            for id, element in self.elements.items():
-                data.append(
-                    {
-                        "geometry": Polygon(
-                            self.nodes.coord[list(map(self.get_index_by_id, element))]
-                        ),
-                        "id": id,
-                    }
-                )
-            self._gdf = gpd.GeoDataFrame(data, crs=self.nodes.crs)
-            logger.info(
-                "Generating elements geodataframe took " f"{time()-start} seconds."
+        logger.info("Generating elements geodataframe.")
+        from time import time
+
+        start = time()
+        # Triangles and quads are built as two separate batches so that
+        # shapely.polygons receives a dense (n, 3, 2) or (n, 4, 2) array.
+        geometry = np.empty(len(self.elements), dtype=object)
+        elnode = self.array.filled(-1)
+        nvertex = np.sum(~np.ma.getmaskarray(self.array), axis=1)
+        for i34 in np.unique(nvertex):
+            idxs = np.where(nvertex == i34)[0]
+            geometry[idxs] = shapely.polygons(
+                self.nodes.coord[elnode[idxs, :i34]]
             )
-        return self._gdf
+        gdf = gpd.GeoDataFrame(
+            {"id": self.id}, geometry=geometry, crs=self.nodes.crs
+        )
+        logger.info(
+            "Generating elements geodataframe took " f"{time()-start} seconds."
+        )
+        return gdf
 
 
 class Edges:
     def __init__(self, grd: "Gr3"):
         self.gr3 = grd
 
-    @lru_cache(maxsize=1)
+    @property
+    def cache(self):
+        return self.gr3.cache
+
+    @cached("edges", depends=("coords",))
     def __call__(self) -> gpd.GeoDataFrame:
         data = []
         for ring in self.gr3.hull.rings().itertuples():
@@ -536,7 +748,11 @@ class Rings:
     def __init__(self, grd: "Gr3"):
         self.gr3 = grd
 
-    @lru_cache(maxsize=1)
+    @property
+    def cache(self):
+        return self.gr3.cache
+
+    @cached("rings", depends=("coords",))
     def __call__(self) -> gpd.GeoDataFrame:
         data = []
         for bnd_id, rings in self.sorted().items():
@@ -557,7 +773,7 @@ class Rings:
     def interior(self):
         return self().loc[self()["type"] == "interior"]
 
-    @lru_cache(maxsize=1)
+    @cached("sorted_rings", depends=("coords",))
     def sorted(self):
         tri = self.gr3.elements.triangulation
         idxs = np.vstack(list(np.where(tri.neighbors == -1))).T
@@ -573,7 +789,11 @@ class Hull:
         self.edges = Edges(grd)
         self.rings = Rings(grd)
 
-    @lru_cache(maxsize=1)
+    @property
+    def cache(self):
+        return self.gr3.cache
+
+    @cached("hull", depends=("coords",))
     def __call__(self) -> gpd.GeoDataFrame:
         data = []
         for bnd_id in np.unique(self.rings()["bnd_id"].tolist()):
@@ -596,25 +816,26 @@ class Hull:
             )
         return gpd.GeoDataFrame(data, crs=self.gr3.crs)
 
-    @lru_cache(maxsize=1)
+    @cached("hull_exterior", depends=("coords",))
     def exterior(self):
-        data = []
+        geometry = []
         for exterior in (
             self.rings().loc[self.rings()["type"] == "exterior"].itertuples()
         ):
-            data.append({"geometry": Polygon(exterior.geometry.coords)})
-        return gpd.GeoDataFrame(data, crs=self.gr3.crs)
+            geometry.append(Polygon(exterior.geometry.coords))
+        return gpd.GeoDataFrame(geometry=geometry, crs=self.gr3.crs)
 
-    @lru_cache(maxsize=1)
+    @cached("hull_interior", depends=("coords",))
     def interior(self):
-        data = []
+        # an empty frame on meshes without islands
+        geometry = []
         for interior in (
             self.rings().loc[self.rings()["type"] == "interior"].itertuples()
         ):
-            data.append({"geometry": Polygon(interior.geometry.coords)})
-        return gpd.GeoDataFrame(data, crs=self.gr3.crs)
+            geometry.append(Polygon(interior.geometry.coords))
+        return gpd.GeoDataFrame(geometry=geometry, crs=self.gr3.crs)
 
-    @lru_cache(maxsize=1)
+    @cached("hull_implode", depends=("coords",))
     def implode(self) -> gpd.GeoDataFrame:
         return gpd.GeoDataFrame(
             {
@@ -625,7 +846,7 @@ class Hull:
             crs=self.gr3.crs,
         )
 
-    @lru_cache(maxsize=1)
+    @cached("hull_multipolygon", depends=("coords",))
     def multipolygon(self) -> MultiPolygon:
         polygon_collection = []
         for rings in self.rings.sorted().values():
@@ -643,7 +864,8 @@ class Hull:
 class Gr3(ABC):
     def __init__(self, nodes, elements=None, description=None, crs=None):
 
-        self.nodes = Nodes(nodes, crs)
+        self.cache = MeshCache()
+        self.nodes = Nodes(nodes, crs, cache=self.cache)
         self.elements = Elements(self.nodes, elements)
         self.description = "" if description is None else str(description)
         self.hull = Hull(self)
@@ -663,18 +885,23 @@ class Gr3(ABC):
         if format in ["gr3", "grd"]:
             grd.write(self.to_dict(), path, overwrite)
         elif format in ["sms", "2dm", "sms2dm"]:
-            sms2dm.write(
+            sms2dm.write_arrays(
                 {
                     "ND": {
-                        i
-                        + 1: (
-                            coord,
-                            -self.values[i] if not np.isnan(self.values[i]) else -99999,
-                        )
-                        for i, coord in enumerate(self.coords)
+                        "id": np.arange(1, len(self.coords) + 1),
+                        "coords": self.coords,
+                        "values": np.where(
+                            np.isnan(self.values), -99999, -self.values
+                        ),
+                    },
+                    "E3T": {
+                        "id": np.arange(1, len(self.triangles) + 1),
+                        "nodes": np.reshape(self.triangles, (-1, 3)) + 1,
+                    },
+                    "E4Q": {
+                        "id": np.arange(1, len(self.quads) + 1),
+                        "nodes": np.reshape(self.quads, (-1, 4)) + 1,
                     },
-                    "E3T": {i + 1: index + 1 for i, index in enumerate(self.triangles)},
-                    "E4Q": {i + 1: index + 1 for i, index in enumerate(self.quads)},
                 },
                 path,
                 overwrite,
@@ -710,8 +937,35 @@ class Gr3(ABC):
                 "Argument output_type must a string literal 'polygon' or " "'bbox'"
             )
 
+    def get_quality_metrics(self, dt=None, depth=None, nprocs=None,
+                            chunk_size=mesh_metrics.CHUNK_SIZE):
+        """Returns per-element areas and quality metrics.
+
+        See :mod:`mesh_metrics` for the list of metrics. Geographic meshes
+        are measured in meters; a mesh without CRS is treated as geographic
+        when its coordinates fall within lon/lat bounds. ``depth`` defaults
+        to the node values and is only needed when ``dt`` is given.
+        """
+        if self.crs is not None:
+            geographic = self.crs.is_geographic
+        else:
+            geographic = bool(
+                np.all(np.abs(self.coord[:, 0]) <= 360.)
+                and np.all(np.abs(self.coord[:, 1]) <= 90.)
+            )
+        return mesh_metrics.element_metrics(
+            self.coords,
+            self.elements.array.filled(-1),
+            depth=self.values if depth is None else depth,
+            dt=dt,
+            geographic=geographic,
+            chunk_size=chunk_size,
+            nprocs=nprocs,
+        )
+
     def invert_sign(self):
         self.nodes.values[:] = -self.nodes.values
+        self.cache.invalidate("values")
 
     def transform_to(self, dst_crs):
         """Transforms coordinate system of mesh in-place."""
@@ -740,16 +994,73 @@ class Gr3(ABC):
             pass
         return cls(**grd.read(pathlib.Path(file), boundaries=False, crs=crs))
 
+    def clip_to_extent(self, elements, extent=None):
+        """Returns the rows of an (n, 3|4) index array whose bounding box
+        overlaps extent = [xmin, xmax, ymin, ymax]."""
+        if extent is None or len(elements) == 0:
+            return elements
+        xmin, xmax, ymin, ymax = extent
+        x = self.x[elements]
+        y = self.y[elements]
+        inside = (
+            (x.max(axis=1) >= xmin)
+            & (x.min(axis=1) <= xmax)
+            & (y.max(axis=1) >= ymin)
+            & (y.min(axis=1) <= ymax)
+        )
+        return elements[inside]
+
+    def rasterize(self, extent=None, shape=(1000, 1000)):
+        """Samples the node values on a regular grid of shape (nrows, ncols).
+
+        Only the triangles (including split quads) overlapping extent are
+        interpolated, so memory use scales with the viewport and the raster
+        rather than with the mesh. Returns the x and y pixel centers and a
+        masked array of values, masked outside of the mesh.
+        """
+        if extent is None:
+            extent = [np.min(self.x), np.max(self.x), np.min(self.y), np.max(self.y)]
+        xmin, xmax, ymin, ymax = extent
+        nrows, ncols = shape
+        x = np.linspace(xmin, xmax, ncols)
+        y = np.linspace(ymin, ymax, nrows)
+        triangles = self.clip_to_extent(self.triangulation.triangles, extent)
+        if len(triangles) == 0:
+            return x, y, np.ma.masked_all((nrows, ncols))
+        used, inverse = np.unique(triangles, return_inverse=True)
+        interpolator = LinearTriInterpolator(
+            Triangulation(self.x[used], self.y[used], inverse.reshape(-1, 3)),
+            self.values[used],
+        )
+        return x, y, interpolator(*np.meshgrid(x, y))
+
     @figure
-    def tricontourf(self, axes=None, show=True, figsize=None, **kwargs):
-        if len(self.triangles) > 0:
-            axes.tricontourf(self.x, self.y, self.triangles, self.values, **kwargs)
+    def rasterplot(
+        self, axes=None, show=False, figsize=None, extent=None, shape=None, **kwargs
+    ):
+        """Draws the values as an image rasterized at the axes' pixel size."""
+        if shape is None:
+            bbox = axes.get_window_extent()
+            shape = (max(int(bbox.height), 1), max(int(bbox.width), 1))
+        x, y, values = self.rasterize(extent, shape)
+        kwargs.setdefault("interpolation", "nearest")
+        axes.imshow(
+            values, origin="lower", extent=(x[0], x[-1], y[0], y[-1]), **kwargs
+        )
         return axes
 
     @figure
-    def tripcolor(self, axes=None, show=True, figsize=None, **kwargs):
-        if len(self.triangles) > 0:
-            axes.tripcolor(self.x, self.y, self.triangles, self.values, **kwargs)
+    def tricontourf(self, axes=None, show=True, figsize=None, extent=None, **kwargs):
+        triangles = self.clip_to_extent(self.triangles, extent)
+        if len(triangles) > 0:
+            axes.tricontourf(self.x, self.y, triangles, self.values, **kwargs)
+        return axes
+
+    @figure
+    def tripcolor(self, axes=None, show=True, figsize=None, extent=None, **kwargs):
+        triangles = self.clip_to_extent(self.triangles, extent)
+        if len(triangles) > 0:
+            axes.tripcolor(self.x, self.y, triangles, self.values, **kwargs)
         return axes
 
     @figure
@@ -790,10 +1101,11 @@ class Gr3(ABC):
         return axes
 
     @figure
-    def quadface(self, axes=None, show=False, figsize=None, **kwargs):
-        if len(self.quads) > 0:
-            pc = PolyCollection(self.coords[self.quads], **kwargs)
-            quad_value = np.mean(self.values[self.quads], axis=1)
+    def quadface(self, axes=None, show=False, figsize=None, extent=None, **kwargs):
+        quads = self.clip_to_extent(self.quads, extent)
+        if len(quads) > 0:
+            pc = PolyCollection(self.coords[quads], **kwargs)
+            quad_value = np.mean(self.values[quads], axis=1)
             pc.set_array(quad_value)
             axes.add_collection(pc)
         return axes
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Element area and quality metrics for SCHISM horizontal grids.
+
+All metrics are computed with array operations on blocks of elements, and
+the blocks are distributed over a multiprocessing pool. For geographic
+meshes, element vertices are projected onto a local tangent plane at the
+element centroid before measuring, so areas and lengths are in meters.
+
+Usage:
+    python mesh_metrics.py hgrid.ll metrics.npz --dt 120 --nprocs 8
+
+Metrics (one float32 value per element):
+    area          Signed area (m^2, or mesh units if planar); negative
+                  values flag clockwise elements
+    min_edge      Shortest side length
+    max_edge      Longest side length
+    aspect_ratio  max_edge / min_edge
+    min_angle     Smallest interior angle (degrees)
+    max_angle     Largest interior angle (degrees)
+    skewness      Equiangular skewness, 0 (ideal) to 1 (degenerate)
+    cfl           sqrt(g*h)*dt/min_edge, only when dt is given
+"""
+
+import argparse
+from multiprocessing import Pool, cpu_count
+import os
+
+import numpy as np
+
+
+EARTH_RADIUS = 6371000.
+GRAVITY = 9.81
+CHUNK_SIZE = 500000
+
+METRICS = ['area', 'min_edge', 'max_edge', 'aspect_ratio', 'min_angle',
+           'max_angle', 'skewness']
+
+_coords = None
+_depth = None
+
+
+def _init_worker(coords, depth):
+    global _coords, _depth
+    _coords = coords
+    _depth = depth
+
+
+def polygon_metrics(xy):
+    """Metrics for an (n, k, 2) block of polygons with k vertices each."""
+    k = xy.shape[1]
+    e_next = np.roll(xy, -1, axis=1) - xy
+    e_prev = np.roll(xy, 1, axis=1) - xy
+    length = np.hypot(e_next[..., 0], e_next[..., 1])
+    area = 0.5 * np.sum(
+        xy[..., 0] * np.roll(xy[..., 1], -1, axis=1)
+        - np.roll(xy[..., 0], -1, axis=1) * xy[..., 1], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos = np.sum(e_next * e_prev, axis=2) / (
+            length * np.roll(length, 1, axis=1))
+        angle = np.degrees(np.arccos(np.clip(cos, -1., 1.)))
+        min_edge = length.min(axis=1)
+        max_edge = length.max(axis=1)
+        min_angle = angle.min(axis=1)
+        max_angle = angle.max(axis=1)
+        theta_e = 180. * (k - 2) / k
+        skewness = np.maximum((max_angle - theta_e) / (180. - theta_e),
+                              (theta_e - min_angle) / theta_e)
+        return {
+            'area': area,
+            'min_edge': min_edge,
+            'max_edge': max_edge,
+            'aspect_ratio': max_edge / min_edge,
+            'min_angle': min_angle,
+            'max_angle': max_angle,
+            'skewness': skewness,
+        }
+
+
+def to_local_meters(lonlat):
+    """Projects (n, k, 2) lon/lat vertices onto the tangent plane at each
+    element's centroid."""
+    dlon = lonlat[..., 0] - lonlat[:, :1, 0]
+    dlon = (dlon + 180.) % 360. - 180.  # elements crossing the dateline
+    lon_c = lonlat[:, :1, 0] + dlon.mean(axis=1, keepdims=True)
+    lat_c = lonlat[..., 1].mean(axis=1, keepdims=True)
+    dlon = np.radians((lonlat[..., 0] - lon_c + 180.) % 360. - 180.)
+    dlat = np.radians(lonlat[..., 1] - lat_c)
+    xy = np.empty(lonlat.shape)
+    xy[..., 0] = EARTH_RADIUS * np.cos(np.radians(lat_c)) * dlon
+    xy[..., 1] = EARTH_RADIUS * dlat
+    return xy
+
+
+def chunk_metrics(elnode, geographic=True, dt=None):
+    """Metrics for a block of the (n, 3|4) connectivity array.
+
+    Triangles in a mixed array are padded with -1 in the last column. Node
+    coordinates and depths are taken from the worker globals set by
+    :func:`_init_worker`.
+    """
+    nvertex = np.sum(elnode >= 0, axis=1)
+    out = {name: np.full(len(elnode), np.nan) for name in METRICS}
+    if dt is not None:
+        out['cfl'] = np.full(len(elnode), np.nan)
+    for k in np.unique(nvertex):
+        idxs = np.where(nvertex == k)[0]
+        nodes = elnode[idxs, :k]
+        xy = _coords[nodes]
+        if geographic:
+            xy = to_local_meters(xy)
+        for name, values in polygon_metrics(xy).items():
+            out[name][idxs] = values
+        if dt is not None:
+            depth = np.maximum(_depth[nodes].mean(axis=1), 0.)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                out['cfl'][idxs] = (np.sqrt(GRAVITY * depth) * dt
+                                    / out['min_edge'][idxs])
+    return {name: values.astype(np.float32) for name, values in out.items()}
+
+
+def element_metrics(coords, elnode, depth=None, dt=None, geographic=True,
+                    chunk_size=CHUNK_SIZE, nprocs=None):
+    """Computes the quality metrics of every element.
+
+    Parameters
+    ----------
+    coords : (NP, 2) array
+        Node coordinates, lon/lat in degrees if ``geographic``.
+    elnode : (NE, 3|4) int array
+        Zero-based node indexes, triangles padded with -1.
+    depth : (NP,) array
+        Nodal depths, positive down, required when ``dt`` is given.
+    dt : float
+        Model time step (DELT_MODEL) in seconds for the CFL estimate.
+    nprocs : int
+        Worker processes, defaults to all cores. 1 runs in-process.
+    """
+    if dt is not None and depth is None:
+        raise ValueError('Argument depth is required to estimate the CFL.')
+    coords = np.asarray(coords, dtype=np.float64)
+    depth = None if depth is None else np.asarray(depth, dtype=np.float64)
+    elnode = np.asarray(elnode)
+    chunks = [elnode[i:i + chunk_size]
+              for i in range(0, len(elnode), chunk_size)]
+    nprocs = cpu_count() if nprocs is None else nprocs
+    nprocs = max(1, min(nprocs, len(chunks)))
+    args = [(chunk, geographic, dt) for chunk in chunks]
+    if nprocs == 1:
+        _init_worker(coords, depth)
+        results = [chunk_metrics(*arg) for arg in args]
+    else:
+        with Pool(processes=nprocs, initializer=_init_worker,
+                  initargs=(coords, depth)) as pool:
+            results = pool.starmap(chunk_metrics, args)
+    return {name: np.concatenate([r[name] for r in results])
+            for name in results[0]} if results else {}
+
+
+def write_metrics(path, metrics):
+    """Saves the metrics as float32 arrays in a single .npz file."""
+    np.savez(path, **metrics)
+
+
+def read_metrics(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compute element area and quality metrics of a hgrid')
+    parser.add_argument('hgrid', help='Input hgrid.gr3 or hgrid.ll file')
+    parser.add_argument('output_file', help='Output .npz metrics file')
+    parser.add_argument('--dt', type=float,
+                        default=os.environ.get('DELT_MODEL'),
+                        help='Model time step in seconds (default: $DELT_MODEL)')
+    parser.add_argument('--nprocs', type=int, default=None,
+                        help='Number of worker processes (default: all cores)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='Elements per work unit')
+    args = parser.parse_args()
+
+    from hgrid import Hgrid
+
+    hgrid = Hgrid.open(args.hgrid)
+    metrics = hgrid.get_quality_metrics(dt=args.dt, nprocs=args.nprocs,
+                                        chunk_size=args.chunk_size)
+    write_metrics(args.output_file, metrics)
+
+    print(f"Elements:          {len(metrics['area'])}")
+    print(f"Non-positive area: {int(np.sum(metrics['area'] <= 0))}")
+    print(f"Min angle:         {np.nanmin(metrics['min_angle']):.2f} deg")
+    print(f"Max skewness:      {np.nanmax(metrics['skewness']):.3f}")
+    print(f"Max aspect:        {np.nanmax(metrics['aspect_ratio']):.2f}")
+    if 'cfl' in metrics:
+        print(f"CFL range:         {np.nanmin(metrics['cfl']):.3f} - "
+              f"{np.nanmax(metrics['cfl']):.3f}")
+    print(f"Output: {args.output_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,102 +1,159 @@
 import os
 import sys
+import hashlib
+import shutil
+import tempfile
 import numpy as np
 import xarray as xr
 import argparse
 
+# Cells per block when computing the spherical cell areas
+AREA_CHUNK = 1000000
+
 def calc_corners(xc, yc, delta=0.25):
     """
     Calculate corner coordinates by averaging neighbor cells
     It follows the approach initially developed by NCL and made
     available through calc_SCRIP_corners_noboundaries() call
-    """
 
-    # Get sizes of original array
+    The centers are extended by one mirrored cell on each side and every
+    corner is the average of the four centers around it, written straight
+    into (grid_size, 4) Fortran-ordered arrays (counterclockwise from the
+    lower left). Longitudes are averaged as differences folded into
+    [-180, 180), and the corner longitudes of each cell are then folded to
+    within 180 degrees of its own center, so cells across the dateline stay
+    compact. Corner latitudes beyond the poles are clipped to +-90.
+    """
     ny, nx = xc.shape
-
-    # Extend array that stores center coordinates
-    xc_ext = np.pad(xc, ((1,1), (1,1)), constant_values=(0, 0))
-    yc_ext = np.pad(yc, ((1,1), (1,1)), constant_values=(0, 0))
-
-    # Get sizes, extended array
-    ny_ext, nx_ext = xc_ext.shape
-
-    # Fill missing part of expanded array
-    # Bottom row, minus corners (left side in data)
-    xc_ext[1:ny_ext-1,0] = mirrorP2P(xc[:,1], xc[:,0])
-    yc_ext[1:ny_ext-1,0] = mirrorP2P(yc[:,1], yc[:,0])
-
-    # Top, minus corners (right side in data)
-    xc_ext[1:ny_ext-1,nx_ext-1] = mirrorP2P(xc[:,nx-2], xc[:,nx-1])
-    yc_ext[1:ny_ext-1,nx_ext-1] = mirrorP2P(yc[:,nx-2], yc[:,nx-1])
-
-    # Left, minus corners (top side in data)
-    xc_ext[0,1:nx_ext-1] = mirrorP2P(xc[1,:], xc[0,:])
-    yc_ext[0,1:nx_ext-1] = mirrorP2P(yc[1,:], yc[0,:])
-
-    # Right, minus corners (bottom side in data)
-    xc_ext[ny_ext-1,1:nx_ext-1] = mirrorP2P(xc[ny-2,:], xc[ny-1,:])
-    yc_ext[ny_ext-1,1:nx_ext-1] = mirrorP2P(yc[ny-2,:], yc[ny-1,:])
-
-    # Lower left corner (upper left corner in data)
-    xc_ext[0,0] = mirrorP2P(xc[1,1], xc[0,0])
-    yc_ext[0,0] = mirrorP2P(yc[1,1], yc[0,0])
-
-    # Upper right corner (lower right corner in data)
-    xc_ext[ny_ext-1,nx_ext-1] = mirrorP2P(xc[ny-2,nx-2], xc[ny-1,nx-1])
-    yc_ext[ny_ext-1,nx_ext-1] = mirrorP2P(yc[ny-2,nx-2], yc[ny-1,nx-1])
-
-    # Lower right corner (upper right corner in data)
-    xc_ext[0,nx_ext-1] = mirrorP2P(xc[1,nx-2], xc[0,nx-1])
-    yc_ext[0,nx_ext-1] = mirrorP2P(yc[1,nx-2], yc[0,nx-1])
-
-    # Upper left corner (lower left corner in data)
-    xc_ext[ny_ext-1,0] = mirrorP2P(xc[ny-2,1], xc[ny-1,0])
-    yc_ext[ny_ext-1,0] = mirrorP2P(yc[ny-2,1], yc[ny-1,0])
-
-    # TODO: need to add code for boundary corners if they go over
-
-    # The cell center of the extended grid, which
-    # would be the corner coordinates for the original grid
-    xo = xc_ext[:,1:nx_ext]+xc_ext[:,0:nx_ext-1]
-    xo = delta*(xo[1:ny_ext,:]+xo[0:ny_ext-1,:])
-    yo = yc_ext[:,1:nx_ext]+yc_ext[:,0:nx_ext-1]
-    yo = delta*(yo[1:ny_ext,:]+yo[0:ny_ext-1,:])
-
-    # Create flattened version of corner coordinates
-    kernel = np.array([[1,1], [1,1]])
-    xo = arrays_from_kernel(xo, kernel).reshape(ny,nx,-1).reshape(-1,kernel.size)
-    xo = xo[:,[0, 1, 3, 2]]
-    yo = arrays_from_kernel(yo, kernel).reshape(ny,nx,-1).reshape(-1,kernel.size)
-    yo = yo[:,[0, 1, 3, 2]]
+    xo = np.empty((ny * nx, 4), order='F')
+    yo = np.empty((ny * nx, 4), order='F')
+    _fill_corners(xo, _corner_grid(_extend(xc, wrap=True), delta, wrap=True), ny, nx)
+    center = np.ravel(xc)
+    for k in range(4):
+        corner = xo[:,k]
+        corner -= center
+        _wrap(corner)
+        corner += center
+    corners = _corner_grid(_extend(yc), delta)
+    np.clip(corners, -90., 90., out=corners)
+    _fill_corners(yo, corners, ny, nx)
 
     # Return flatten arrays
-    return(np.ndarray.flatten(xc),
-           np.ndarray.flatten(yc),
+    return(np.ravel(xc),
+           np.ravel(yc),
            xo,
            yo)
 
-def mirrorP2P(p1, p0):
+def _wrap(d):
+    """
+    Folds longitude differences into [-180, 180) in place
+    """
+    d += 180.
+    np.mod(d, 360., out=d)
+    d -= 180.
+    return d
+
+def mirrorP2P(p1, p0, wrap=False):
     """
     This functions calculates the mirror of p1 with respect to po
     """
     dVec = p1-p0
+    if wrap:
+        dVec = _wrap(np.asarray(dVec, dtype=np.float64))
     return(p0-dVec)
 
-def arrays_from_kernel(arr, kernel):
-    windows = sliding_window(arr, kernel.shape)
-    return np.where(kernel, windows, 0)
+def _extend(c, wrap=False):
+    """
+    Center coordinates padded by one cell mirrored across each edge
+    """
+    ny, nx = c.shape
+    ext = np.empty((ny+2, nx+2))
+    ext[1:-1,1:-1] = c
+
+    # Edges, minus corners
+    ext[1:-1,0] = mirrorP2P(c[:,1], c[:,0], wrap)
+    ext[1:-1,-1] = mirrorP2P(c[:,-2], c[:,-1], wrap)
+    ext[0,1:-1] = mirrorP2P(c[1,:], c[0,:], wrap)
+    ext[-1,1:-1] = mirrorP2P(c[-2,:], c[-1,:], wrap)
+
+    # Corners, mirrored across the diagonal neighbor
+    ext[0,0] = mirrorP2P(c[1,1], c[0,0], wrap)
+    ext[-1,-1] = mirrorP2P(c[-2,-2], c[-1,-1], wrap)
+    ext[0,-1] = mirrorP2P(c[1,-2], c[0,-1], wrap)
+    ext[-1,0] = mirrorP2P(c[-2,1], c[-1,0], wrap)
+    return ext
+
+def _corner_grid(ext, delta=0.25, wrap=False):
+    """
+    (ny+1, nx+1) corners of the original grid, the weighted sum of the four
+    extended centers around each. Longitudes are summed as differences
+    from the lower left center
+    """
+    ref = ext[:-1,:-1]
+    corners = np.zeros(ref.shape)
+    d = np.empty(ref.shape)
+    for other in (ext[:-1,1:], ext[1:,:-1], ext[1:,1:]):
+        np.subtract(other, ref, out=d)
+        if wrap:
+            _wrap(d)
+        corners += d
+    corners *= delta
+    corners += 4*delta*ref
+    return corners
+
+def _fill_corners(out, corners, ny, nx):
+    """
+    Copies the corner grid into the columns of the Fortran-ordered
+    (ny*nx, 4) array through contiguous (ny, nx) views of each column
+    """
+    np.copyto(out[:,0].reshape(ny, nx), corners[:-1,:-1])
+    np.copyto(out[:,1].reshape(ny, nx), corners[:-1,1:])
+    np.copyto(out[:,2].reshape(ny, nx), corners[1:,1:])
+    np.copyto(out[:,3].reshape(ny, nx), corners[1:,:-1])
 
-def sliding_window(data, win_shape, **kwargs):
-    assert data.ndim == len(win_shape)
-    shape = tuple(dn - wn + 1 for dn, wn in zip(data.shape, win_shape)) + win_shape
-    strides = data.strides * 2
-    return np.lib.stride_tricks.as_strided(data, shape=shape, strides=strides, **kwargs)
+def _unit_vectors(lon, lat):
+    """
+    Cartesian unit vectors of lon/lat points in degrees, stacked on the last
+    axis
+    """
+    lon = np.radians(lon)
+    lat = np.radians(lat)
+    cos_lat = np.cos(lat)
+    return np.stack((cos_lat*np.cos(lon), cos_lat*np.sin(lon), np.sin(lat)),
+                    axis=-1)
 
-def to_scrip(xc, yc, xo, yo, mc, dims, output_file='scrip.nc', output_dir='./'):
+def _triangle_area(a, b, c):
     """
-    Writes grid in SCRIP format
+    Spherical excess of the triangles abc on the unit sphere (Van Oosterom
+    and Strackee)
     """
+    triple = np.abs(np.einsum('ij,ij->i', a, np.cross(b, c)))
+    denominator = (1. + np.einsum('ij,ij->i', a, b)
+                   + np.einsum('ij,ij->i', b, c)
+                   + np.einsum('ij,ij->i', c, a))
+    return 2.*np.arctan2(triple, denominator)
+
+def grid_area(xo, yo, chunk_size=AREA_CHUNK):
+    """
+    Area in radians^2 of each cell, the quadrilateral of its four corners on
+    the unit sphere split along a diagonal. Cells collapsed at a pole lose
+    one triangle and keep their true area
+    """
+    area = np.empty(len(xo))
+    for i in range(0, len(xo), chunk_size):
+        p = _unit_vectors(xo[i:i+chunk_size], yo[i:i+chunk_size])
+        area[i:i+chunk_size] = (_triangle_area(p[:,0], p[:,1], p[:,2])
+                                + _triangle_area(p[:,0], p[:,2], p[:,3]))
+    return area
+
+def to_scrip(xc, yc, xo, yo, mc, dims, output_file='scrip.nc', output_dir='./',
+             area=None):
+    """
+    Writes grid in SCRIP format, with the spherical cell areas of
+    grid_area() unless area is given
+    """
+    if area is None:
+        area = grid_area(xo, yo)
 
     # Create new dataset in SCRIP format
     out = xr.Dataset()
@@ -105,10 +162,10 @@ def to_scrip(xc, yc, xo, yo, mc, dims, output_file='scrip.nc', output_dir='./'):
     out['grid_dims'] = xr.DataArray(np.array(dims, dtype=np.int32), dims=('grid_rank',))
     out['grid_center_lon'] = xr.DataArray(xc, dims=('grid_size'), attrs={'units': 'degrees'})
     out['grid_center_lat'] = xr.DataArray(yc, dims=('grid_size'), attrs={'units': 'degrees'})
-    out['grid_corner_lon'] = xr.DataArray(xo, dims=('grid_size','grid_corners'), attrs={'units': 'degrees'}).astype(dtype=np.float64, order='F')
-    out['grid_corner_lat'] = xr.DataArray(yo, dims=('grid_size','grid_corners'), attrs={'units': 'degrees'}).astype(dtype=np.float64, order='F')
+    out['grid_corner_lon'] = xr.DataArray(xo, dims=('grid_size','grid_corners'), attrs={'units': 'degrees'}).astype(dtype=np.float64, order='F', copy=False)
+    out['grid_corner_lat'] = xr.DataArray(yo, dims=('grid_size','grid_corners'), attrs={'units': 'degrees'}).astype(dtype=np.float64, order='F', copy=False)
     out['grid_imask'] = xr.DataArray(mc, dims=('grid_size'), attrs={'units': 'unitless'})
-    out['grid_area'] = xr.DataArray(mc, dims=('grid_size'), attrs={'units': 'unitless'})
+    out['grid_area'] = xr.DataArray(area, dims=('grid_size'), attrs={'units': 'radians^2'})
    
     # Force no '_FillValue' if not specified
     for v in out.variables:
@@ -125,6 +182,106 @@ def to_scrip(xc, yc, xo, yo, mc, dims, output_file='scrip.nc', output_dir='./'):
 
     return(ofile)
 
+def grid_digest(lon_data, lat_data):
+    """
+    md5 of the shapes and values of the center coordinates, used as the
+    cache key of the SCRIP and ESMF mesh files. A N->S 1D latitude is
+    flipped first, so the raw wgrib2 file and the ESMF-ready file share a key
+    """
+    lon_data = np.asarray(lon_data, dtype=np.float64)
+    lat_data = np.asarray(lat_data, dtype=np.float64)
+    if lat_data.ndim == 1 and lat_data.size > 1 and lat_data[0] > lat_data[-1]:
+        lat_data = lat_data[::-1]
+    md5 = hashlib.md5()
+    for array in (lon_data, lat_data):
+        array = np.ascontiguousarray(array)
+        md5.update(str(array.shape).encode())
+        md5.update(array.tobytes())
+    return md5.hexdigest()
+
+def cache_path(cache_dir, kind, digest):
+    """
+    Path of the cached 'scrip' or 'esmf_mesh' file of a grid
+    """
+    return os.path.join(cache_dir, f"{kind}_{digest}.nc")
+
+def cache_store(path, cached):
+    """
+    Copies path into the cache atomically, so that concurrent cycles never
+    read a partial file
+    """
+    directory = os.path.dirname(cached) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix='.nc', dir=directory)
+    os.close(fd)
+    try:
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, cached)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def cache_restore(cached, path):
+    """
+    Hard links (or copies across file systems) a cached file to path
+    """
+    if os.path.lexists(path):
+        os.remove(path)
+    try:
+        os.link(cached, path)
+    except OSError:
+        shutil.copyfile(cached, path)
+    return path
+
+def write_scrip(lon_data, lat_data, output_file='scrip.nc', output_dir='./',
+                verbose=True, cache_dir=None):
+    """
+    Writes the SCRIP grid of 1D (rectilinear, e.g. GFS) or 2D (curvilinear,
+    e.g. HRRR) center coordinates and returns the path of the file
+
+    With cache_dir, the file is restored from the cache when a grid with the
+    same coordinates was written before, and added to it otherwise
+    """
+    if cache_dir:
+        cached = cache_path(cache_dir, 'scrip', grid_digest(lon_data, lat_data))
+        if os.path.exists(cached):
+            if verbose:
+                print(f"SCRIP cache hit: {cached}")
+            return cache_restore(cached, os.path.join(output_dir, output_file))
+
+    # Detect if 1D (rectilinear) or 2D (curvilinear) grid
+    if lon_data.ndim == 1 and lat_data.ndim == 1:
+        # Rectilinear grid (GFS) - expand to 2D
+        if verbose:
+            print(f"Rectilinear grid detected: {len(lon_data)} x {len(lat_data)}")
+        nx = len(lon_data)
+        ny = len(lat_data)
+        lon2d, lat2d = np.meshgrid(lon_data, lat_data)
+    elif lon_data.ndim == 2 and lat_data.ndim == 2:
+        # Curvilinear grid (HRRR) - already 2D
+        if verbose:
+            print(f"Curvilinear grid detected: {lon_data.shape}")
+        ny, nx = lon_data.shape
+        lon2d = lon_data
+        lat2d = lat_data
+    else:
+        raise ValueError(f"Unexpected coordinate dimensions: lon={lon_data.ndim}D, lat={lat_data.ndim}D")
+
+    if verbose:
+        print(f"Grid dimensions: nx={nx}, ny={ny}")
+        print(f"Lon range: {lon2d.min():.4f} to {lon2d.max():.4f}")
+        print(f"Lat range: {lat2d.min():.4f} to {lat2d.max():.4f}")
+
+    # Create SCRIP file with correct 2D dimensions [nx, ny]
+    xc, yc, xo, yo = calc_corners(lon2d, lat2d)
+    grid_dims = [nx, ny]  # SCRIP convention: [nx, ny]
+
+    ofile = to_scrip(xc, yc, xo, yo, np.ones(xc.size, dtype=np.int32),
+                     grid_dims, output_file=output_file, output_dir=output_dir)
+    if cache_dir:
+        cache_store(ofile, cached)
+    return ofile
+
 def main(argv):
     """
     Main function to create SCRIP grid definition file
@@ -141,23 +298,22 @@ def main(argv):
 Examples:
   python proc_scrip.py --ifile gfs_for_esmf.nc --ofile gfs_scrip.nc
   python proc_scrip.py --ifile hrrr_for_esmf.nc --ofile hrrr_scrip.nc
+  python proc_scrip.py --ifile hrrr_raw.nc --digest
         ''')
     parser.add_argument('--ifile', help='Input NetCDF file name', required=True)
     parser.add_argument('--ofile', help='Output SCRIP file name', default='scrip.nc')
     parser.add_argument('--odir', help='Output directory', default='./')
+    parser.add_argument('--cache-dir', default=os.environ.get('ESMF_MESH_CACHE_DIR'),
+                        help='Directory caching SCRIP files by grid digest '
+                             '(default: $ESMF_MESH_CACHE_DIR, no caching if unset)')
+    parser.add_argument('--digest', action='store_true',
+                        help='Only print the grid digest (cache key) of the input')
     args = parser.parse_args()
 
     input_file = args.ifile
     output_file = args.ofile
     output_dir = args.odir
 
-    # Print out configuration
-    print("============================================")
-    print("SCRIP Grid Generation (Python)")
-    print("============================================")
-    print(f"Input:  {input_file}")
-    print(f"Output: {os.path.join(output_dir, output_file)}")
-
     # Open file
     ds = xr.open_dataset(input_file)
 
@@ -179,40 +335,25 @@ Examples:
     if lon_var is None or lat_var is None:
         raise ValueError(f"Could not find lat/lon coordinates. Available: {list(ds.variables.keys())}")
 
-    print(f"Using coordinates: lon={lon_var}, lat={lat_var}")
-
     # Get coordinate arrays
     lon_data = ds[lon_var].values
     lat_data = ds[lat_var].values
-
-    # Detect if 1D (rectilinear) or 2D (curvilinear) grid
-    if lon_data.ndim == 1 and lat_data.ndim == 1:
-        # Rectilinear grid (GFS) - expand to 2D
-        print(f"Rectilinear grid detected: {len(lon_data)} x {len(lat_data)}")
-        nx = len(lon_data)
-        ny = len(lat_data)
-        lon2d, lat2d = np.meshgrid(lon_data, lat_data)
-    elif lon_data.ndim == 2 and lat_data.ndim == 2:
-        # Curvilinear grid (HRRR) - already 2D
-        print(f"Curvilinear grid detected: {lon_data.shape}")
-        ny, nx = lon_data.shape
-        lon2d = lon_data
-        lat2d = lat_data
-    else:
-        raise ValueError(f"Unexpected coordinate dimensions: lon={lon_data.ndim}D, lat={lat_data.ndim}D")
-
-    print(f"Grid dimensions: nx={nx}, ny={ny}")
-    print(f"Lon range: {lon2d.min():.4f} to {lon2d.max():.4f}")
-    print(f"Lat range: {lat2d.min():.4f} to {lat2d.max():.4f}")
-
     ds.close()
 
-    # Create SCRIP file with correct 2D dimensions [nx, ny]
-    xc, yc, xo, yo = calc_corners(lon2d, lat2d)
-    grid_dims = [nx, ny]  # SCRIP convention: [nx, ny]
+    if args.digest:
+        print(grid_digest(lon_data, lat_data))
+        return
 
-    ofile = to_scrip(xc, yc, xo, yo, np.ones(xc.size, dtype=np.int32),
-                     grid_dims, output_file=output_file, output_dir=output_dir)
+    # Print out configuration
+    print("============================================")
+    print("SCRIP Grid Generation (Python)")
+    print("============================================")
+    print(f"Input:  {input_file}")
+    print(f"Output: {os.path.join(output_dir, output_file)}")
+    print(f"Using coordinates: lon={lon_var}, lat={lat_var}")
+
+    ofile = write_scrip(lon_data, lat_data, output_file, output_dir,
+                        cache_dir=args.cache_dir)
 
     print("============================================")
     print(f"SCRIP file created: {ofile}")
@@ -1,193 +1,330 @@
+"""
+Split the SCHISM stack output into per time step fields files and write the
+station NetCDF of a SECOFS nowcast or forecast.
+
+Reads schism_standard_output.ctl (PREFIXNOS, cyc, PDY, mode n|f, start time
+YYYYMMDDHH) in the working directory, which also holds the stacks
+out2d_N.nc, temperature_N.nc, salinity_N.nc, horizontalVel[XY]_N.nc, the
+staout_* files and ${PREFIXNOS}.{nv.nc,sigma.dat,station.lat.lon}.
+
+Each ${PREFIXNOS}.tCCz.PDY.fields.{mode}NNN.nc is written directly as
+compressed NETCDF4 by a pool of workers. Each worker takes blocks of
+consecutive time steps of a stack and reads one [k, :, :] slab at a time,
+optionally prefetching the next one in a thread. The grid arrays are read
+once and shared. The number of workers is bounded by the memory budget.
+The staout_* files of the station NetCDF are tokenized in bulk and read
+concurrently.
+
+Environment:
+    FIELDS_NPROCS           Worker processes of the fields files and of the
+                            staout readers (default: all cores)
+    FIELDS_MAX_MEMORY_MB    Memory budget of the workers (default: 16000)
+    FIELDS_PREFETCH         1 to read the next slab in a thread while the
+                            current one is transposed (default: read inline)
+"""
+
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from multiprocessing import Pool, cpu_count
 import netCDF4 as nc
 from netCDF4 import Dataset
-import subprocess
 import os
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.tri as tri
-
-cfile = "schism_standard_output.ctl"
-with open(cfile, 'r') as file:
-        lines = [line.strip() for line in file.readlines()]
-
-
-PREFIXNOS=lines[0]
-cyc=lines[1]
-day=lines[2]
-mode=lines[3]
-timestart=lines[4]
-
-yyyy= timestart[0:4]
-mm = timestart[4:6]
-dd = timestart[6:8]
-hh = timestart[8:10]
-
-
-data = np.loadtxt('secofs.sigma.dat', dtype=float)  ## this file must be copied to working dir
-sigma1=data.T
 
 
-nvfile=f"{PREFIXNOS}.nv.nc"  ###  now the nv dimensional is in correct order
+MB = 1024**2
+MAX_STACKS = 47
+COMPLEVEL = 4  ## higher deflation level is too slow
+MAX_MEMORY_MB = 16000
+NODE_CHUNK = 16384  # nodes per chunk of the 3-D fields, ~4 MB with 63 levels
 
-print(nvfile)
+VARIABLES_2D = {'zeta': 'elevation', 'uwind_speed': 'windSpeedX',
+                'Vwind_speed': 'windSpeedY'}
+VARIABLES_3D = {'temp': 'temperature', 'salinity': 'salinity',
+                'u': 'horizontalVelX', 'v': 'horizontalVelY'}
 
-ds_nv=nc.Dataset(nvfile)
-nv1=ds_nv.variables["nv"][:]
+# netCDF-C is not thread-safe, so every netCDF call of the prefetch thread
+# and of the writer holds the lock; a prefetched read only overlaps the
+# transposes. Without prefetch, slabs are read inline and the memory of the
+# second slab goes to more workers.
+PREFETCH = os.environ.get('FIELDS_PREFETCH') == '1'
+_nc_lock = threading.Lock()
 
+_static = None   # grid arrays, read once by the parent
+_reader = None   # StackReader of the stack this worker is on
+_buffer = None   # (nv, NODE_CHUNK) transpose buffer of this worker
 
-for i in range(1,48):
-    ii = f"{i:03d}"
-    print(ii)
-#    file2d=f"secofs.t{cyc}z.{day}.out2d.n{ii}.nc"
-#    filetemp=f"secofs.t{cyc}z.{day}.temperature.n{ii}.nc"
-#    filesalt=f"secofs.t{cyc}z.{day}.salinity.n{ii}.nc"
-    file2d=f"out2d_{i}.nc"
-    filetemp=f"temperature_{i}.nc"
-    filesalt=f"salinity_{i}.nc"
-    fileu=f"horizontalVelX_{i}.nc"
-    filev=f"horizontalVelY_{i}.nc"
 
-    filenv='secofs.nv.nc'
-
-    ds_filenv = nc.Dataset(filenv)
-
-    nv1 = ds_filenv.variables["nv"][:]
-
-    if not os.path.exists(file2d):
-        break 
+def read_control(cfile="schism_standard_output.ctl"):
+    with open(cfile, 'r') as file:
+        lines = [line.strip() for line in file.readlines()]
+    timestart = lines[4]
+    return {
+        'PREFIXNOS': lines[0],
+        'cyc': lines[1],
+        'day': lines[2],
+        'mode': lines[3],
+        'time_units': (f"seconds since {timestart[0:4]}-{timestart[4:6]}-"
+                       f"{timestart[6:8]} {timestart[8:10]}:00:00"),
+    }
+
+
+def read_static(ctl, file2d="out2d_1.nc"):
+    """Grid arrays common to all fields files: the element table, sigma
+    levels and node lon, lat and depth."""
+    ds_nv = nc.Dataset(f"{ctl['PREFIXNOS']}.nv.nc")  ###  now the nv dimensional is in correct order
+    nv1 = ds_nv.variables["nv"][:].astype(np.int32)
+    ds_nv.close()
+    ## this file must be copied to working dir
+    sigma1 = np.loadtxt(f"{ctl['PREFIXNOS']}.sigma.dat", dtype=np.float32).T
+    static = {'ctl': ctl, 'nv': nv1, 'sigma': np.ascontiguousarray(sigma1)}
+    with Dataset(file2d) as ds_grid:
+        static['h'] = ds_grid.variables["depth"][:].astype(np.float32)
+        static['lon'] = ds_grid.variables["SCHISM_hgrid_node_x"][:].astype(np.float32)
+        static['lat'] = ds_grid.variables["SCHISM_hgrid_node_y"][:].astype(np.float32)
+    return static
+
+
+class StackReader:
+    """Time step slabs of one output stack, read on demand.
+
+    The stack files stay open for all the steps of the stack and values
+    are read raw, without building masked arrays. The _FillValue (or
+    missing_value) of each source variable is kept in fill_values, so that
+    the outputs flag the same values as missing.
+    """
+
+    def __init__(self, i):
+        self.i = i
+        with _nc_lock:
+            self.grid = Dataset(f"out2d_{i}.nc")
+            self.datasets = {source: Dataset(f"{source}_{i}.nc")
+                             for source in VARIABLES_3D.values()}
+            for ds in [self.grid] + list(self.datasets.values()):
+                ds.set_auto_mask(False)
+            self.time = self.grid.variables["time"][:]
+            self.fill_values = {
+                name: _fill_value(self.grid.variables[source])
+                for name, source in VARIABLES_2D.items()}
+            self.fill_values.update({
+                name: _fill_value(self.datasets[source].variables[source])
+                for name, source in VARIABLES_3D.items()})
+
+    def slab(self, k):
+        """The 2-D (node) and 3-D (node, nv) fields of time step k."""
+        with _nc_lock:
+            fields = {name: self.grid.variables[source][k, :]
+                      for name, source in VARIABLES_2D.items()}
+            for name, source in VARIABLES_3D.items():
+                fields[name] = self.datasets[source].variables[source][k, :, :]
+        return fields
+
+    def close(self):
+        with _nc_lock:
+            self.grid.close()
+            for ds in self.datasets.values():
+                ds.close()
+
+
+def _fill_value(var):
+    """The float32 _FillValue or missing_value of var, None if it has
+    neither."""
+    for attr in ('_FillValue', 'missing_value'):
+        if attr in var.ncattrs():
+            return np.float32(np.ravel(var.getncattr(attr))[0])
+    return None
+
+
+def fields_tasks(nprocs):
+    """Blocks (stack, [(step, output index), ...]) of consecutive time steps
+    of the stacks present, about two per worker."""
+    stacks = []
+    for i in range(1, MAX_STACKS + 1):
+        file2d = f"out2d_{i}.nc"
+        if not os.path.exists(file2d):
+            break
+        with Dataset(file2d) as ds_grid:
+            nstep = len(ds_grid.variables["time"])
+        print(file2d, nstep)
+        stacks.append((i, [(k, (i - 1) * nstep + k + 1) for k in range(nstep)]))
+    ntasks = sum(len(steps) for _, steps in stacks)
+    block = max(1, -(-ntasks // (2 * nprocs)))
+    return [(i, steps[j:j + block]) for i, steps in stacks
+            for j in range(0, len(steps), block)]
+
+
+def plan_workers(nnode, nver, nprocs=None, max_memory=MAX_MEMORY_MB,
+                 prefetch=PREFETCH):
+    """Number of workers fitting the memory budget in MB.
+
+    The grid arrays are read once by the parent and shared. A worker holds
+    one time step of the 3-D variables, two with prefetch (the one being
+    written and the next one), and a one-chunk transpose buffer.
+    """
+    slabs = 2 if prefetch else 1
+    static_bytes = nnode * nver * 4 + 3 * 2 * nnode * 4 + 3 * nnode * 4
+    step_bytes = (slabs * (len(VARIABLES_3D) * nnode * nver * 4 + 3 * nnode * 4)
+                  + 2 * NODE_CHUNK * nver * 4)
+    nprocs = cpu_count() if nprocs is None else int(nprocs)
+    fit = int((max_memory * MB - static_bytes) // step_bytes)
+    return max(1, min(nprocs, fit))
+
+
+def _init_worker(static):
+    global _static
+    _static = static
+
+
+def _open_stack(i):
+    """The reader of stack i, reusing the one of the previous block."""
+    global _reader
+    if _reader is not None and _reader.i != i:
+        _reader.close()
+        _reader = None
+    if _reader is None:
+        _reader = StackReader(i)
+    return _reader
+
+
+def write_transposed(var, values):
+    """Writes a (node, nv) slab to the (time, nv, node) variable var.
+
+    Each NODE_CHUNK block of nodes is transposed into the reusable buffer
+    of the worker and written as exactly one chunk of var. Only the write
+    holds _nc_lock; the cache-sized transpose is made without it, so it can
+    overlap the read of a prefetched slab.
+    """
+    global _buffer
+    nnode, nver = values.shape
+    if _buffer is None or _buffer.shape != (nver, NODE_CHUNK):
+        _buffer = np.empty((nver, NODE_CHUNK), dtype=np.float32)
+    for j0 in range(0, nnode, NODE_CHUNK):
+        j1 = min(j0 + NODE_CHUNK, nnode)
+        block = _buffer[:, :j1 - j0]
+        np.copyto(block, values[j0:j1].T, casting='unsafe')
+        with _nc_lock:
+            var[0, :, j0:j1] = block
+
+
+def write_fields(k, iii, time1, slab, fill_values=None):
+    """Writes the fields of time step k to fields.{mode}{iii:03d}.nc, with
+    the fill values of the source variables by name."""
+    ctl = _static['ctl']
+    nfields = (f"{ctl['PREFIXNOS']}.t{ctl['cyc']}z.{ctl['day']}."
+               f"fields.{ctl['mode']}{iii:03d}.nc")
+    print(nfields)
+    nv1 = _static['nv']
+    sigma1 = _static['sigma']
+    fill_values = fill_values or {}
+
+    with _nc_lock:
+        ncfile = Dataset(nfields, mode='w', format='NETCDF4')
+        ncfile.createDimension('node', len(_static['lon']))
+        ncfile.createDimension('nele', nv1.shape[1])  ##  note this value is more than the original 3322329
+        ncfile.createDimension('nface', 3)
+        ncfile.createDimension('nv', sigma1.shape[1])
+        ncfile.createDimension('time', None)
+
+        compression = {'zlib': True, 'complevel': COMPLEVEL, 'shuffle': True}
+        lon = ncfile.createVariable('lon', np.float32, ('node'), **compression)
+        lat = ncfile.createVariable('lat', np.float32, ('node'), **compression)
+        time = ncfile.createVariable('time', np.float32, ('time'))
+        time.units = ctl['time_units']
+
+        ele = ncfile.createVariable('ele', 'i4', ('nface', 'nele'), **compression)  ## Triangular Element Table
+        h = ncfile.createVariable('h', np.float32, ('node'), **compression)
+        sigma = ncfile.createVariable('sigma', np.float32, ('node', 'nv'),
+                                      chunksizes=(min(NODE_CHUNK, len(_static['lon'])),
+                                                  sigma1.shape[1]),
+                                      **compression)
+
+        surface = {name: ncfile.createVariable(name, np.float32, ('time', 'node'),
+                                               fill_value=fill_values.get(name),
+                                               **compression)
+                   for name in VARIABLES_2D}
+        # Chunks of all levels of a node block, matching the blocks of the
+        # (node, nv) source slabs
+        chunks = (1, sigma1.shape[1], min(NODE_CHUNK, len(_static['lon'])))
+        variables = {name: ncfile.createVariable(name, np.float32, ('time', 'nv', 'node'),
+                                                 chunksizes=chunks,
+                                                 fill_value=fill_values.get(name),
+                                                 **compression)
+                     for name in VARIABLES_3D}
+
+        h[:] = _static['h']
+        lon[:] = _static['lon']
+        lat[:] = _static['lat']
+        ele[:, :] = nv1
+        sigma[:, :] = sigma1
+        time[:] = time1[k]
+        for name, var in surface.items():
+            var[0, :] = slab[name]
+
+    for name, var in variables.items():
+        write_transposed(var, slab[name])
+
+    with _nc_lock:
+        ncfile.close()
+    return nfields
+
+
+def write_fields_block(i, steps):
+    """Writes consecutive time steps of stack i. With PREFETCH, the slab of
+    the next step is read in the background while the current one is
+    transposed; the netCDF calls of both threads take turns on the lock."""
+    reader = _open_stack(i)
+    written = []
+    if not PREFETCH:
+        for k, iii in steps:
+            written.append(write_fields(k, iii, reader.time, reader.slab(k),
+                                        reader.fill_values))
+        return written
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        pending = prefetch.submit(reader.slab, steps[0][0])
+        for n, (k, iii) in enumerate(steps):
+            slab = pending.result()
+            if n + 1 < len(steps):
+                pending = prefetch.submit(reader.slab, steps[n + 1][0])
+            written.append(write_fields(k, iii, reader.time, slab,
+                                        reader.fill_values))
+            del slab
+    return written
+
+
+def write_all_fields(ctl, nprocs=None, max_memory=MAX_MEMORY_MB):
+    global _reader
+    if not os.path.exists("out2d_1.nc"):
+        return []
+    static = read_static(ctl)
+    with Dataset("temperature_1.nc") as ds_temp:
+        nver = ds_temp.variables["temperature"].shape[-1]
+    nprocs = plan_workers(len(static['lon']), nver, nprocs, max_memory)
+    tasks = fields_tasks(nprocs)
+    nprocs = min(nprocs, len(tasks))
+    print(f"Writing {sum(len(steps) for _, steps in tasks)} fields files "
+          f"with {nprocs} workers")
+
+    if nprocs == 1:
+        _init_worker(static)
+        written = [write_fields_block(*task) for task in tasks]
+        if _reader is not None:
+            _reader.close()
+            _reader = None
     else:
-        print(file2d)
-        
-        ds_grid = nc.Dataset(file2d)
-        ds_temp = nc.Dataset(filetemp)
-        ds_salt = nc.Dataset(filesalt)
-        ds_u = nc.Dataset(fileu)
-        ds_v = nc.Dataset(filev)
-
-        time1 = ds_grid.variables["time"][:]
-
-
-        zeta1 = ds_grid.variables["elevation"][:]
-        nstep = len(time1)
-        
-        print(nstep)
-
-        h1= ds_grid.variables["depth"][:]
-
-        x1 = ds_grid.variables["SCHISM_hgrid_node_x"][:]
-
-        lon1 = ds_grid.variables["SCHISM_hgrid_node_x"][:]
-        lat1 = ds_grid.variables["SCHISM_hgrid_node_y"][:]
-        uwind1 = ds_grid.variables["windSpeedX"][:]
-        vwind1 = ds_grid.variables["windSpeedY"][:]
-
-        temp1 = ds_temp.variables["temperature"][:]
-        salt1 = ds_salt.variables["salinity"][:]
-        u1 = ds_u.variables["horizontalVelX"][:]
-        v1 = ds_v.variables["horizontalVelY"][:]
-
-        print("= mode===", mode)
-
-        if mode == "n":
-            shutil.copyfile("out2d_1.nc", f"secofs.t{cyc}z.{day}.out2d_1.nowcast.nc")
-            shutil.copyfile("zCoordinates_1.nc", f"secofs.t{cyc}z.{day}.zCoordinates_1.nowcast.nc")
-            shutil.copyfile("temperature_1.nc", f"secofs.t{cyc}z.{day}.temperature_1.nowcast.nc")
-            shutil.copyfile("salinity_1.nc", f"secofs.t{cyc}z.{day}.salinity_1.nowcast.nc")
-            shutil.copyfile("horizontalVelX_1.nc", f"secofs.t{cyc}z.{day}.horizontalVelX_1.nowcast.nc")
-            shutil.copyfile("horizontalVelY_1.nc", f"secofs.t{cyc}z.{day}.horizontalVelY_1.nowcast.nc")
-            for k in range(1,9):
-                file= f"staout_{k}"
-                nfile= f"secofs.t{cyc}z.{day}.nowcast.staout_{k}"
-                shutil.copyfile(file, nfile)
-
-
-        for k in range(0,nstep):
-            iii=(i-1)*nstep+k+1
-            kkk = f"{iii:03d}"
-
-#            nfields=f"secofs.t{cyc}z.{day}.fields.{mode}{kkk}.nc"
-            nfields=f"secofs.t{cyc}z.{day}.fields.{mode}{kkk}.nc.old"
-
-            print(nfields)
-
-            ncfile = Dataset(nfields,mode='w',format='NETCDF4_CLASSIC')
-
-            node_dim = ncfile.createDimension('node',1684786)
-            nele_dim = ncfile.createDimension('nele',3332737)  ##  note this value is more than the original 3322329
-            nface_dim = ncfile.createDimension('nface', 3)
-            nv_dim = ncfile.createDimension('nv', 63)
-#            simga_dim = ncfile.createDimension('sigma', 46)
-#            nz_dim = ncfile.createDimension('nz', 17)
-            time_dim =  ncfile.createDimension('time', None)
-
-
-            lon = ncfile.createVariable('lon', np.float32, ('node'))
-            lat = ncfile.createVariable('lat', np.float32, ('node'))
-            time = ncfile.createVariable('time', np.float32, ('time'))
-            time.units = f"seconds since {yyyy}-{mm}-{dd} {hh}:00:00"
-
-            ele = ncfile.createVariable('ele', 'i4', ('nface','nele'))  ## Triangular Element Table
-            h = ncfile.createVariable('h', np.float32, ('node'))
-#            z = ncfile.createVariable('z', np.float32, ('nz'))  
-#            sigma =  ncfile.createVariable('sigma', np.float32, ('sigma'))
+        with Pool(processes=nprocs, initializer=_init_worker,
+                  initargs=(static,)) as pool:
+            written = pool.starmap(write_fields_block, tasks, chunksize=1)
+    return [nfields for block in written for nfields in block]
 
-#            sigma_z = ncfile.createVariable('sigma_z', np.float32, ('nv')) 
 
-
-
-            zeta = ncfile.createVariable('zeta', np.float32, ('time','node'))
-            uwind_speed = ncfile.createVariable('uwind_speed', np.float32, ('time','node'))
-            vwind_speed = ncfile.createVariable('Vwind_speed', np.float32, ('time','node'))
-
-
-            temp = ncfile.createVariable('temp', np.float32, ('time','nv','node'))
-            salinity = ncfile.createVariable('salinity', np.float32, ('time','nv','node'))
-
-            u = ncfile.createVariable('u', np.float32, ('time','nv','node'))
-            v = ncfile.createVariable('v', np.float32, ('time','nv','node'))
-
-            sigma = ncfile.createVariable('sigma', np.float32, ('node','nv'))
-
-
-            h[:] = h1[:]
-            lon[:] = lon1[:] 
-            lat[:] = lat1[:]
-            ele[:,:] = nv1[:,:]
-            sigma[:,:]=sigma1[:,:]
-
-#            z[:] = -5000, -2300, -1800, -1400, -1000, -770, -570, -470, -390, -340, -290, -240, -190, -140, -120, -110, -105 
-
-
-#            for kk in range(46):
-#                sigma[kk]= - (46.0-kk)/46.0
-
-#            for kk in range(63):
-#                sigma_z[kk]= -(63.0-kk)/63.0 
-            
-            time[:] = time1[k]
-
-
-            zeta[0,:] = zeta1[k,:]
-            uwind_speed[0,:] = uwind1[k,:]
-            vwind_speed[0,:] = vwind1[k,:]
-
-            temp[0,:,:] = temp1[k,:,:].T
-            salinity[0,:,:] = salt1[k,:,:].T
-            u[0,:,:] = u1[k,:,:].T
-            v[0,:,:] = v1[k,:,:].T
-
-            ncfile.close()
-            
-            nfieldsn=f"secofs.t{cyc}z.{day}.fields.{mode}{kkk}.nc"
-            ncks_command = [ "ncks", "-4", "-L", "4", nfields, nfieldsn ] ## higher deflation level is too slow
-			
-            try:
-                subprocess.check_call(ncks_command)
-            except subprocess.CalledProcessError as e:
-                print(f"Error executing NCO command: {e}")
-            except FileNotFoundError:
-                print("Error: 'ncks' command not found. Ensure NCO is installed and in your PATH.")
+def copy_nowcast_stacks(ctl):
+    prefix = f"secofs.t{ctl['cyc']}z.{ctl['day']}"
+    for name in ["out2d", "zCoordinates", "temperature", "salinity",
+                 "horizontalVelX", "horizontalVelY"]:
+        shutil.copyfile(f"{name}_1.nc", f"{prefix}.{name}_1.nowcast.nc")
+    for k in range(1, 9):
+        shutil.copyfile(f"staout_{k}", f"{prefix}.nowcast.staout_{k}")
 
 
 ####  station files
@@ -196,219 +333,125 @@ for i in range(1,48):
 # staout_[1..,9] represent elev, air pressure, wind u, wind v, T, S, u, v, w
 #  staout_1 , 2 3, 4, 5 ,6, 7, 8  for SECOFS
 
-if PREFIXNOS == "secofs":
-    nsta=271 # vims original
-    nsta2=nsta*2
-    nver=63
+STAOUT_2D = {'zeta': 1, 'uwind_speed': 3, 'vwind_speed': 4}
+STAOUT_3D = {'temp': 5, 'salinity': 6, 'u': 7, 'v': 8}
+
+
+def read_staout(file_name, nsta, nver=None):
+    """Time and values of the first nsta stations of a staout_* file.
+
+    The file is split into lines and tokenized in bulk. 3-D outputs keep
+    every second line of each time step and come back as
+    (time, nver, nsta); 2-D outputs as (time, nsta). Values are float32.
+    """
+    with open(file_name, 'rb') as file:
+        lines = file.read().rstrip().split(b'\n')
+    if nver is not None:
+        lines = lines[1::2]
+    ncol = len(lines[0].split())
+    arr = np.fromstring(b'\n'.join(lines).decode(), dtype=np.float64,
+                        sep=' ').reshape(-1, ncol)
+    if nver is None:
+        values = arr[:, 1:nsta + 1]
+    else:
+        # Rows hold (2*nsta, nver) values, station-major; the second half
+        # of the stations is dropped by a strided view
+        values = arr[:, 1:].reshape(len(arr), -1, nver)[:, :nsta, :].swapaxes(1, 2)
+    return arr[:, 0], values.astype(np.float32)
+
+
+def write_stations(ctl, nprocs=None):
+    PREFIXNOS = ctl['PREFIXNOS']
+    if PREFIXNOS == "secofs":
+        nsta=271 # vims original
+        nver=63
+
+    # The staout files are parsed concurrently
+    jobs = ([(f"staout_{ind}", nsta) for ind in STAOUT_2D.values()]
+            + [(f"staout_{ind}", nsta, nver) for ind in STAOUT_3D.values()])
+    nprocs = cpu_count() if nprocs is None else int(nprocs)
+    nprocs = max(1, min(nprocs, len(jobs)))
+    if nprocs == 1:
+        results = [read_staout(*job) for job in jobs]
+    else:
+        with Pool(processes=nprocs) as pool:
+            results = pool.starmap(read_staout, jobs)
+    values = dict(zip(list(STAOUT_2D) + list(STAOUT_3D),
+                      [value for _, value in results]))
+    time_values = results[-1][0]
+    nstep = len(time_values)
 
+    if ctl['mode'] == "n":
+        modefull = "nowcast"
+    if ctl['mode'] == "f":
+        modefull = "forecast"
 
-ele_values = []
-uwind_values = []
-vwind_values = []
-temp_values = []
-salt_values = []
-u_values = []
-v_values = []
+    filesta=f"{PREFIXNOS}.t{ctl['cyc']}z.{ctl['day']}.stations.{modefull}.nc"
+    ncfile = Dataset(filesta,mode='w',format='NETCDF4')
+    name_length = 20
 
+    ncfile.createDimension('station',nsta )
+    ncfile.createDimension('clen', name_length )
+    ncfile.createDimension('time',nstep )
+    ncfile.createDimension('siglay',nver )
 
-outindex1 = [ 1, 3, 4 ]
-for ind in outindex1:
-    file_name=f"staout_{ind}"
-    all_numbers_from_file = []
-    first_column = []
-    time_values = []
-#    variable_values = []
-    nline=0
+    time = ncfile.createVariable('time', np.float32, ('time'))
+    time.units = ctl['time_units']
 
-    with open(file_name, 'r') as file:
-        for line in file:
-            nline = nline+1
-            number_strings = line.strip().split()
-            numbers_on_line = [float(num_str) for num_str in number_strings]
-            all_numbers_from_file.append(numbers_on_line)
+    lon = ncfile.createVariable('lon', np.float32, ('station'))
+    lat = ncfile.createVariable('lat', np.float32, ('station'))
 
-    arr = np.array(all_numbers_from_file)
-    time_values = arr[:,0]
+    ncfile.createDimension('num_entries', nsta)
 
-    if ind == 1:
-        ele_values = arr[:,1:nsta+1]
-    if ind == 3:
-        uwind_values = arr[:,1:nsta+1]
-    if ind == 4:
-        vwind_values = arr[:,1:nsta+1]
+    name_station_var = ncfile.createVariable('name_station', 'S1', ('station','clen'))
 
+    zeta = ncfile.createVariable('zeta', np.float32, ('time','station'))
+    uwind = ncfile.createVariable('uwind_speed', np.float32, ('time','station'))
+    vwind = ncfile.createVariable('vwind_speed', np.float32, ('time','station'))
 
-outindex2 = [ 5 ,6, 7, 8 ]
+    temp = ncfile.createVariable('temp', np.float32, ('time','siglay','station'))
+    salinity = ncfile.createVariable('salinity', np.float32, ('time','siglay','station'))
 
-for ind in outindex2:
-    file_name=f"staout_{ind}"
-    all_numbers_from_file = []
-    first_column = []
-    time_values = []
-#    variable_values = []
-    nline=0
+    u = ncfile.createVariable('u', np.float32, ('time','siglay','station'))
+    v = ncfile.createVariable('v', np.float32, ('time','siglay','station'))
 
-    with open(file_name, 'r') as file:
+    all_from_file = []
+    with open(f"{PREFIXNOS}.station.lat.lon", 'r') as file:
         for line in file:
-            nline = nline+1
-            if nline % 2 == 0:
-                number_strings = line.strip().split()
-                numbers_on_line = [float(num_str) for num_str in number_strings]
-                all_numbers_from_file.append(numbers_on_line)
-
-    arr = np.array(all_numbers_from_file)
-    time_values = arr[:,0]
-    nstep=len(time_values)
-
-    if ind == 5:
-        temp0 = arr[:,1:]
-        temp_value = temp0.reshape(nstep,nsta2,nver)
-        temp_value_real = temp_value[:,0:nsta,:]
-        temp_value_real_final = np.swapaxes(temp_value_real,1,2)
-
-    if ind == 6:
-        salt0 = arr[:,1:]
-        salt_value = salt0.reshape(nstep,nsta2,nver)
-        salt_value_real = salt_value[:,0:nsta,:]
-        salt_value_real_final = np.swapaxes(salt_value_real,1,2)
-
-    if ind == 7:
-        u0 = arr[:,1:]
-        u_value = u0.reshape(nstep,nsta2,nver)
-        u_value_real = u_value[:,0:nsta,:]
-        u_value_real_final = np.swapaxes(u_value_real,1,2)
-
-    if ind == 8:
-        v0 = arr[:,1:]
-        v_value = v0.reshape(nstep,nsta2,nver)
-        v_value_real = v_value[:,0:nsta,:]
-        v_value_real_final = np.swapaxes(v_value_real,1,2)
-
-
-if mode == "n":
-    modefull = "nowcast"
-if mode == "f":
-    modefull = "forecast"
-
-filesta=f"{PREFIXNOS}.t{cyc}z.{day}.stations.{modefull}.nc"
-ncfile = Dataset(filesta,mode='w',format='NETCDF4')
-name_length = 20
-
-
-station_dim = ncfile.createDimension('station',nsta )
-clen_dim = ncfile.createDimension('clen', name_length )
-
-
-time_dim = ncfile.createDimension('time',nstep )
-
-siglay_dim = ncfile.createDimension('siglay',nver )
-
-
-time = ncfile.createVariable('time', np.float32, ('time'))
-time.units = f"seconds since {yyyy}-{mm}-{dd} {hh}:00:00"
-
-lon = ncfile.createVariable('lon', np.float32, ('station'))
-lat = ncfile.createVariable('lat', np.float32, ('station'))
-
-num_strings_dim_name = 'num_entries'
-num_entries = nsta
-ncfile.createDimension(num_strings_dim_name, num_entries)
-
-name_station_var = ncfile.createVariable('name_station', 'S1', ('station','clen'))
-
-
-zeta = ncfile.createVariable('zeta', np.float32, ('time','station'))
-uwind = ncfile.createVariable('uwind_speed', np.float32, ('time','station'))
-vwind = ncfile.createVariable('vwind_speed', np.float32, ('time','station'))
-
-
-
-temp = ncfile.createVariable('temp', np.float32, ('time','siglay','station'))
-salinity = ncfile.createVariable('salinity', np.float32, ('time','siglay','station'))
-
-u = ncfile.createVariable('u', np.float32, ('time','siglay','station'))
-v = ncfile.createVariable('v', np.float32, ('time','siglay','station'))
-
-
-
-
-file_name = "secofs.station.lat.lon"
-
-name_station = []
-
-
-all_from_file = []
-lon_values = []
-lat_values = []
-
-
-with open(file_name, 'r') as file:
-    for line in file:
-        number_strings = line.strip().split()
-        all_from_file.append(number_strings)
-
-
-
-arr = np.array(all_from_file)
-
-#for i in range(nsta):
-#    station_names = f"Station_{i+1:03d}"
-
-station_names = [f'station_secofs_{i+1:05d}' for i in range(nsta)] # Example names
-
-names_char_array = nc.stringtochar(np.array(station_names, dtype=f'S{name_length}'))
-name_station_var[:] = names_char_array
-
-
-lon_values = arr[:,1]
-lat_values = arr[:,2]
-
-time[:] = time_values[:]
-lon[:] = lon_values[:]
-lat[:] = lat_values[:]
-zeta[:,:] = ele_values[:,:]
-
-uwind[:,:] = uwind_values[:,:]
-vwind[:,:] = vwind_values[:,:]
-
-#temp[:,:] = temp_values[:,:]
-#salinity[:,:] = salt_values[:,:]
-
-temp[:,:,:] = temp_value_real_final[:,:,:]
-salinity[:,:,:] = salt_value_real_final[:,:,:]
-u[:,:,:] = u_value_real_final[:,:,:]
-v[:,:,:] = v_value_real_final[:,:,:]
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+            all_from_file.append(line.strip().split())
+    arr = np.array(all_from_file)
 
+    station_names = [f'station_secofs_{i+1:05d}' for i in range(nsta)] # Example names
 
+    names_char_array = nc.stringtochar(np.array(station_names, dtype=f'S{name_length}'))
+    name_station_var[:] = names_char_array
 
+    time[:] = time_values[:]
+    lon[:] = arr[:,1]
+    lat[:] = arr[:,2]
+    zeta[:,:] = values['zeta']
 
+    uwind[:,:] = values['uwind_speed']
+    vwind[:,:] = values['vwind_speed']
 
+    temp[:,:,:] = values['temp']
+    salinity[:,:,:] = values['salinity']
+    u[:,:,:] = values['u']
+    v[:,:,:] = values['v']
+    ncfile.close()
 
 
+def main():
+    ctl = read_control()
+    print("= mode===", ctl['mode'])
+    if ctl['mode'] == "n" and os.path.exists("out2d_1.nc"):
+        copy_nowcast_stacks(ctl)
 
+    write_all_fields(ctl, nprocs=os.environ.get('FIELDS_NPROCS'),
+                     max_memory=float(os.environ.get('FIELDS_MAX_MEMORY_MB',
+                                                     MAX_MEMORY_MB)))
+    write_stations(ctl, nprocs=os.environ.get('FIELDS_NPROCS'))
 
 
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,107 @@
+from functools import partial
+import io
+from itertools import islice
 import pathlib
 
+import numpy as np
+
+
+CHUNK_SIZE = 100000
+
 
 def read(path):
+    mesh = read_arrays(path)
     sms2dm = dict()
+    if 'ND' in mesh:
+        nd = mesh['ND']
+        sms2dm['ND'] = dict(zip(
+            nd['id'].astype(str).tolist(),
+            zip(nd['coords'].tolist(), nd['values'].tolist())))
+    for geom_type in ['E3T', 'E4Q']:
+        if geom_type in mesh:
+            geom = mesh[geom_type]
+            sms2dm[geom_type] = dict(zip(
+                geom['id'].astype(str).tolist(), _geom_rows(geom)))
+    return sms2dm
+
+
+def read_arrays(path, chunk_size=CHUNK_SIZE):
+    """Reads the ND, E3T and E4Q cards of a 2dm file into arrays.
+
+    The file is parsed in blocks of ``chunk_size`` lines; the numbers of
+    each card in a block are converted in a single ``np.fromstring`` call.
+    Returns a dict of the form:
+        {'ND': {'id': (NP,), 'coords': (NP, 2), 'values': (NP,)},
+         'E3T': {'id': (NE3,), 'nodes': (NE3, 3)[, 'materials': (NE3, M)]},
+         'E4Q': {'id': (NE4,), 'nodes': (NE4, 4)[, 'materials': (NE4, M)]}}
+    where element nodes are the (one-based) node ids. The material ids
+    following the nodes of an element line are kept in ``materials``,
+    padded with -1 where an element has fewer than M of them.
+    """
+    blocks = {'ND': [], 'E3T': [], 'E4Q': []}
     with open(pathlib.Path(path), 'r') as f:
         f.readline()
-        while 1:
-            line = f.readline().split()
-            if len(line) == 0:
+        while True:
+            lines = list(islice(f, chunk_size))
+            if len(lines) == 0:
                 break
-            if line[0] in ['E3T', 'E4Q']:
-                if line[0] not in sms2dm:
-                    sms2dm[line[0]] = {}
-                sms2dm[line[0]].update({
-                    line[1]: line[2:]
-                    })
-            if line[0] == 'ND':
-                if line[0] not in sms2dm:
-                    sms2dm[line[0]] = {}
-                sms2dm[line[0]].update({
-                    line[1]: (
-                        list(map(float, line[2:-1])), float(line[-1])
-                        )
-                    })
-    return sms2dm
+            rows = {card: [] for card in blocks}
+            for line in lines:
+                fields = line.split(None, 1)
+                if len(fields) == 2 and fields[0] in rows:
+                    rows[fields[0]].append(fields[1])
+            for card, text in rows.items():
+                if len(text) > 0:
+                    blocks[card].append(_parse_rows(text))
+    mesh = dict()
+    if len(blocks['ND']) > 0:
+        nd = _stack(blocks['ND'])
+        if np.isnan(nd).any():
+            raise ValueError('ND lines have different numbers of values.')
+        mesh['ND'] = {'id': nd[:, 0].astype(np.int64),
+                      'coords': nd[:, 1:-1],
+                      'values': nd[:, -1]}
+    for card, nvertex in [('E3T', 3), ('E4Q', 4)]:
+        if len(blocks[card]) > 0:
+            geom = _stack(blocks[card])
+            if geom.shape[1] < 1 + nvertex or np.isnan(geom[:, :1 + nvertex]).any():
+                raise ValueError(f'{card} lines with fewer than {nvertex} nodes.')
+            mesh[card] = {'id': geom[:, 0].astype(np.int64),
+                          'nodes': geom[:, 1:1 + nvertex].astype(np.int64)}
+            if geom.shape[1] > 1 + nvertex:
+                materials = geom[:, 1 + nvertex:]
+                mesh[card]['materials'] = np.where(
+                    np.isnan(materials), -1, materials).astype(np.int64)
+    return mesh
+
+
+def _parse_rows(text):
+    """(len(text), max columns) array of lines of numbers, NaN-padded where
+    a line has fewer columns."""
+    ncols = np.array([len(line.split()) for line in text])
+    values = np.fromstring(' '.join(text), sep=' ')
+    table = np.full((len(text), ncols.max()), np.nan)
+    table[np.arange(ncols.max()) < ncols[:, None]] = values
+    return table
+
+
+def _stack(tables):
+    """Concatenates row tables, NaN-padding them to the widest one."""
+    width = max(table.shape[1] for table in tables)
+    return np.concatenate([
+        np.pad(table, ((0, 0), (0, width - table.shape[1])),
+               constant_values=np.nan)
+        for table in tables])
+
+
+def _geom_rows(geom):
+    """Node and material ids of every element, as lists of strings."""
+    if 'materials' not in geom:
+        return geom['nodes'].astype(str).tolist()
+    table = np.column_stack([geom['nodes'], geom['materials']])
+    if np.all(geom['materials'] >= 0):
+        return table.astype(str).tolist()
+    return [[str(i) for i in row if i >= 0] for row in table.tolist()]
 
 
 def write(sms2dm, path, overwrite=False):
@@ -32,63 +110,157 @@ def write(sms2dm, path, overwrite=False):
         msg = 'File exists, pass overwrite=True to allow overwrite.'
         raise Exception(msg)
     with open(path, 'w') as f:
-        f.write(string(sms2dm))
+        write_buffer(f, sms2dm)
     return 0  # for unittests
 
 
+def write_arrays(mesh, path, overwrite=False, chunk_size=CHUNK_SIZE):
+    """Writes a mesh in the array form returned by :func:`read_arrays`."""
+    path = pathlib.Path(path)
+    if path.is_file() and not overwrite:
+        msg = 'File exists, pass overwrite=True to allow overwrite.'
+        raise Exception(msg)
+    with open(path, 'w') as f:
+        write_arrays_buffer(f, mesh, chunk_size)
+
+
+def write_arrays_buffer(buf, mesh, chunk_size=CHUNK_SIZE):
+    """Streams an array-form 2dm mesh to an open text buffer."""
+    buf.write("MESH2D\n")
+    for geom_type in ['E3T', 'E4Q']:
+        if geom_type in mesh:
+            ids = np.asarray(mesh[geom_type]['id'])
+            nodes = np.reshape(mesh[geom_type]['nodes'], (len(ids), -1))
+            assert np.all(ids > 0)
+            if 'materials' in mesh[geom_type]:
+                nodes = np.column_stack([nodes, mesh[geom_type]['materials']])
+            for start in range(0, len(ids), chunk_size):
+                stop = start + chunk_size
+                _write_geom_table(buf, geom_type, ids[start:stop],
+                                  nodes[start:stop])
+    ids = np.asarray(mesh['ND']['id'])
+    assert np.all(ids > 0)
+    for start in range(0, len(ids), chunk_size):
+        stop = start + chunk_size
+        _write_node_table(buf, ids[start:stop],
+                          mesh['ND']['coords'][start:stop],
+                          mesh['ND']['values'][start:stop])
+
+
+def write_buffer(buf, sms2dm, chunk_size=CHUNK_SIZE):
+    """Streams a 2dm mesh to an open text buffer in blocks of lines."""
+    buf.write("MESH2D\n")
+    if sms2dm is not None:
+        for geom_type in ['E3T', 'E4Q']:
+            if geom_type in sms2dm:
+                _check_ids(sms2dm[geom_type])
+                _write_blocks(buf, sms2dm[geom_type].items(),
+                              partial(_write_geom_block, geom_type),
+                              chunk_size)
+    _check_ids(sms2dm['ND'])
+    _write_blocks(buf, sms2dm['ND'].items(), _write_node_block, chunk_size)
+    buf.write(boundaries(sms2dm))
+
+
 def string(sms2dm):
-    f = graph(sms2dm)
-    f += boundaries(sms2dm)
-    return f
+    buf = io.StringIO()
+    write_buffer(buf, sms2dm)
+    return buf.getvalue()
 
 
 def graph(sms2dm):
     f = "MESH2D\n"
-    # TODO: Make faster using np.array2string
     f += triangular_elements(sms2dm)
     f += quadrilateral_elements(sms2dm)
     f += nodes(sms2dm)
     return f
 
 
+def _check_ids(geoms):
+    assert np.all(np.asarray(list(geoms), dtype=np.int64) > 0)
+
+
+def _write_blocks(buf, items, writer, chunk_size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if len(chunk) == 0:
+            break
+        writer(buf, chunk)
+
+
+def _write_node_table(buf, ids, coords, values):
+    """Writes a block of node lines with one format call."""
+    table = np.empty((len(ids), 4), dtype=object)
+    table[:, 0] = np.asarray(ids, dtype=np.int64)
+    table[:, 1:3] = np.asarray(coords, dtype=float)[:, :2]
+    table[:, 3] = np.asarray(values, dtype=float)
+    row_fmt = "ND %d %.16E %.16E %.16E\n"
+    buf.write((row_fmt * len(table)) % tuple(table.ravel()))
+
+
+def _write_geom_table(buf, geom_type, ids, nodes):
+    """Writes a block of same-type element lines with one format call.
+
+    Negative columns (padding of the material ids) are left out.
+    """
+    table = np.column_stack([ids, nodes]).astype(np.int64)
+    if np.any(table < 0):
+        _write_geom_block(geom_type, buf, [
+            (row[0], [i for i in row[1:] if i >= 0]) for row in table.tolist()])
+        return
+    row_fmt = f"{geom_type} %d " + "%d " * nodes.shape[1] + "\n"
+    buf.write((row_fmt * len(table)) % tuple(table.ravel().tolist()))
+
+
+def _write_node_block(buf, chunk):
+    """Writes a list of (id, (coords, value)) items with one format call."""
+    _write_node_table(
+        buf,
+        [id for id, _ in chunk],
+        np.array([coords[:2] for _, (coords, _) in chunk], dtype=float),
+        [value for _, (_, value) in chunk],
+    )
+
+
+def _write_geom_block(geom_type, buf, chunk):
+    """Writes a list of (id, geom) items with one format call."""
+    row_fmt = "".join(
+        f"{geom_type} %s " + "%s " * len(geom) + "\n" for _, geom in chunk)
+    args = []
+    for id, geom in chunk:
+        args.append(id)
+        args.extend(geom)
+    buf.write(row_fmt % tuple(args))
+
+
 def nodes(sms2dm):
-    assert all(int(id) > 0 for id in sms2dm['ND'])
-    f = ''
-    for id, (coords, value) in sms2dm['ND'].items():
-        f += f"ND {int(id):d} "
-        f += f"{coords[0]:<.16E} "
-        f += f"{coords[1]:<.16E} "
-        f += f"{value:<.16E}\n"
-    return f
+    _check_ids(sms2dm['ND'])
+    buf = io.StringIO()
+    _write_blocks(buf, sms2dm['ND'].items(), _write_node_block, CHUNK_SIZE)
+    return buf.getvalue()
 
 
 def boundaries(sms2dm):
-    f = ''
+    f = []
     if 'boundaries' in sms2dm.keys():
         for ibtype, bnds in sms2dm['boundaries'].items():
             for id, bnd in bnds.items():
-                f += nodestring(bnd['indexes'])
-    return f
+                f.append(nodestring(bnd['indexes']))
+    return ''.join(f)
 
 
 def geom_string(geom_type, sms2dm):
     assert geom_type in ['E3T', 'E4Q', 'E6T', 'E8Q', 'E9Q']
-    assert all(int(id) > 0 for id in sms2dm[geom_type])
-    f = ''
-    for id, geom in sms2dm[geom_type].items():
-        f += f"{geom_type} {id} "
-        for j in range(len(geom)):
-            f += f"{geom[j]} "
-        f += "\n"
-    return f
+    _check_ids(sms2dm[geom_type])
+    buf = io.StringIO()
+    _write_blocks(buf, sms2dm[geom_type].items(),
+                  partial(_write_geom_block, geom_type), CHUNK_SIZE)
+    return buf.getvalue()
 
 
 def nodestring(geom):
-    f = "NS "
-    for i in range(len(geom) - 1):
-        f += f"{geom[i]} "
-    f += f"-{geom[-1]}\n"
-    return f
+    return "NS " + "".join(f"{idx} " for idx in geom[:-1]) + f"-{geom[-1]}\n"
 
 
 def nodestrings(geom):
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# The modules of ush/pysh import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def mesh_dict():
+    """A 3x3 node patch of two quads and four triangles, in the form taken
+    by Gr3/Hgrid (node values are depths)."""
+    nodes = {}
+    for i in range(9):
+        row, col = divmod(i, 3)
+        nodes[str(i + 1)] = ((-75. + 0.1 * col, 35. + 0.1 * row), 1. + i)
+    elements = {
+        '1': ['1', '2', '5', '4'],
+        '2': ['2', '3', '6', '5'],
+        '3': ['4', '5', '8'],
+        '4': ['4', '8', '7'],
+        '5': ['5', '6', '9'],
+        '6': ['5', '9', '8'],
+    }
+    return {'description': 'test EPSG:4326', 'nodes': nodes,
+            'elements': elements, 'crs': 'epsg:4326'}
@@ -0,0 +1,436 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+netCDF4 = pytest.importorskip('netCDF4')
+
+import blend
+
+# HRRR covers the south-western part of SECOFS, GFS all of it
+HRRR_LON = np.arange(-84., -77.9, 0.2)
+HRRR_LAT = np.arange(22., 32.1, 0.2)
+GFS_LON = np.arange(275., 290.1, 0.5)
+GFS_LAT = np.arange(40., 19.9, -0.5)
+HRRR_TIME = 3600. * np.arange(7)
+GFS_TIME = 3 * 3600. * np.arange(3)
+VARIABLES = blend.VARIABLES[:3]
+
+
+def field(lon, lat, time, v, offset):
+    return (offset + v + 0.1 * lon[None] + 0.2 * lat[None]
+            + time[:, None, None] / 3600.).astype(np.float32)
+
+
+def write_source(path, lon2d, lat2d, time, names, offset):
+    with netCDF4.Dataset(path, 'w') as nc:
+        nc.createDimension('time', len(time))
+        if lon2d.ndim == 2:
+            nc.createDimension('y', lon2d.shape[0])
+            nc.createDimension('x', lon2d.shape[1])
+            dims = ('y', 'x')
+            nc.createVariable('longitude', 'f4', dims)[:] = lon2d
+            nc.createVariable('latitude', 'f4', dims)[:] = lat2d
+            lon2d, lat2d = np.meshgrid(lon2d[0], lat2d[:, 0])
+        else:
+            nc.createDimension('latitude', len(lat2d))
+            nc.createDimension('longitude', len(lon2d))
+            dims = ('latitude', 'longitude')
+            nc.createVariable('longitude', 'f4', ('longitude',))[:] = lon2d
+            nc.createVariable('latitude', 'f4', ('latitude',))[:] = lat2d
+            lon2d, lat2d = np.meshgrid(lon2d, lat2d)
+        nc.createVariable('time', 'f8', ('time',))[:] = time
+        for v, name in enumerate(names):
+            var = nc.createVariable(name, 'f4', ('time',) + dims)
+            var.units = 'unit'
+            var.long_name = name
+            var[:] = field(np.where(lon2d > 180, lon2d - 360, lon2d), lat2d,
+                           time, v, offset)
+
+
+@pytest.fixture(scope='module')
+def forcing(tmp_path_factory):
+    path = tmp_path_factory.mktemp('forcing')
+    hrrr_lon2d, hrrr_lat2d = np.meshgrid(HRRR_LON + 360., HRRR_LAT)
+    write_source(path / 'hrrr.nc', hrrr_lon2d, hrrr_lat2d, HRRR_TIME,
+                 [hrrr for hrrr, _ in VARIABLES], 0.)
+    write_source(path / 'gfs.nc', GFS_LON, GFS_LAT, GFS_TIME,
+                 [gfs for _, gfs in VARIABLES], 100.)
+    return path / 'hrrr.nc', path / 'gfs.nc'
+
+
+def read_output(path):
+    with netCDF4.Dataset(path) as nc:
+        return {name: np.array(var[:]) for name, var in nc.variables.items()}
+
+
+def test_blend_nprocs(forcing, tmp_path):
+    hrrr, gfs = forcing
+    outputs = []
+    for nprocs in (1, 2):
+        output = tmp_path / f'blend_{nprocs}.nc'
+        report = blend.blend(hrrr, gfs, output, 'SECOFS', resolution=0.25,
+                             nprocs=nprocs, max_memory=1, chunks=(1, 8, 37))
+        assert set(report) == {'subset', 'weights', 'blend'}
+        outputs.append(read_output(output))
+    one, two = outputs
+    assert set(one) == set(two)
+    for name in one:
+        np.testing.assert_array_equal(one[name], two[name])
+    assert one['TMP_2maboveground'].shape == (7, 57, 37)
+    assert 0 < one['data_source'].mean() < 1
+
+
+def test_imap_bounded():
+    from multiprocessing.pool import ThreadPool
+    with ThreadPool(2) as pool:
+        assert sorted(blend.imap_bounded(pool, abs, range(-5, 5), 2)) \
+            == sorted(map(abs, range(-5, 5)))
+        assert list(blend.imap_bounded(pool, abs, [], 2)) == []
+
+
+def test_imap_bounded_max_pending():
+    submitted = []
+
+    class Pool:
+        def apply_async(self, func, args, callback, error_callback):
+            submitted.append(args[0])
+            callback(func(*args))
+
+    results = blend.imap_bounded(Pool(), abs, range(10), 3)
+    assert submitted == []
+    assert next(results) == 0
+    # one task was consumed and one submitted in its place
+    assert submitted == [0, 1, 2, 3]
+    assert list(results) == list(range(1, 10))
+
+
+def test_imap_bounded_raises():
+    from multiprocessing.pool import ThreadPool
+    with ThreadPool(2) as pool:
+        with pytest.raises(ZeroDivisionError):
+            list(blend.imap_bounded(pool, lambda x: 1 / x, [1, 0, 2], 2))
+
+
+def failing_block(t0, t1, j0, j1):
+    raise RuntimeError(f'block {t0} {j0}')
+
+
+def test_blend_worker_error(forcing, tmp_path, monkeypatch):
+    # workers are forked after the patch, so they inherit it
+    monkeypatch.setattr(blend, 'blend_block', failing_block)
+    with pytest.raises(RuntimeError, match='block'):
+        blend.blend(*forcing, tmp_path / 'blend.nc', 'SECOFS', resolution=0.25,
+                    nprocs=2, max_memory=1)
+
+
+@pytest.mark.parametrize('flip', [False, True])
+def test_gfs_bilinear_weights(flip):
+    from scipy.interpolate import RegularGridInterpolator
+    lat = np.arange(20., 30.1, 0.5)
+    lon = np.arange(-85., -70.1, 0.25)
+    data = np.random.default_rng(0).random((len(lat), len(lon)))
+    target_lon = np.arange(-86., -69., 0.3)
+    target_lat = np.arange(19.3, 31., 0.3)
+    stored = data[::-1] if flip else data
+    indices, weights = blend.gfs_bilinear_weights(lat, lon, flip, target_lon, target_lat)
+    assert indices.shape == weights.shape == (len(target_lat), len(target_lon), 4)
+    result = blend.apply_weights(stored.ravel(), indices.reshape(-1, 4),
+                                 weights.reshape(-1, 4))
+    lon2d, lat2d = np.meshgrid(target_lon, target_lat)
+    expected = RegularGridInterpolator(
+        (lat, lon), data, method='linear', bounds_error=False, fill_value=np.nan
+    )((lat2d.ravel(), lon2d.ravel()))
+    np.testing.assert_array_equal(np.isnan(result), np.isnan(expected))
+    assert not np.isnan(expected).all()
+    np.testing.assert_allclose(result, expected, rtol=1e-5, equal_nan=True)
+
+
+def test_blend_gfs_points(forcing, tmp_path):
+    # Linear fields are reproduced by the bilinear regrid and time
+    # interpolation of GFS where HRRR has no weight
+    blend.blend(*forcing, tmp_path / 'blend.nc', 'SECOFS', resolution=0.25, nprocs=1)
+    out = read_output(tmp_path / 'blend.nc')
+    gfs = out['hrrr_weight'] == 0
+    assert gfs.any()
+    lon = out['longitude'].astype(np.float64)
+    lat = out['latitude'].astype(np.float64)
+    for v, (name, _) in enumerate(VARIABLES):
+        expected = field(lon, lat, HRRR_TIME, v, 100.)
+        np.testing.assert_allclose(out[name][:, gfs], expected[:, gfs], rtol=1e-5)
+
+
+def test_weights_cache(forcing, tmp_path, monkeypatch):
+    weights_dir = tmp_path / 'weights'
+    blend.blend(*forcing, tmp_path / 'first.nc', 'SECOFS', resolution=0.25,
+                nprocs=1, weights_dir=weights_dir)
+    stored, = weights_dir.glob('blend_weights_SECOFS_0.25_nearest_*.npz')
+
+    def remap_weights(*args, **kwargs):
+        raise AssertionError('weights recomputed')
+
+    monkeypatch.setattr(blend, 'remap_weights', remap_weights)
+    blend.blend(*forcing, tmp_path / 'second.nc', 'SECOFS', resolution=0.25,
+                nprocs=1, weights_dir=weights_dir)
+    first, second = read_output(tmp_path / 'first.nc'), read_output(tmp_path / 'second.nc')
+    for name in first:
+        np.testing.assert_array_equal(first[name], second[name])
+    assert list(weights_dir.iterdir()) == [stored]
+
+
+def test_save_load_weights(tmp_path):
+    path = blend.weights_path(tmp_path / 'new', 'SECOFS', 0.025, 'bilinear', 'abc')
+    assert path.endswith('blend_weights_SECOFS_0.025_bilinear_abc.npz')
+    assert blend.load_weights(path) is None
+    arrays = {'a': np.arange(5), 'b': np.ones((2, 3), np.float32)}
+    blend.save_weights(path, **arrays)
+    loaded = blend.load_weights(path)
+    assert set(loaded) == set(arrays)
+    for name in arrays:
+        np.testing.assert_array_equal(loaded[name], arrays[name])
+        assert loaded[name].dtype == arrays[name].dtype
+    assert [p.name for p in (tmp_path / 'new').iterdir()] == [path.split('/')[-1]]
+
+
+def test_grid_digest():
+    lon = np.arange(4.)
+    assert blend.grid_digest(lon, [0, 4]) == blend.grid_digest(lon.copy(), [0, 4])
+    assert blend.grid_digest(lon, [0, 4]) != blend.grid_digest(lon, [0, 3])
+    assert blend.grid_digest(lon.reshape(2, 2)) != blend.grid_digest(lon)
+    assert blend.grid_digest(lon[::2]) == blend.grid_digest(np.array([0., 2.]))
+
+
+def curvilinear_grid():
+    i, j = np.meshgrid(np.arange(40.), np.arange(30.))
+    lon = -80. + 0.1 * i + 0.02 * j + 0.001 * i * j
+    lat = 30. + 0.1 * j - 0.01 * i
+    return lon, lat
+
+
+@pytest.mark.parametrize('method', ['bilinear', 'conservative'])
+def test_hrrr_remap(method):
+    from scipy.sparse import csr_matrix
+    hrrr_lon2d, hrrr_lat2d = curvilinear_grid()
+    target_lon = np.arange(-80.5, -75., 0.125)
+    target_lat = np.arange(29.5, 33.5, 0.125)
+    resolution = 0.125
+    target_lon2d, target_lat2d = np.meshgrid(target_lon, target_lat)
+    if method == 'bilinear':
+        rows, cols, weights, mask = blend.hrrr_bilinear(
+            hrrr_lon2d, hrrr_lat2d, target_lon2d, target_lat2d)
+        rtol = 1e-6
+    else:
+        rows, cols, weights, mask = blend.hrrr_conservative(
+            hrrr_lon2d, hrrr_lat2d, target_lon, target_lat, resolution)
+        # source values are taken at cell centers
+        rtol = 1e-3
+    assert mask.shape == target_lon2d.shape
+    assert 0 < mask.mean() < 1
+    csr = blend.hrrr_csr(rows, cols, weights, mask.size)
+    matrix = csr_matrix((csr['hrrr_weights'], csr['hrrr_columns'], csr['hrrr_indptr']),
+                        shape=(mask.size, hrrr_lon2d.size))
+    row_sums = np.asarray(matrix.sum(axis=1)).ravel()
+    np.testing.assert_allclose(row_sums[mask.ravel()], 1., rtol=1e-6)
+    assert (row_sums[~mask.ravel()] == 0).all()
+    assert (matrix.data >= 0).all()
+
+    def linear(lon, lat):
+        return 10. + 0.5 * lon + 2. * lat
+
+    result = matrix @ linear(hrrr_lon2d, hrrr_lat2d).ravel()
+    expected = linear(target_lon2d, target_lat2d).ravel()
+    np.testing.assert_allclose(result[mask.ravel()], expected[mask.ravel()], rtol=rtol)
+
+
+def test_hrrr_bilinear_inside_cells():
+    hrrr_lon2d, hrrr_lat2d = curvilinear_grid()
+    target_lon2d, target_lat2d = np.meshgrid(np.arange(-80.5, -75., 0.125),
+                                             np.arange(29.5, 33.5, 0.125))
+    _, _, _, mask = blend.hrrr_bilinear(hrrr_lon2d, hrrr_lat2d,
+                                        target_lon2d, target_lat2d)
+    import shapely
+    hull = shapely.Polygon(np.concatenate([
+        np.column_stack([hrrr_lon2d[0], hrrr_lat2d[0]]),
+        np.column_stack([hrrr_lon2d[:, -1], hrrr_lat2d[:, -1]]),
+        np.column_stack([hrrr_lon2d[-1, ::-1], hrrr_lat2d[-1, ::-1]]),
+        np.column_stack([hrrr_lon2d[::-1, 0], hrrr_lat2d[::-1, 0]])]))
+    inside = shapely.contains_xy(hull.buffer(-1e-6), target_lon2d, target_lat2d)
+    outside = ~shapely.contains_xy(hull.buffer(1e-6), target_lon2d, target_lat2d)
+    assert mask[inside].all()
+    assert not mask[outside].any()
+
+
+@pytest.mark.parametrize('method', ['bilinear', 'conservative'])
+def test_blend_hrrr_remap(forcing, tmp_path, method):
+    blend.blend(*forcing, tmp_path / 'blend.nc', 'SECOFS', resolution=0.25,
+                nprocs=1, hrrr_remap=method)
+    out = read_output(tmp_path / 'blend.nc')
+    hrrr = out['hrrr_weight'] == 1
+    assert hrrr.any()
+    lon = out['longitude'].astype(np.float64)
+    lat = out['latitude'].astype(np.float64)
+    # conservative overlaps are not centered on the source cells, which
+    # costs up to the field gradient times a fraction of a source cell
+    atol = 1e-3 if method == 'bilinear' else 0.01
+    for v, (name, _) in enumerate(VARIABLES):
+        expected = field(lon, lat, HRRR_TIME, v, 0.)
+        np.testing.assert_allclose(out[name][:, hrrr], expected[:, hrrr], atol=atol)
+
+
+@pytest.mark.parametrize('time_block, tile_rows', [(2, 1), (3, 10), (7, 20)])
+def test_blend_blocks(forcing, tmp_path, monkeypatch, time_block, tile_rows):
+    # Blocks of every shape, including tiles without any HRRR point, give
+    # the output of a single block
+    outputs = {}
+    for plan in [(7, 57), (time_block, tile_rows)]:
+        monkeypatch.setattr(blend, 'plan_blend', lambda *args, **kwargs: {
+            'nprocs': 2, 'time_block': plan[0], 'tile_rows': plan[1],
+            'estimate': 0.})
+        blend.blend(*forcing, tmp_path / 'blend.nc', 'SECOFS', resolution=0.25,
+                    nprocs=2, hrrr_remap='bilinear', chunks=(1, 1, 37))
+        outputs[plan] = read_output(tmp_path / 'blend.nc')
+    single, blocks = outputs.values()
+    assert not single['data_source'][-1].any()
+    for name in single:
+        np.testing.assert_array_equal(blocks[name], single[name])
+
+
+@pytest.mark.parametrize('domain', list(blend.DOMAINS))
+def test_output_chunks_default(domain):
+    lon, lat = blend.target_grid(blend.DOMAINS[domain], 0.025)
+    ny, nx = len(lat), len(lon)
+    t, rows, x = blend.output_chunks(ny, nx, 24)
+    assert (t, x) == (1, nx)
+    assert rows * nx * 4 <= blend.CHUNK_MB * blend.MB
+    assert -(-ny // rows) >= blend.CHUNK_BANDS
+
+
+def test_output_chunks_clipped():
+    assert blend.output_chunks(10, 20, 5, (8, 0, 50)) == (5, 1, 20)
+    assert blend.output_chunks(3, 20, 5) == (1, 1, 20)
+
+
+@pytest.mark.parametrize('compression', ['none', 'zlib'])
+def test_blend_output_encoding(forcing, tmp_path, compression):
+    output = tmp_path / 'blend.nc'
+    blend.blend(*forcing, output, 'SECOFS', resolution=0.25, nprocs=1,
+                compression=compression, complevel=4, chunks=(2, 10, 37))
+    with netCDF4.Dataset(output) as nc:
+        var = nc.variables['TMP_2maboveground']
+        assert var.chunking() == [2, 10, 37]
+        assert var.filters()['zlib'] == (compression == 'zlib')
+        if compression == 'zlib':
+            assert var.filters()['complevel'] == 4
+            assert var.filters()['shuffle']
+        assert nc.dimensions['time'].isunlimited()
+        assert var.units == 'unit'
+
+
+def test_blend_significant_digits(forcing, tmp_path):
+    blend.blend(*forcing, tmp_path / 'exact.nc', 'SECOFS', resolution=0.25, nprocs=1)
+    blend.blend(*forcing, tmp_path / 'quantized.nc', 'SECOFS', resolution=0.25,
+                nprocs=1, significant_digits=3)
+    exact = read_output(tmp_path / 'exact.nc')['TMP_2maboveground']
+    quantized = read_output(tmp_path / 'quantized.nc')['TMP_2maboveground']
+    assert not np.array_equal(exact, quantized)
+    np.testing.assert_allclose(quantized, exact, rtol=1e-3)
+
+
+def domain_plan(domain, nprocs, max_memory, n_vars=8, n_times=24):
+    lon, lat = blend.target_grid(blend.DOMAINS[domain], 0.025)
+    ny, nx = len(lat), len(lon)
+    chunks = blend.output_chunks(ny, nx, n_times)
+    # remap weights, mask and transition weights of the nearest remap
+    static_bytes = ny * nx * (4 + 4 + 8 + 1 + 16 + 16 + 4)
+    plan = blend.plan_blend(ny, nx, n_times, n_vars, nprocs, max_memory, chunks,
+                            static_bytes)
+    return plan, (ny, nx, n_times, chunks)
+
+
+@pytest.mark.parametrize('domain, nprocs, max_memory', [
+    ('ATLANTIC', 64, 4000), ('ATLANTIC', 128, 8000), ('STOFS3D_ATL', 64, 4000),
+    ('SECOFS', 8, 2000), ('SECOFS', 64, 500), ('SECOFS', 1, 100)])
+def test_plan_blend_within_budget(domain, nprocs, max_memory):
+    plan, (ny, nx, n_times, chunks) = domain_plan(domain, nprocs, max_memory)
+    assert plan['estimate'] <= max_memory
+    assert 1 <= plan['nprocs'] <= nprocs
+    assert plan['time_block'] % chunks[0] == 0
+    assert plan['tile_rows'] % chunks[1] == 0
+    tasks = -(-n_times // plan['time_block']) * -(-ny // plan['tile_rows'])
+    assert tasks >= plan['nprocs']
+
+
+def test_plan_blend_parallelism():
+    # a budget fitting everything still splits the work between the workers
+    plan = blend.plan_blend(561, 361, 24, 8, 8, 100000, (1, 71, 361))
+    assert plan['nprocs'] == 8
+    assert -(-24 // plan['time_block']) * -(-561 // plan['tile_rows']) >= 16
+    assert plan['estimate'] <= 100000
+
+
+def test_plan_blend_chunk_does_not_fit():
+    with pytest.raises(ValueError, match='does not fit'):
+        domain_plan('ATLANTIC', 8, 100)
+    # one worker fits where two would not
+    points = 71 * 361
+    max_memory = (points * 8 * (blend.BYTES_PER_POINT + 2 * blend.BLOCK_BYTES)
+                  / blend.MB) + 1
+    plan = blend.plan_blend(561, 361, 24, 8, 2, max_memory, (1, 71, 361))
+    assert (plan['nprocs'], plan['time_block'], plan['tile_rows']) == (1, 1, 71)
+    assert plan['estimate'] <= max_memory
+
+
+def test_plan_blend_no_variables():
+    plan = blend.plan_blend(561, 361, 24, 0, 4, 100, (1, 71, 361), static_bytes=blend.MB)
+    assert plan['nprocs'] == 4
+    assert plan['estimate'] <= 100
+
+
+def test_stage_report(capsys):
+    report = {}
+    with blend.stage('alloc', report, estimate=64):
+        data = np.ones(64 * blend.MB // 8)
+    del data
+    record = report['alloc']
+    assert set(record) == {'seconds', 'peak_rss', 'peak_rss_cumulative', 'rss_start',
+                           'rss_end', 'workers_peak_rss', 'estimate'}
+    assert record['estimate'] == 64
+    if not record['peak_rss_cumulative']:
+        assert record['peak_rss'] >= record['rss_start'] + 60
+    assert '[alloc]' in capsys.readouterr().out
+
+
+def test_transition_weights_hard_switch():
+    mask = np.zeros((4, 6), dtype=bool)
+    mask[:, :3] = True
+    np.testing.assert_array_equal(blend.transition_weights(mask, 0.1, 0.), mask)
+
+
+def test_transition_weights_ramp():
+    mask = np.zeros((3, 8), dtype=bool)
+    mask[:, 1:] = True
+    weights = blend.transition_weights(mask, 0.1, 0.3)
+    assert weights.dtype == np.float32
+    expected = np.array([0., 1 / 3, 2 / 3, 1., 1., 1., 1., 1.], dtype=np.float32)
+    np.testing.assert_allclose(weights, np.tile(expected, (3, 1)), rtol=1e-6)
+
+
+def test_transition_weights_all_hrrr():
+    mask = np.ones((3, 4), dtype=bool)
+    np.testing.assert_array_equal(blend.transition_weights(mask, 0.1), 1.)
+
+
+def test_blend_transition(forcing, tmp_path):
+    blend.blend(*forcing, tmp_path / 'blend.nc', 'SECOFS', resolution=0.25,
+                nprocs=1, hrrr_remap='bilinear', transition_width=0.75)
+    out = read_output(tmp_path / 'blend.nc')
+    weight = out['hrrr_weight']
+    ramp = (weight > 0) & (weight < 1)
+    assert ramp.any()
+    np.testing.assert_array_equal(weight == 0, out['data_source'] == 0)
+    lon = out['longitude'].astype(np.float64)
+    lat = out['latitude'].astype(np.float64)
+    hrrr = field(lon, lat, HRRR_TIME, 0, 0.)
+    gfs = field(lon, lat, HRRR_TIME, 0, 100.)
+    expected = gfs + weight * (hrrr - gfs)
+    np.testing.assert_allclose(out['UGRD_10maboveground'][:, ramp], expected[:, ramp],
+                               atol=1e-3)
@@ -0,0 +1,67 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('geopandas')
+shapely = pytest.importorskip('shapely')
+
+from hgrid import Hgrid
+from mesh_base import sizeof
+
+
+def hgrid(mesh_dict, boundaries=None):
+    return Hgrid(mesh_dict['nodes'], mesh_dict['elements'],
+                 crs=mesh_dict['crs'], boundaries=boundaries)
+
+
+def test_boundary_tables(mesh_dict):
+    boundaries = {None: {0: {'indexes': ['1', '2', '3']}},
+                  0: {0: {'indexes': ['3', '6', '9']}, 1: {'indexes': ['9', '8']}},
+                  1: {0: {'indexes': ['7', '4', '1']}}}
+    mesh = hgrid(mesh_dict, boundaries)
+    table = mesh.boundaries.land_table
+    assert len(table) == 2
+    np.testing.assert_array_equal(table.get_indexes(0), [2, 5, 8])
+    np.testing.assert_array_equal(list(table)[1], [8, 7])
+
+    open = mesh.boundaries.open
+    assert list(open.columns) == ['id', 'index_id', 'indexes', 'geometry']
+    assert list(open['id']) == ['1'] and open.crs == mesh.crs
+    assert open.iloc[0]['indexes'] == [0, 1, 2]
+    assert open.geometry.iloc[0].equals(shapely.LineString(mesh.coords[[0, 1, 2]]))
+    land = mesh.land_boundaries
+    assert list(land['id']) == ['1', '2'] and list(land['ibtype']) == [0, 0]
+    assert land.geometry.iloc[1].equals(shapely.LineString(mesh.coords[[8, 7]]))
+    interior = mesh.interior_boundaries
+    assert interior.iloc[0]['index_id'] == ['7', '4', '1']
+    assert mesh.boundaries.ocean is open
+
+
+def test_boundary_pairs_are_joined(mesh_dict):
+    # Weir-type boundaries list node pairs; the second side is reversed
+    mesh = hgrid(mesh_dict, {4: {0: {'indexes': [['1', '4'], ['2', '5'], ['3', '6']]}}})
+    assert mesh.land_boundaries.iloc[0]['indexes'] == [0, 1, 2, 5, 4, 3]
+
+
+def test_unknown_boundary_node(mesh_dict):
+    with pytest.raises(KeyError):
+        hgrid(mesh_dict, {None: {0: {'indexes': ['1', '10']}}})
+
+
+@pytest.mark.parametrize('boundaries', [None, {None: {}}])
+def test_mesh_without_boundaries_or_islands(mesh_dict, boundaries):
+    mesh = hgrid(mesh_dict, boundaries)
+    for gdf, columns in [
+            (mesh.boundaries.open, ['id', 'index_id', 'indexes', 'geometry']),
+            (mesh.boundaries.land, ['id', 'ibtype', 'index_id', 'indexes', 'geometry']),
+            (mesh.boundaries.interior, ['id', 'ibtype', 'index_id', 'indexes', 'geometry'])]:
+        assert len(gdf) == 0
+        assert list(gdf.columns) == columns
+        assert gdf.crs == mesh.crs
+    assert len(mesh.hull.interior()) == 0
+    assert len(mesh.hull.exterior()) == 1
+    assert mesh.cache.nbytes > 0
+
+
+def test_sizeof_frame_without_geometry():
+    import geopandas as gpd
+    assert sizeof(gpd.GeoDataFrame({'id': ['1', '2']})) > 0
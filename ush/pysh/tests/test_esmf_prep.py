@@ -0,0 +1,204 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+netCDF4 = pytest.importorskip('netCDF4')
+
+import esmf_prep
+
+
+def test_copy_hyperslabs(tmp_path):
+    data = np.random.default_rng(0).random((7, 5, 4)).astype(np.float32)
+    data[2, 1, 1] = -999.
+    with netCDF4.Dataset(tmp_path / 'in.nc', 'w') as nc:
+        for name, size in zip(('time', 'lat', 'lon'), data.shape):
+            nc.createDimension(name, size)
+        var = nc.createVariable('field', 'f4', ('time', 'lat', 'lon'),
+                                fill_value=-999.)
+        var.scale_factor = 2.
+        var.set_auto_maskandscale(False)
+        var[:] = data
+        nc.createVariable('scalar', 'i4')
+        nc.variables['scalar'].assignValue(3)
+    with netCDF4.Dataset(tmp_path / 'in.nc') as nc_in, \
+            netCDF4.Dataset(tmp_path / 'out.nc', 'w') as nc_out:
+        for name, dim in nc_in.dimensions.items():
+            nc_out.createDimension(name, len(dim))
+        for flip_axis in (None, 1):
+            out = nc_out.createVariable(f'field_{flip_axis}', 'f4', ('time', 'lat', 'lon'))
+            # 3 time steps per block
+            esmf_prep.copy_hyperslabs(nc_in.variables['field'], out, time_axis=0,
+                                      flip_axis=flip_axis, max_bytes=3 * 5 * 4 * 4)
+        out = nc_out.createVariable('no_time', 'f4', ('time', 'lat', 'lon'))
+        esmf_prep.copy_hyperslabs(nc_in.variables['field'], out)
+        out = nc_out.createVariable('scalar', 'i4')
+        esmf_prep.copy_hyperslabs(nc_in.variables['scalar'], out)
+    with netCDF4.Dataset(tmp_path / 'out.nc') as nc:
+        nc.set_auto_mask(False)
+        np.testing.assert_array_equal(nc.variables['field_None'][:], data)
+        np.testing.assert_array_equal(nc.variables['field_1'][:], data[:, ::-1])
+        np.testing.assert_array_equal(nc.variables['no_time'][:], data)
+        assert nc.variables['scalar'].getValue() == 3
+
+
+def test_copy_hyperslabs_block_size():
+    class Variable:
+        def __init__(self, shape):
+            self.shape = shape
+            self.ndim = len(shape)
+            self.dtype = np.dtype('f8')
+            self.writes = []
+
+        def set_auto_maskandscale(self, value):
+            pass
+
+        def __getitem__(self, index):
+            return index
+
+        def __setitem__(self, index, value):
+            self.writes.append(index[0])
+
+    var_in, var_out = Variable((10, 3, 4)), Variable((10, 3, 4))
+    esmf_prep.copy_hyperslabs(var_in, var_out, time_axis=0, max_bytes=4 * 3 * 4 * 8)
+    assert var_out.writes == [slice(0, 4), slice(4, 8), slice(8, 10)]
+    var_out.writes = []
+    esmf_prep.copy_hyperslabs(var_in, var_out, time_axis=0, max_bytes=1)
+    assert var_out.writes == [slice(t, t + 1) for t in range(10)]
+
+
+def write_gfs(path, offset=0.):
+    lon = np.arange(270., 280.1, 0.5)
+    lat = np.arange(40., 29.9, -0.5)
+    time = np.arange(3.)
+    data = (offset + lon[None, None] + 10. * lat[None, :, None]
+            + 100. * time[:, None, None]).astype(np.float32)
+    with netCDF4.Dataset(path, 'w') as nc:
+        for name, values in zip(('time', 'latitude', 'longitude'), (time, lat, lon)):
+            nc.createDimension(name, len(values))
+            nc.createVariable(name, 'f8', (name,))[:] = values
+        nc.variables['time'].units = 'seconds since 1970-01-01 00:00:00'
+        var = nc.createVariable('TMP_2maboveground', 'f4',
+                                ('time', 'latitude', 'longitude'), fill_value=9.999e20)
+        var.short_name = 'TMP_2maboveground'
+        var[:] = data
+    return lon, lat, data
+
+
+def write_hrrr(path):
+    i, j = np.meshgrid(np.arange(6.), np.arange(4.))
+    lon = -90. + 0.5 * i + 0.1 * j
+    lat = 30. + 0.5 * j - 0.05 * i
+    data = (lon + lat)[None] + np.arange(2.)[:, None, None]
+    with netCDF4.Dataset(path, 'w') as nc:
+        nc.createDimension('time', 2)
+        nc.createDimension('y', 4)
+        nc.createDimension('x', 6)
+        nc.createVariable('time', 'f8', ('time',))[:] = [0., 3600.]
+        nc.createVariable('latitude', 'f8', ('y', 'x'))[:] = lat
+        nc.createVariable('longitude', 'f8', ('y', 'x'))[:] = lon
+        nc.createVariable('UGRD_10maboveground', 'f4', ('time', 'y', 'x'))[:] = data
+    return lon, lat, data
+
+
+def test_prepare_gfs(tmp_path):
+    pytest.importorskip('xarray')
+    lon, lat, data = write_gfs(tmp_path / 'gfs_raw.nc')
+    esmf_file, scrip_file = esmf_prep.prepare(
+        'gfs', tmp_path / 'gfs_raw.nc', tmp_path / 'gfs_for_esmf.nc',
+        str(tmp_path / 'gfs_scrip.nc'), verbose=False)
+    with netCDF4.Dataset(esmf_file) as nc:
+        np.testing.assert_array_equal(nc.variables['lat'][:], lat[::-1])
+        np.testing.assert_array_equal(nc.variables['lon'][:], lon)
+        np.testing.assert_array_equal(nc.variables['time'][:], np.arange(3.))
+        var = nc.variables['TMP_2maboveground']
+        assert var.dimensions == ('time', 'lat', 'lon')
+        np.testing.assert_array_equal(var[:], data[:, ::-1])
+        assert (var.units, var.long_name) == ('K', '2m temperature')
+        assert var.coordinates == 'lon lat'
+        assert var._FillValue == np.float32(9.999e20)
+        assert nc.variables['lat'].units == 'degrees_north'
+    with netCDF4.Dataset(scrip_file) as nc:
+        np.testing.assert_array_equal(nc.variables['grid_dims'][:], [len(lon), len(lat)])
+        lon2d, lat2d = np.meshgrid(lon, lat[::-1])
+        np.testing.assert_array_equal(nc.variables['grid_center_lon'][:], lon2d.ravel())
+        np.testing.assert_array_equal(nc.variables['grid_center_lat'][:], lat2d.ravel())
+
+
+def test_prepare_hrrr(tmp_path):
+    pytest.importorskip('xarray')
+    lon, lat, data = write_hrrr(tmp_path / 'hrrr_raw.nc')
+    esmf_file, scrip_file = esmf_prep.prepare(
+        'hrrr', tmp_path / 'hrrr_raw.nc', tmp_path / 'hrrr_for_esmf.nc',
+        str(tmp_path / 'hrrr_scrip.nc'), verbose=False)
+    with netCDF4.Dataset(esmf_file) as nc:
+        np.testing.assert_array_equal(nc.variables['lat'][:], lat)
+        np.testing.assert_array_equal(nc.variables['lon'][:], lon)
+        np.testing.assert_array_equal(nc.variables['x'][:], np.arange(6))
+        np.testing.assert_array_equal(nc.variables['y'][:], np.arange(4))
+        var = nc.variables['UGRD_10maboveground']
+        assert var.dimensions == ('time', 'y', 'x')
+        np.testing.assert_array_equal(var[:], data.astype(np.float32))
+        assert var.units == 'm/s'
+    with netCDF4.Dataset(scrip_file) as nc:
+        np.testing.assert_array_equal(nc.variables['grid_dims'][:], [6, 4])
+        np.testing.assert_array_equal(nc.variables['grid_center_lon'][:], lon.ravel())
+
+
+def test_prepare_without_scrip(tmp_path):
+    write_hrrr(tmp_path / 'hrrr_raw.nc')
+    assert esmf_prep.prepare('HRRR', tmp_path / 'hrrr_raw.nc', tmp_path / 'out.nc',
+                             verbose=False) == (tmp_path / 'out.nc', None)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['hrrr_raw.nc', 'out.nc']
+
+
+@pytest.mark.parametrize('nprocs', [1, 2])
+def test_prepare_batch(tmp_path, nprocs):
+    jobs = []
+    for k in range(3):
+        write_gfs(tmp_path / f'raw_{k}.nc', offset=k)
+        jobs.append(('gfs25', tmp_path / f'raw_{k}.nc', tmp_path / f'esmf_{k}.nc',
+                     None, False, None))
+    results = esmf_prep.prepare_batch(jobs, nprocs)
+    assert results == [(tmp_path / f'esmf_{k}.nc', None) for k in range(3)]
+    for k in range(3):
+        expected = esmf_prep.modify_gfs_for_esmf(
+            tmp_path / f'raw_{k}.nc', tmp_path / 'single.nc', verbose=False)
+        with netCDF4.Dataset(tmp_path / f'esmf_{k}.nc') as nc, \
+                netCDF4.Dataset(tmp_path / 'single.nc') as single:
+            np.testing.assert_array_equal(nc.variables['lat'][:], expected[1])
+            np.testing.assert_array_equal(nc.variables['TMP_2maboveground'][:],
+                                          single.variables['TMP_2maboveground'][:])
+
+
+def test_cli_pairs(tmp_path):
+    import pathlib
+    import subprocess
+    import sys
+    pytest.importorskip('xarray')
+    script = pathlib.Path(esmf_prep.__file__).with_name('modify_gfs_4_esmfmesh.py')
+    write_gfs(tmp_path / 'raw_0.nc')
+    write_gfs(tmp_path / 'raw_1.nc', offset=1.)
+    subprocess.run([sys.executable, str(script), 'raw_0.nc', 'esmf_0.nc',
+                    'raw_1.nc', 'esmf_1.nc', '--scrip', 'scrip_0.nc',
+                    '--scrip', 'scrip_1.nc', '--nprocs', '2', '-q'],
+                   cwd=tmp_path, check=True)
+    for k in range(2):
+        assert (tmp_path / f'esmf_{k}.nc').is_file()
+        assert (tmp_path / f'scrip_{k}.nc').is_file()
+    result = subprocess.run([sys.executable, str(script), 'raw_0.nc'],
+                            cwd=tmp_path, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert 'pairs' in result.stderr
+
+
+def test_prepare_scrip_cache(tmp_path):
+    pytest.importorskip('xarray')
+    lon, lat, _ = write_gfs(tmp_path / 'gfs_raw.nc')
+    cache_dir = tmp_path / 'cache'
+    for k in range(2):
+        esmf_prep.prepare('gfs', tmp_path / 'gfs_raw.nc', tmp_path / f'esmf_{k}.nc',
+                          str(tmp_path / f'scrip_{k}.nc'), verbose=False,
+                          cache_dir=str(cache_dir))
+    import proc_scrip
+    cached, = cache_dir.iterdir()
+    assert cached.name == f'scrip_{proc_scrip.grid_digest(lon, lat)}.nc'
+    assert (tmp_path / 'scrip_1.nc').samefile(cached)
@@ -0,0 +1,146 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+gpd = pytest.importorskip('geopandas')
+shapely = pytest.importorskip('shapely')
+
+from mesh_base import Gr3, MeshCache
+
+
+def test_elements_gdf_polygons(mesh_dict):
+    mesh = Gr3(**mesh_dict)
+    gdf = mesh.elements.gdf
+    assert list(gdf['id']) == list(mesh_dict['elements'])
+    assert gdf.crs == mesh.crs
+    for id, geometry in zip(gdf['id'], gdf.geometry):
+        coords = [mesh_dict['nodes'][node][0] for node in mesh_dict['elements'][id]]
+        assert geometry.equals_exact(shapely.Polygon(coords), 0.)
+    np.testing.assert_allclose(shapely.area(gdf.geometry.values).sum(), 0.04)
+
+
+def test_nodes_gdf_points(mesh_dict):
+    mesh = Gr3(**mesh_dict)
+    gdf = mesh.nodes.gdf
+    assert list(gdf['id']) == list(mesh_dict['nodes'])
+    np.testing.assert_array_equal(gdf['values'], mesh.values)
+    np.testing.assert_array_equal(shapely.get_coordinates(gdf.geometry.values),
+                                  mesh.coords)
+
+
+def test_transform_to_cpp(mesh_dict):
+    mesh = Gr3(**mesh_dict)
+    lon, lat = mesh.coords.copy().T
+    gdf = mesh.nodes.gdf
+    x, y = mesh.nodes.transform_to_cpp(-74.9, 35.1)
+    radius = 6378206.4
+    np.testing.assert_allclose(
+        x, radius * np.radians(lon + 74.9) * np.cos(np.radians(35.1)), atol=1e-6)
+    np.testing.assert_allclose(y, radius * np.radians(lat), atol=1e-6)
+    np.testing.assert_array_equal(mesh.coords, np.column_stack([x, y]))
+    assert mesh.crs is None
+    # The node GeoDataFrame of the lon/lat coordinates is rebuilt
+    assert mesh.nodes.gdf is not gdf
+
+
+def test_transform_to_cpp_dtype(mesh_dict):
+    mesh = Gr3(**mesh_dict)
+    expected = Gr3(**mesh_dict).nodes.transform_to_cpp(-75., 35.)
+    x, y = mesh.nodes.transform_to_cpp(-75., 35., dtype=np.float32)
+    assert x.dtype == np.float32 and mesh.coords.dtype == np.float32
+    # float32 resolves about 0.25 m at 4000 km
+    np.testing.assert_allclose(x, expected[0], rtol=0, atol=1.)
+    np.testing.assert_allclose(y, expected[1], rtol=0, atol=1.)
+
+
+def test_mesh_cache_memoizes():
+    cache = MeshCache()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return np.zeros(10)
+
+    first = cache.get('a', factory)
+    assert cache.get('a', factory) is first
+    assert len(calls) == 1
+    assert cache.nbytes == 80
+
+
+def test_mesh_cache_evicts_least_recently_used():
+    cache = MeshCache(max_bytes=2000)
+    cache.get('a', lambda: np.zeros(100))
+    cache.get('b', lambda: np.zeros(100))
+    cache.get('a', lambda: np.zeros(100))
+    cache.get('c', lambda: np.zeros(100))
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert cache.nbytes <= 2000
+    # A product larger than the budget is still kept until the next one
+    cache.get('d', lambda: np.zeros(1000))
+    assert list(cache.memory_usage()) == ['d']
+
+
+def test_mesh_cache_invalidate_by_dependency():
+    cache = MeshCache()
+    cache.get('static', lambda: np.zeros(1))
+    cache.get('xy', lambda: np.zeros(1), depends=('coords',))
+    cache.get('z', lambda: np.zeros(1), depends=('values',))
+    cache.get('xyz', lambda: np.zeros(1), depends=('coords', 'values'))
+    cache.invalidate('values')
+    assert set(cache.memory_usage()) == {'static', 'xy'}
+    cache.invalidate('coords')
+    assert set(cache.memory_usage()) == {'static'}
+
+
+def test_mesh_cache_arrays(tmp_path):
+    assert MeshCache().load_arrays('triangulation', 'abc') is None
+    cache = MeshCache(directory=tmp_path / 'cache')
+    assert cache.load_arrays('triangulation', 'abc') is None
+    cache.save_arrays('triangulation', 'abc', triangles=np.arange(6).reshape(2, 3))
+    stored = MeshCache(directory=tmp_path / 'cache').load_arrays('triangulation', 'abc')
+    np.testing.assert_array_equal(stored['triangles'], np.arange(6).reshape(2, 3))
+    assert [p.suffix for p in (tmp_path / 'cache').iterdir()] == ['.npz']
+
+
+def test_mesh_products_invalidated_by_transformations(mesh_dict):
+    mesh = Gr3(**mesh_dict)
+    elements_gdf = mesh.elements.gdf
+    centroids = mesh.elements.compute_centroid()
+    sorted_id = mesh.nodes.sorted_id
+    mesh.invert_sign()
+    assert mesh.elements.gdf is elements_gdf
+    assert mesh.elements.compute_centroid() is not centroids
+    np.testing.assert_allclose(mesh.elements.compute_centroid()[2], -centroids[2])
+    mesh.transform_to('epsg:3857')
+    assert mesh.elements.gdf is not elements_gdf
+    assert mesh.elements.gdf.crs == 'epsg:3857'
+    assert mesh.nodes.sorted_id is sorted_id
+
+
+def test_triangulation_splits_quads(mesh_dict):
+    mesh = Gr3(**mesh_dict)
+    tri = mesh.triangulation
+    # triangles first, then each quad as (0, 1, 3) and (1, 2, 3)
+    np.testing.assert_array_equal(tri.triangles, [
+        [3, 4, 7], [3, 7, 6], [4, 5, 8], [4, 8, 7],
+        [0, 1, 3], [1, 4, 3], [1, 2, 4], [2, 5, 4]])
+    np.testing.assert_array_equal(tri.x, mesh.coords[:, 0])
+    mask = mesh.elements.get_triangulation_mask([True, False, False, False, False, True])
+    np.testing.assert_array_equal(mask, [False, False, False, True,
+                                         True, True, False, False])
+
+
+def test_triangulation_stored_neighbors(mesh_dict, tmp_path, monkeypatch):
+    monkeypatch.setenv('MESH_CACHE_DIR', str(tmp_path))
+    tri = Gr3(**mesh_dict).triangulation
+    assert len(list(tmp_path.glob('triangulation-*.npz'))) == 1
+    restored = Gr3(**mesh_dict).triangulation
+    assert restored._neighbors is not None
+    np.testing.assert_array_equal(restored.triangles, tri.triangles)
+    np.testing.assert_array_equal(restored.neighbors, tri.neighbors)
+    np.testing.assert_array_equal(restored.edges, tri.edges)
+    # the stored arrays depend on topology only
+    mesh = Gr3(**mesh_dict)
+    mesh.transform_to('epsg:3857')
+    np.testing.assert_array_equal(mesh.triangulation.neighbors, tri.neighbors)
+    np.testing.assert_array_equal(mesh.triangulation.x, mesh.coords[:, 0])
@@ -0,0 +1,153 @@
+import io
+import pathlib
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pyproj')
+
+import grd
+import sms2dm
+
+DATA = pathlib.Path(__file__).parent / 'data'
+
+# Boundaries of tests/data/hgrid.gr3
+BOUNDARIES = {None: {0: {'indexes': ['1', '2', '3']}},
+              0: {0: {'indexes': ['3', '6', '9', '8', '7']}},
+              1: {0: {'indexes': ['7', '4', '1']}}}
+
+
+@pytest.fixture
+def gr3_text():
+    return (DATA / 'hgrid.gr3').read_text()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 4, 100])
+def test_grd_write_buffer_matches_reference(mesh_dict, gr3_text, chunk_size):
+    buf = io.StringIO()
+    grd.write_buffer(buf, mesh_dict['description'], mesh_dict['nodes'],
+                     mesh_dict['elements'], BOUNDARIES, chunk_size=chunk_size)
+    assert buf.getvalue() == gr3_text
+
+
+def test_grd_write_buffer_without_boundaries(mesh_dict, gr3_text):
+    buf = io.StringIO()
+    grd.write_buffer(buf, mesh_dict['description'], mesh_dict['nodes'],
+                     mesh_dict['elements'], chunk_size=4)
+    # The nodes and elements of the reference, newline terminated
+    assert buf.getvalue() == gr3_text.split('1 ! total number of ocean')[0]
+
+
+def test_grd_round_trip(gr3_text, tmp_path):
+    mesh = grd.read(DATA / 'hgrid.gr3', crs=False)
+    assert mesh['boundaries'][None][0]['indexes'] == ['1', '2', '3']
+    grd.write(mesh, tmp_path / 'hgrid.gr3')
+    assert (tmp_path / 'hgrid.gr3').read_text() == gr3_text
+
+
+def mesh_2dm(mesh_dict):
+    """The dict form of tests/data/mesh.2dm: node values negated, triangles
+    then quads numbered from 1."""
+    index = {id: i + 1 for i, id in enumerate(mesh_dict['nodes'])}
+    elements = list(mesh_dict['elements'].values())
+    return {
+        'ND': {i + 1: (coords, -value)
+               for i, (coords, value) in enumerate(mesh_dict['nodes'].values())},
+        'E3T': {i + 1: [index[n] for n in element] for i, element in
+                enumerate(e for e in elements if len(e) == 3)},
+        'E4Q': {i + 1: [index[n] for n in element] for i, element in
+                enumerate(e for e in elements if len(e) == 4)},
+    }
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 100])
+def test_sms2dm_write_buffer_matches_reference(mesh_dict, chunk_size):
+    buf = io.StringIO()
+    sms2dm.write_buffer(buf, mesh_2dm(mesh_dict), chunk_size=chunk_size)
+    assert buf.getvalue() == (DATA / 'mesh.2dm').read_text()
+
+
+def test_sms2dm_string_with_nodestrings(mesh_dict):
+    mesh = mesh_2dm(mesh_dict)
+    mesh['boundaries'] = {None: {0: {'indexes': [1, 2, 3]}}}
+    assert sms2dm.string(mesh) == (DATA / 'mesh.2dm').read_text() + "NS 1 2 -3\n"
+
+
+def test_gr3_write_2dm_matches_reference(mesh_dict, tmp_path):
+    from mesh_base import Gr3
+    Gr3(**mesh_dict).write(tmp_path / 'mesh.2dm', format='2dm')
+    assert (tmp_path / 'mesh.2dm').read_text() == (DATA / 'mesh.2dm').read_text()
+
+
+def test_sms2dm_read_reference(mesh_dict):
+    mesh = sms2dm.read_arrays(DATA / 'mesh.2dm', chunk_size=4)
+    np.testing.assert_array_equal(mesh['ND']['id'], np.arange(1, 10))
+    np.testing.assert_array_equal(
+        mesh['ND']['coords'], [coords for coords, _ in mesh_dict['nodes'].values()])
+    np.testing.assert_array_equal(mesh['ND']['values'], -np.arange(1., 10.))
+    np.testing.assert_array_equal(mesh['E4Q']['nodes'], [[1, 2, 5, 4], [2, 3, 6, 5]])
+    assert 'materials' not in mesh['E3T']
+    read = sms2dm.read(DATA / 'mesh.2dm')
+    assert read['E3T']['1'] == ['4', '5', '8']
+    assert read['ND']['9'] == ([-74.8, 35.2], -9.)
+
+
+def test_sms2dm_read_arrays_cards_and_materials(tmp_path):
+    path = tmp_path / 'mesh.2dm'
+    path.write_text(
+        "MESH2D\n"
+        "E3T 1 1 2 3 1\n"
+        "  E3T 2 2 4 3\n"
+        "E4Q\t3 3 4 6 5 2\n"
+        "ND 1 0.0 0.0 -1.5\n"
+        " ND 2 1.0 0.0 -2.5\n"
+        "ND\t3 0.0 1.0 3.5\n"
+        "ND 4 1.0 1.0 4.5\n"
+        "\n"
+        "ND 5 0.0 2.0 5.5\n"
+        "ND 6 1.0 2.0 6.5\n"
+        "NS 1 2 -4\n")
+    mesh = sms2dm.read_arrays(path, chunk_size=4)
+    np.testing.assert_array_equal(mesh['ND']['id'], np.arange(1, 7))
+    np.testing.assert_array_equal(mesh['ND']['values'], [-1.5, -2.5, 3.5, 4.5, 5.5, 6.5])
+    np.testing.assert_array_equal(mesh['E3T']['nodes'], [[1, 2, 3], [2, 4, 3]])
+    np.testing.assert_array_equal(mesh['E3T']['materials'], [[1], [-1]])
+    np.testing.assert_array_equal(mesh['E4Q']['materials'], [[2]])
+    read = sms2dm.read(path)
+    assert read['E3T'] == {'1': ['1', '2', '3', '1'], '2': ['2', '4', '3']}
+    assert read['E4Q'] == {'3': ['3', '4', '6', '5', '2']}
+    assert read['ND']['2'] == ([1.0, 0.0], -2.5)
+
+
+def test_sms2dm_write_arrays_round_trip(tmp_path):
+    mesh = {'ND': {'id': np.arange(1, 5),
+                   'coords': np.array([[0., 0.], [1., 0.], [0., 1.], [1., 1.]]),
+                   'values': np.array([1., 2., 3., 4.])},
+            'E3T': {'id': np.array([1, 2]), 'nodes': np.array([[1, 2, 3], [2, 4, 3]]),
+                    'materials': np.array([[1], [-1]])}}
+    sms2dm.write_arrays(mesh, tmp_path / 'mesh.2dm', chunk_size=1)
+    read = sms2dm.read_arrays(tmp_path / 'mesh.2dm')
+    for card in mesh:
+        for key, value in mesh[card].items():
+            np.testing.assert_array_equal(read[card][key], value)
+
+
+def test_grd_read_several_values_per_node(tmp_path):
+    # Falls back to the line reader when nodes do not hold a single value
+    (tmp_path / 'hgrid.gr3').write_text(
+        "test\n1 3\n1 0.0 0.0 1.0 2.0 3.0\n2 1.0 0.0 1.0 2.0 3.0\n"
+        "3 0.0 1.0 1.0 2.0 3.0\n1 3 1 2 3\n")
+    mesh = grd.read(tmp_path / 'hgrid.gr3', crs=False)
+    assert mesh['nodes']['2'][0] == (1.0, 0.0)
+    assert mesh['elements'] == {'1': ['1', '2', '3']}
+
+
+def test_grd_read_polygon_elements(tmp_path):
+    # Elements other than triangles and quads use the line reader as well
+    (tmp_path / 'hgrid.gr3').write_text(
+        "test\n2 5\n1 0.0 0.0 1.0\n2 1.0 0.0 2.0\n3 1.0 1.0 3.0\n"
+        "4 0.0 1.0 4.0\n5 0.5 2.0 5.0\n1 3 1 2 3\n2 5 1 3 5 4 2\n")
+    mesh = grd.read(tmp_path / 'hgrid.gr3', crs=False)
+    assert mesh['nodes']['5'] == [(0.5, 2.0), 5.0]
+    assert mesh['elements'] == {'1': ['1', '2', '3'],
+                                '2': ['1', '3', '5', '4', '2']}
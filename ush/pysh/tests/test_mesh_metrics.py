@@ -0,0 +1,64 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import mesh_metrics
+from mesh_metrics import element_metrics
+
+# A unit square, a right triangle and a clockwise triangle, planar
+COORDS = np.array([[0., 0.], [1., 0.], [1., 1.], [0., 1.], [2., 0.]])
+ELNODE = np.array([[0, 1, 2, 3], [1, 4, 2, -1], [0, 2, 1, -1]])
+
+
+def test_planar_metrics():
+    m = element_metrics(COORDS, ELNODE, geographic=False, nprocs=1)
+    np.testing.assert_allclose(m['area'], [1., 0.5, -0.5])
+    np.testing.assert_allclose(m['min_edge'], [1., 1., 1.])
+    np.testing.assert_allclose(m['max_edge'], [1., np.sqrt(2), np.sqrt(2)], rtol=1e-6)
+    np.testing.assert_allclose(m['min_angle'], [90., 45., 45.], rtol=1e-5)
+    np.testing.assert_allclose(m['max_angle'], [90., 90., 90.], rtol=1e-5)
+    # Equiangular skewness: 0 for the square, (90 - 60) / 120 for the triangles
+    np.testing.assert_allclose(m['skewness'], [0., 0.25, 0.25], atol=1e-6)
+    assert all(values.dtype == np.float32 for values in m.values())
+
+
+def test_cfl():
+    depth = np.array([10., 10., 10., 10., -1.])
+    m = element_metrics(COORDS, ELNODE, depth=depth, dt=100., geographic=False,
+                        nprocs=1)
+    expected = np.sqrt(9.81 * np.array([10., 19. / 3., 10.])) * 100.
+    np.testing.assert_allclose(m['cfl'], expected, rtol=1e-6)
+    with pytest.raises(ValueError):
+        element_metrics(COORDS, ELNODE, dt=100., geographic=False)
+
+
+def test_geographic_area_in_meters():
+    side = np.radians(0.01) * mesh_metrics.EARTH_RADIUS
+    lonlat = np.array([[179.995, -0.005], [-179.995, -0.005],
+                       [-179.995, 0.005], [179.995, 0.005]])
+    m = element_metrics(lonlat, np.array([[0, 1, 2, 3]]), nprocs=1)
+    # The square across the dateline stays a 0.01 deg square
+    np.testing.assert_allclose(m['area'], side**2, rtol=1e-4)
+    np.testing.assert_allclose(m['aspect_ratio'], 1., rtol=1e-4)
+
+
+def test_chunks_and_workers_agree():
+    rng = np.random.default_rng(0)
+    coords = rng.uniform(0., 1., (50, 2))
+    elnode = np.column_stack([rng.integers(0, 50, (40, 3)), np.full(40, -1)])
+    elnode[::3, 3] = rng.integers(0, 50, len(elnode[::3]))
+    serial = element_metrics(coords, elnode, geographic=False, nprocs=1)
+    parallel = element_metrics(coords, elnode, geographic=False, nprocs=2,
+                               chunk_size=7)
+    for name in serial:
+        np.testing.assert_array_equal(parallel[name], serial[name])
+
+
+def test_hgrid_metrics_use_positive_down_depth(mesh_dict):
+    pytest.importorskip('geopandas')
+    from hgrid import Hgrid
+    nodes = {id: (coords, -depth) for id, (coords, depth) in mesh_dict['nodes'].items()}
+    hgrid = Hgrid(nodes, mesh_dict['elements'], crs=mesh_dict['crs'])
+    m = hgrid.get_quality_metrics(dt=60., nprocs=1)
+    assert len(m['area']) == 6 and np.all(m['area'] > 0)
+    assert np.all(np.isfinite(m['cfl'])) and np.all(m['cfl'] > 0)
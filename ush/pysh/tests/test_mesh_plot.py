@@ -0,0 +1,92 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+matplotlib = pytest.importorskip('matplotlib')
+matplotlib.use('Agg')
+pytest.importorskip('geopandas')
+
+import matplotlib.pyplot as plt
+
+from hgrid import Hgrid
+from mesh_base import Gr3
+
+
+def linear(x, y):
+    # node values of the conftest mesh
+    return 1. + 10. * (x + 75.) + 30. * (y - 35.)
+
+
+@pytest.fixture
+def axes():
+    fig, axes = plt.subplots()
+    yield axes
+    plt.close(fig)
+
+
+def test_clip_to_extent(mesh_dict):
+    mesh = Gr3(**mesh_dict)
+    np.testing.assert_array_equal(
+        mesh.clip_to_extent(mesh.triangles, [-74.99, -74.95, 35.15, 35.19]),
+        mesh.triangles[:2])
+    np.testing.assert_array_equal(
+        mesh.clip_to_extent(mesh.quads, [-74.87, -74.81, 35., 35.05]),
+        mesh.quads[1:])
+    assert len(mesh.clip_to_extent(mesh.quads, [-70., -69., 35., 36.])) == 0
+    assert mesh.clip_to_extent(mesh.quads) is mesh.quads
+
+
+def test_rasterize(mesh_dict):
+    mesh = Gr3(**mesh_dict)
+    np.testing.assert_allclose(mesh.values, linear(*mesh.coords.T))
+    x, y, values = mesh.rasterize([-75.1, -74.7, 34.95, 35.25], shape=(7, 9))
+    np.testing.assert_allclose(x, np.linspace(-75.1, -74.7, 9))
+    np.testing.assert_allclose(y, np.linspace(34.95, 35.25, 7))
+    assert values.shape == (7, 9)
+    xx, yy = np.meshgrid(x, y)
+    inside = ((xx > -75. + 1e-9) & (xx < -74.8 - 1e-9)
+              & (yy > 35. + 1e-9) & (yy < 35.2 - 1e-9))
+    outside = (xx < -75. - 1e-9) | (xx > -74.8 + 1e-9) \
+        | (yy < 35. - 1e-9) | (yy > 35.2 + 1e-9)
+    assert inside.any() and outside.any()
+    assert not np.ma.getmaskarray(values)[inside].any()
+    assert np.ma.getmaskarray(values)[outside].all()
+    np.testing.assert_allclose(values[inside], linear(xx, yy)[inside])
+
+
+def test_rasterize_outside_mesh(mesh_dict):
+    x, y, values = Gr3(**mesh_dict).rasterize([-70., -69., 35., 36.], shape=(2, 3))
+    assert values.shape == (2, 3)
+    assert np.ma.getmaskarray(values).all()
+
+
+def test_rasterplot_axes_pixel_size(mesh_dict, axes):
+    Gr3(**mesh_dict).rasterplot(axes=axes)
+    image, = axes.get_images()
+    bbox = axes.get_window_extent()
+    assert image.get_array().shape == (int(bbox.height), int(bbox.width))
+
+
+def test_plots_clipped_to_extent(mesh_dict, axes, monkeypatch):
+    mesh = Gr3(**mesh_dict)
+    drawn = []
+    monkeypatch.setattr(axes, 'tricontourf',
+                        lambda x, y, triangles, values, **kw: drawn.append(triangles))
+    mesh.tricontourf(axes=axes, extent=[-74.99, -74.95, 35.15, 35.19])
+    np.testing.assert_array_equal(drawn[0], mesh.triangles[:2])
+    mesh.tricontourf(axes=axes, extent=[-70., -69., 35., 36.])
+    assert len(drawn) == 1
+    mesh.tripcolor(axes=axes, extent=[-74.99, -74.95, 35.15, 35.19])
+    mesh.quadface(axes=axes, extent=[-74.87, -74.81, 35., 35.05])
+    tripcolor, quadface = axes.collections
+    assert len(tripcolor.get_array()) == 2
+    np.testing.assert_allclose(quadface.get_array(),
+                               np.mean(mesh.values[mesh.quads[1:]], axis=1))
+
+
+@pytest.mark.parametrize('raster', [False, True])
+def test_hgrid_make_plot(mesh_dict, axes, raster):
+    hgrid = Hgrid(mesh_dict['nodes'], mesh_dict['elements'], crs=mesh_dict['crs'])
+    extent = [-75., -74.9, 35., 35.1]
+    hgrid.make_plot(axes=axes, extent=extent, raster=raster)
+    assert list(axes.axis()) == extent
+    assert len(axes.get_images()) == (1 if raster else 0)
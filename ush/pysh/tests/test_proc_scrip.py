@@ -0,0 +1,144 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('xarray')
+netCDF4 = pytest.importorskip('netCDF4')
+
+import proc_scrip
+
+
+def test_grid_digest():
+    lon = np.arange(270., 280., 0.5)
+    lat = np.arange(40., 30., -0.5)
+    digest = proc_scrip.grid_digest(lon, lat)
+    assert digest == proc_scrip.grid_digest(lon, lat[::-1])
+    assert digest == proc_scrip.grid_digest(lon.astype(np.float32), lat)
+    assert digest != proc_scrip.grid_digest(lon + 0.1, lat)
+    assert digest != proc_scrip.grid_digest(lon[:-1], lat)
+    lon2d, lat2d = np.meshgrid(lon, lat)
+    assert proc_scrip.grid_digest(lon2d, lat2d) != proc_scrip.grid_digest(lon2d, lat2d[::-1])
+
+
+def test_cache_store_restore(tmp_path):
+    (tmp_path / 'scrip.nc').write_bytes(b'grid')
+    cached = proc_scrip.cache_path(tmp_path / 'cache', 'scrip', 'abc')
+    assert cached == str(tmp_path / 'cache' / 'scrip_abc.nc')
+    proc_scrip.cache_store(tmp_path / 'scrip.nc', cached)
+    assert [p.name for p in (tmp_path / 'cache').iterdir()] == ['scrip_abc.nc']
+    (tmp_path / 'out.nc').write_bytes(b'stale')
+    assert proc_scrip.cache_restore(cached, tmp_path / 'out.nc') == tmp_path / 'out.nc'
+    assert (tmp_path / 'out.nc').read_bytes() == b'grid'
+    assert (tmp_path / 'out.nc').samefile(cached)
+
+
+def test_write_scrip_cache(tmp_path, monkeypatch):
+    lon = np.arange(270., 275., 0.5)
+    lat = np.arange(30., 33., 0.5)
+    cache_dir = tmp_path / 'cache'
+    first = proc_scrip.write_scrip(lon, lat, 'first.nc', str(tmp_path),
+                                   verbose=False, cache_dir=str(cache_dir))
+    cached, = cache_dir.iterdir()
+    assert cached.name == f'scrip_{proc_scrip.grid_digest(lon, lat)}.nc'
+
+    def calc_corners(*args, **kwargs):
+        raise AssertionError('SCRIP grid recomputed')
+
+    monkeypatch.setattr(proc_scrip, 'calc_corners', calc_corners)
+    # the N->S raw coordinates hit the entry of the S->N ones
+    second = proc_scrip.write_scrip(lon, lat[::-1], 'second.nc', str(tmp_path),
+                                    verbose=False, cache_dir=str(cache_dir))
+    assert open(first, 'rb').read() == open(second, 'rb').read()
+    with pytest.raises(AssertionError):
+        proc_scrip.write_scrip(lon, lat, 'third.nc', str(tmp_path), verbose=False)
+
+
+def test_digest_cli(tmp_path):
+    import pathlib
+    import subprocess
+    import sys
+    lon = np.arange(270., 275., 0.5)
+    lat = np.arange(33., 30., -0.5)
+    with netCDF4.Dataset(tmp_path / 'raw.nc', 'w') as nc:
+        for name, values in (('latitude', lat), ('longitude', lon)):
+            nc.createDimension(name, len(values))
+            nc.createVariable(name, 'f8', (name,))[:] = values
+    script = pathlib.Path(proc_scrip.__file__)
+    result = subprocess.run([sys.executable, str(script), '--ifile', 'raw.nc', '--digest'],
+                            cwd=tmp_path, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == proc_scrip.grid_digest(lon, lat[::-1])
+
+
+def mirrored_corners(c):
+    """Corners (ny*nx, 4) as the average of the four mirrored-extended
+    centers around each, one cell at a time."""
+    ny, nx = c.shape
+    ext = np.empty((ny + 2, nx + 2))
+    ext[1:-1, 1:-1] = c
+    ext[1:-1, 0] = 2 * c[:, 0] - c[:, 1]
+    ext[1:-1, -1] = 2 * c[:, -1] - c[:, -2]
+    ext[0, 1:-1] = 2 * c[0] - c[1]
+    ext[-1, 1:-1] = 2 * c[-1] - c[-2]
+    ext[0, 0] = 2 * c[0, 0] - c[1, 1]
+    ext[-1, -1] = 2 * c[-1, -1] - c[-2, -2]
+    ext[0, -1] = 2 * c[0, -1] - c[1, -2]
+    ext[-1, 0] = 2 * c[-1, 0] - c[-2, 1]
+    corners = []
+    for j in range(ny):
+        for i in range(nx):
+            cell = []
+            for dj, di in ((0, 0), (0, 1), (1, 1), (1, 0)):
+                cell.append(ext[j + dj:j + dj + 2, i + di:i + di + 2].mean())
+            corners.append(cell)
+    return np.array(corners)
+
+
+def test_calc_corners_mirrored_average():
+    i, j = np.meshgrid(np.arange(7.), np.arange(5.))
+    lon = -90. + 0.5 * i + 0.1 * j + 0.01 * i * j
+    lat = 30. + 0.5 * j - 0.05 * i
+    xc, yc, xo, yo = proc_scrip.calc_corners(lon, lat)
+    np.testing.assert_array_equal(xc, lon.ravel())
+    np.testing.assert_array_equal(yc, lat.ravel())
+    assert xo.shape == yo.shape == (35, 4)
+    assert xo.flags['F_CONTIGUOUS'] and yo.flags['F_CONTIGUOUS']
+    np.testing.assert_allclose(xo, mirrored_corners(lon), rtol=1e-12)
+    np.testing.assert_allclose(yo, mirrored_corners(lat), rtol=1e-12)
+
+
+def test_calc_corners_dateline():
+    lon2d, lat2d = np.meshgrid([178.5, 179.5, -179.5, -178.5], [0., 1., 2.])
+    _, _, xo, yo = proc_scrip.calc_corners(lon2d, lat2d)
+    offsets = np.array([-0.5, 0.5, 0.5, -0.5])
+    np.testing.assert_allclose(xo, lon2d.reshape(-1, 1) + offsets, atol=1e-12)
+    np.testing.assert_allclose(yo, lat2d.reshape(-1, 1) + offsets[[0, 0, 1, 1]],
+                               atol=1e-12)
+    # the same cells as 0-360 longitudes
+    _, _, xo360, _ = proc_scrip.calc_corners(lon2d % 360., lat2d)
+    np.testing.assert_allclose(xo360, (lon2d % 360.).reshape(-1, 1) + offsets,
+                               atol=1e-12)
+
+
+def test_calc_corners_pole_clip():
+    lon2d, lat2d = np.meshgrid(np.arange(0.5, 360., 1.), [88.5, 89.5, 89.9])
+    _, _, _, yo = proc_scrip.calc_corners(lon2d, lat2d)
+    assert yo.max() == 90.
+    np.testing.assert_array_equal(yo[-360:, 2:], 90.)
+
+
+def test_grid_area_band():
+    # cells of 0.1 degree at 45N: a band of longitude width w between
+    # latitudes a and b has area w * (sin(b) - sin(a))
+    lon2d, lat2d = np.meshgrid(np.arange(-80., -79., 0.1), np.arange(45., 45.5, 0.1))
+    _, _, xo, yo = proc_scrip.calc_corners(lon2d, lat2d)
+    area = proc_scrip.grid_area(xo, yo, chunk_size=7)
+    expected = np.radians(xo[:, 1] - xo[:, 0]) * (
+        np.sin(np.radians(yo[:, 2])) - np.sin(np.radians(yo[:, 1])))
+    np.testing.assert_allclose(area, expected, rtol=1e-5)
+
+
+def test_grid_area_global():
+    lon2d, lat2d = np.meshgrid(np.arange(-179.5, 180., 1.), np.arange(-89.5, 90., 1.))
+    _, _, xo, yo = proc_scrip.calc_corners(lon2d, lat2d)
+    area = proc_scrip.grid_area(xo, yo)
+    assert (area > 0).all()
+    np.testing.assert_allclose(area.sum(), 4 * np.pi, rtol=1e-10)
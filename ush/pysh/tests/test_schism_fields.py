@@ -0,0 +1,281 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+netCDF4 = pytest.importorskip('netCDF4')
+
+import schism_fields_station_redo as fields
+
+NNODE, NVER, NSTEP, NSTACK = 10, 3, 2, 2
+
+
+def value(source, step, node, level=0):
+    offset = {'elevation': 0., 'windSpeedX': 1., 'windSpeedY': 2., 'temperature': 10.,
+              'salinity': 30., 'horizontalVelX': 50., 'horizontalVelY': 70.}[source]
+    return offset + 100. * step + node + 0.1 * level
+
+
+@pytest.fixture
+def run_dir(tmp_path, monkeypatch):
+    """A working directory with NSTACK stacks of NSTEP time steps."""
+    monkeypatch.chdir(tmp_path)
+    # worker state left by the previous test
+    monkeypatch.setattr(fields, '_buffer', None)
+    monkeypatch.setattr(fields, '_reader', None)
+    (tmp_path / 'schism_standard_output.ctl').write_text(
+        'secofs\n06\n20260101\nf\n2026010106\n')
+    node = np.arange(NNODE)
+    nv = np.stack([node[:-2], node[1:-1], node[2:]]) + 1
+    with netCDF4.Dataset('secofs.nv.nc', 'w') as nc:
+        nc.createDimension('nface', 3)
+        nc.createDimension('nele', nv.shape[1])
+        nc.createVariable('nv', 'i4', ('nface', 'nele'))[:] = nv
+    sigma = -np.linspace(0., 1., NVER)[:, None] * np.ones(NNODE)
+    np.savetxt('secofs.sigma.dat', sigma)
+    for i in range(1, NSTACK + 1):
+        steps = (i - 1) * NSTEP + np.arange(NSTEP)
+        with netCDF4.Dataset(f'out2d_{i}.nc', 'w') as nc:
+            nc.createDimension('time', NSTEP)
+            nc.createDimension('nSCHISM_hgrid_node', NNODE)
+            dims = ('time', 'nSCHISM_hgrid_node')
+            nc.createVariable('time', 'f8', ('time',))[:] = 3600. * (steps + 1)
+            nc.createVariable('depth', 'f4', dims[1:])[:] = 5. + node
+            nc.createVariable('SCHISM_hgrid_node_x', 'f8', dims[1:])[:] = -80. + 0.1 * node
+            nc.createVariable('SCHISM_hgrid_node_y', 'f8', dims[1:])[:] = 30. + 0.1 * node
+            for source in ('elevation', 'windSpeedX', 'windSpeedY'):
+                nc.createVariable(source, 'f4', dims)[:] = value(
+                    source, steps[:, None], node[None])
+        for source in fields.VARIABLES_3D.values():
+            with netCDF4.Dataset(f'{source}_{i}.nc', 'w') as nc:
+                nc.createDimension('time', NSTEP)
+                nc.createDimension('nSCHISM_hgrid_node', NNODE)
+                nc.createDimension('nSCHISM_vgrid_layers', NVER)
+                nc.createVariable(source, 'f4', ('time', 'nSCHISM_hgrid_node',
+                                                 'nSCHISM_vgrid_layers'))[:] = value(
+                    source, steps[:, None, None], node[None, :, None],
+                    np.arange(NVER)[None, None])
+    return tmp_path
+
+
+def check_fields(path, step):
+    node = np.arange(NNODE)
+    with netCDF4.Dataset(path) as nc:
+        assert nc.data_model == 'NETCDF4'
+        assert nc.variables['time'][:] == 3600. * (step + 1)
+        assert nc.variables['time'].units == 'seconds since 2026-01-01 06:00:00'
+        np.testing.assert_array_equal(nc.variables['h'][:], 5. + node)
+        np.testing.assert_allclose(nc.variables['lon'][:], -80. + 0.1 * node, rtol=1e-6)
+        np.testing.assert_array_equal(nc.variables['ele'][:, 0], [1, 2, 3])
+        assert nc.variables['sigma'].shape == (NNODE, NVER)
+        for name, source in fields.VARIABLES_2D.items():
+            np.testing.assert_allclose(nc.variables[name][0], value(source, step, node),
+                                       rtol=1e-6)
+        for name, source in fields.VARIABLES_3D.items():
+            var = nc.variables[name]
+            assert var.dimensions == ('time', 'nv', 'node')
+            assert var.filters()['zlib'] and var.filters()['complevel'] == fields.COMPLEVEL
+            np.testing.assert_allclose(
+                var[0], value(source, step, node[None], np.arange(NVER)[:, None]),
+                rtol=1e-6)
+
+
+@pytest.mark.parametrize('nprocs', [1, 2])
+def test_write_all_fields(run_dir, monkeypatch, nprocs):
+    # several node chunks per slab
+    monkeypatch.setattr(fields, 'NODE_CHUNK', 4)
+    written = fields.write_all_fields(fields.read_control(), nprocs=nprocs)
+    expected = [f'secofs.t06z.20260101.fields.f{iii:03d}.nc'
+                for iii in range(1, NSTACK * NSTEP + 1)]
+    assert written == expected
+    for step, path in enumerate(expected):
+        check_fields(run_dir / path, step)
+    assert not list(run_dir.glob('*.nc.old'))
+
+
+def test_write_all_fields_without_stacks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert fields.write_all_fields({}) == []
+
+
+def test_fields_tasks(run_dir):
+    tasks = fields.fields_tasks(1)
+    assert tasks == [(1, [(0, 1), (1, 2)]), (2, [(0, 3), (1, 4)])]
+    assert fields.fields_tasks(2) == [(1, [(0, 1)]), (1, [(1, 2)]),
+                                      (2, [(0, 3)]), (2, [(1, 4)])]
+
+
+def test_plan_workers():
+    nnode, nver = 1000000, 63
+    assert fields.plan_workers(nnode, nver, nprocs=64, max_memory=100000) == 64
+    few = fields.plan_workers(nnode, nver, nprocs=64, max_memory=4000)
+    assert 1 < few < 64
+    assert fields.plan_workers(nnode, nver, nprocs=64, max_memory=1) == 1
+
+
+def test_copy_nowcast_stacks(run_dir):
+    (run_dir / 'zCoordinates_1.nc').write_bytes(b'z')
+    for k in range(1, 9):
+        (run_dir / f'staout_{k}').write_text(f'{k}\n')
+    fields.copy_nowcast_stacks({'cyc': '06', 'day': '20260101'})
+    prefix = 'secofs.t06z.20260101'
+    for name in ['out2d', 'zCoordinates'] + list(fields.VARIABLES_3D.values()):
+        assert ((run_dir / f'{prefix}.{name}_1.nowcast.nc').read_bytes()
+                == (run_dir / f'{name}_1.nc').read_bytes())
+    assert (run_dir / f'{prefix}.nowcast.staout_8').read_text() == '8\n'
+
+
+@pytest.mark.parametrize('nprocs', [1, 2])
+def test_write_all_fields_prefetch(run_dir, monkeypatch, nprocs):
+    monkeypatch.setattr(fields, 'NODE_CHUNK', 4)
+    monkeypatch.setattr(fields, 'PREFETCH', True)
+    written = fields.write_all_fields(fields.read_control(), nprocs=nprocs)
+    assert len(written) == NSTACK * NSTEP
+    for step, path in enumerate(written):
+        check_fields(run_dir / path, step)
+
+
+def test_fill_values(run_dir):
+    # missing values flagged by _FillValue in the 2-D stack and by
+    # missing_value in a 3-D one keep being flagged in the fields files
+    with netCDF4.Dataset('out2d_1.nc', 'a') as nc:
+        nc.renameVariable('elevation', 'elevation_old')
+        var = nc.createVariable('elevation', 'f4', ('time', 'nSCHISM_hgrid_node'),
+                                fill_value=-99999.)
+        var[:] = nc.variables['elevation_old'][:]
+        var[0, 3] = np.ma.masked
+    with netCDF4.Dataset('salinity_1.nc', 'a') as nc:
+        var = nc.variables['salinity']
+        var.missing_value = np.float32(-9.)
+        var[1, 2, :] = -9.
+    written = fields.write_all_fields(fields.read_control(), nprocs=1)
+    with netCDF4.Dataset(written[0]) as nc:
+        zeta = nc.variables['zeta']
+        assert zeta._FillValue == np.float32(-99999.)
+        assert np.ma.getmaskarray(zeta[0]).tolist() == [i == 3 for i in range(NNODE)]
+        assert not np.ma.is_masked(nc.variables['temp'][:])
+    with netCDF4.Dataset(written[1]) as nc:
+        salinity = nc.variables['salinity']
+        assert salinity._FillValue == np.float32(-9.)
+        mask = np.ma.getmaskarray(salinity[0])
+        assert mask[:, 2].all() and mask.sum() == NVER
+        assert not np.ma.is_masked(nc.variables['zeta'][:])
+    with netCDF4.Dataset(written[2]) as nc:
+        assert '_FillValue' not in nc.variables['temp'].ncattrs()
+
+
+def test_plan_workers_prefetch():
+    nnode, nver = 1000000, 63
+    inline = fields.plan_workers(nnode, nver, nprocs=64, max_memory=8000, prefetch=False)
+    prefetch = fields.plan_workers(nnode, nver, nprocs=64, max_memory=8000, prefetch=True)
+    assert 1 < prefetch < inline
+    # each prefetching worker holds about twice the slabs
+    assert prefetch in (inline // 2 - 1, inline // 2, inline // 2 + 1)
+
+
+def test_write_transposed(tmp_path, monkeypatch):
+    monkeypatch.setattr(fields, 'NODE_CHUNK', 4)
+    monkeypatch.setattr(fields, '_buffer', None)
+    values = np.arange(30, dtype=np.float64).reshape(10, 3)
+
+    class Variable:
+        def __init__(self):
+            self.writes = []
+
+        def __setitem__(self, index, block):
+            self.writes.append((index, block.copy()))
+
+    var = Variable()
+    fields.write_transposed(var, values)
+    assert [index for index, _ in var.writes] == [
+        (0, slice(None), slice(0, 4)), (0, slice(None), slice(4, 8)),
+        (0, slice(None), slice(8, 10))]
+    for (_, _, nodes), block in var.writes:
+        assert block.dtype == np.float32
+        np.testing.assert_array_equal(block, values[nodes].T)
+
+    # the buffer follows a change of the number of levels
+    with netCDF4.Dataset(tmp_path / 'out.nc', 'w') as nc:
+        nc.createDimension('time', None)
+        nc.createDimension('nv', 2)
+        nc.createDimension('node', 10)
+        out = nc.createVariable('temp', 'f4', ('time', 'nv', 'node'), chunksizes=(1, 2, 4))
+        fields.write_transposed(out, values[:, :2])
+        np.testing.assert_array_equal(out[0], values[:, :2].T)
+
+
+def write_staout(path, nstep, nsta, nver=None, seed=0):
+    """A staout file of nsta stations (2-D) or of two lines per time step
+    with 2 * nsta stations of nver levels (3-D)."""
+    rng = np.random.default_rng(seed)
+    lines = []
+    for t in range(nstep):
+        time = f'{900. * (t + 1):.6E}'
+        if nver is None:
+            lines.append(' '.join([time] + [f'{v:.6E}' for v in rng.normal(size=nsta)]))
+        else:
+            for _ in range(2):
+                lines.append(' '.join([time] + [f'{v:.6E}' for v in
+                                                rng.normal(size=2 * nsta * nver)]))
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def read_staout_lines(path, nsta, nver=None):
+    """staout values read one line at a time."""
+    times, values = [], []
+    with open(path) as file:
+        for n, line in enumerate(file):
+            if nver is not None and n % 2 == 0:
+                continue
+            row = [float(v) for v in line.split()]
+            times.append(row[0])
+            if nver is None:
+                values.append(row[1:nsta + 1])
+            else:
+                levels = [[row[1 + s * nver + z] for s in range(nsta)]
+                          for z in range(nver)]
+                values.append(levels)
+    return np.array(times), np.array(values, dtype=np.float32)
+
+
+def test_read_staout_2d(tmp_path):
+    write_staout(tmp_path / 'staout_1', 5, 12)
+    time, values = fields.read_staout(tmp_path / 'staout_1', 7)
+    expected_time, expected = read_staout_lines(tmp_path / 'staout_1', 7)
+    np.testing.assert_array_equal(time, expected_time)
+    assert values.shape == (5, 7) and values.dtype == np.float32
+    np.testing.assert_array_equal(values, expected)
+
+
+def test_read_staout_3d(tmp_path):
+    write_staout(tmp_path / 'staout_5', 4, 6, nver=3)
+    time, values = fields.read_staout(tmp_path / 'staout_5', 6, nver=3)
+    expected_time, expected = read_staout_lines(tmp_path / 'staout_5', 6, nver=3)
+    np.testing.assert_array_equal(time, expected_time)
+    assert values.shape == (4, 3, 6)
+    np.testing.assert_array_equal(values, expected)
+
+
+@pytest.mark.parametrize('nprocs', [1, 3])
+def test_write_stations(tmp_path, monkeypatch, nprocs):
+    monkeypatch.chdir(tmp_path)
+    nsta, nver, nstep = 271, 63, 3
+    for name, k in fields.STAOUT_2D.items():
+        write_staout(tmp_path / f'staout_{k}', nstep, nsta + 5, seed=k)
+    for name, k in fields.STAOUT_3D.items():
+        write_staout(tmp_path / f'staout_{k}', nstep, nsta, nver=nver, seed=k)
+    (tmp_path / 'secofs.station.lat.lon').write_text(''.join(
+        f'{i + 1} {-80. + 0.01 * i:.2f} {30. + 0.01 * i:.2f}\n' for i in range(nsta)))
+    ctl = {'PREFIXNOS': 'secofs', 'cyc': '06', 'day': '20260101', 'mode': 'n',
+           'time_units': 'seconds since 2026-01-01 00:00:00'}
+    fields.write_stations(ctl, nprocs=nprocs)
+    with netCDF4.Dataset('secofs.t06z.20260101.stations.nowcast.nc') as nc:
+        np.testing.assert_array_equal(nc.variables['time'][:], [900., 1800., 2700.])
+        np.testing.assert_allclose(nc.variables['lon'][:], -80. + 0.01 * np.arange(nsta),
+                                   rtol=1e-6)
+        assert netCDF4.chartostring(nc.variables['name_station'][4]) == 'station_secofs_00005'
+        for name, k in fields.STAOUT_2D.items():
+            _, expected = read_staout_lines(tmp_path / f'staout_{k}', nsta)
+            np.testing.assert_array_equal(nc.variables[name][:], expected)
+        for name, k in fields.STAOUT_3D.items():
+            _, expected = read_staout_lines(tmp_path / f'staout_{k}', nsta, nver)
+            assert nc.variables[name].dimensions == ('time', 'siglay', 'station')
+            np.testing.assert_array_equal(nc.variables[name][:], expected)